@@ -43,6 +43,7 @@ from owrx.js8 import Js8Profiles
 from owrx.audio import AudioChopper
 
 from csdr.pipe import Pipe
+from csdr.decimation import DecimationPlanner
 
 import logging
 
@@ -102,6 +103,7 @@ class dsp(object):
         self.name = "csdr"
         self.base_bufsize = 512
         self.decimation = None
+        self.decimation_stages = []
         self.last_decimation = None
         self.nc_port = None
         self.squelch_level = -150
@@ -113,6 +115,7 @@ class dsp(object):
         self.secondary_fft_size = 1024
         self.secondary_process_fft = None
         self.secondary_process_demod = None
+        self.secondary_profiles = None
         self.pipe_names = {
             "bpf_pipe": Pipe.WRITE,
             "shift_pipe": Pipe.WRITE,
@@ -139,6 +142,9 @@ class dsp(object):
         self.direwolf_port = None
         self.process = None
 
+        self.inprocess_tail = False
+        self.tail_encoder = None
+
     def set_service(self, flag=True):
         self.is_service = flag
 
@@ -160,8 +166,7 @@ class dsp(object):
                 chain += ["csdr compress_fft_adpcm_f_u8 {fft_size}"]
             return chain
         chain += ["csdr shift_addfast_cc --fifo {shift_pipe}"]
-        if self.decimation > 1:
-            chain += ["csdr fir_decimate_cc {decimation} {ddc_transition_bw} HAMMING"]
+        chain += [stage.getCommand() for stage in self.decimation_stages]
         chain += ["csdr bandpass_fir_fft_cc --fifo {bpf_pipe} {bpf_transition_bw} HAMMING"]
         if self.output.supports_type("smeter"):
             chain += [
@@ -174,6 +179,9 @@ class dsp(object):
             # early exit if we don't want audio
             if not self.output.supports_type("audio"):
                 return chain
+        if self.use_inprocess_tail(which):
+            # the remaining steps are done by the InProcessTail, which needs the complex IF samples
+            return chain
         # safe some cpu cycles... no need to decimate if decimation factor is 1
         last_decimation_block = []
         if self.last_decimation >= 2.0:
@@ -428,33 +436,14 @@ class dsp(object):
         )
         self.secondary_processes_running = True
 
-        if self.isWsjtMode():
-            smd = self.get_secondary_demodulator()
-            chopper_profiles = None
-            if smd == "ft8":
-                chopper_profiles = [Ft8Profile()]
-            elif smd == "wspr":
-                chopper_profiles = [WsprProfile()]
-            elif smd == "jt65":
-                chopper_profiles = [Jt65Profile()]
-            elif smd == "jt9":
-                chopper_profiles = [Jt9Profile()]
-            elif smd == "ft4":
-                chopper_profiles = [Ft4Profile()]
-            elif smd == "fst4":
-                chopper_profiles = Fst4Profile.getEnabledProfiles()
-            elif smd == "fst4w":
-                chopper_profiles = Fst4wProfile.getEnabledProfiles()
-            elif smd == "q65":
-                chopper_profiles = Q65Profile.getEnabledProfiles()
-            if chopper_profiles is not None and len(chopper_profiles):
+        if self.isWsjtMode() or self.isJs8():
+            chopper_profiles = self.secondary_profiles
+            if chopper_profiles is None:
+                chopper_profiles = dsp.get_chopper_profiles(self.get_secondary_demodulator())
+            if chopper_profiles:
                 chopper = AudioChopper(self, self.secondary_process_demod.stdout, *chopper_profiles)
                 chopper.start()
-                self.output.send_output("wsjt_demod", chopper.read)
-        elif self.isJs8():
-            chopper = AudioChopper(self, self.secondary_process_demod.stdout, *Js8Profiles.getEnabledProfiles())
-            chopper.start()
-            self.output.send_output("js8_demod", chopper.read)
+                self.output.send_output("js8_demod" if self.isJs8() else "wsjt_demod", chopper.read)
         elif self.isPacket():
             # we best get the ax25 packets from the kiss socket
             kiss = KissClient(self.direwolf_port)
@@ -507,6 +496,35 @@ class dsp(object):
     def get_secondary_demodulator(self):
         return self.secondary_demodulator
 
+    def set_secondary_profiles(self, profiles):
+        """
+        override the audio chopper profiles that would be used for the secondary demodulator. this allows multiple
+        decoders to share a single demodulator chain.
+        """
+        self.secondary_profiles = profiles
+
+    @staticmethod
+    def get_chopper_profiles(demodulator):
+        if demodulator == "ft8":
+            return [Ft8Profile()]
+        elif demodulator == "wspr":
+            return [WsprProfile()]
+        elif demodulator == "jt65":
+            return [Jt65Profile()]
+        elif demodulator == "jt9":
+            return [Jt9Profile()]
+        elif demodulator == "ft4":
+            return [Ft4Profile()]
+        elif demodulator == "fst4":
+            return Fst4Profile.getEnabledProfiles()
+        elif demodulator == "fst4w":
+            return Fst4wProfile.getEnabledProfiles()
+        elif demodulator == "q65":
+            return Q65Profile.getEnabledProfiles()
+        elif demodulator == "js8":
+            return Js8Profiles.getEnabledProfiles()
+        return None
+
     def set_secondary_fft_size(self, secondary_fft_size):
         # to change this, restart is required
         self.secondary_fft_size = secondary_fft_size
@@ -551,22 +569,19 @@ class dsp(object):
             self.restart()
 
     def calculate_decimation(self):
-        (self.decimation, self.last_decimation) = self.get_decimation(self.samp_rate, self.get_audio_rate())
+        plan = self.get_decimation_plan(self.samp_rate, self.get_audio_rate())
+        self.decimation = plan.getDecimation()
+        self.decimation_stages = plan.stages
+        self.last_decimation = plan.getFraction()
+
+    def get_decimation_plan(self, input_rate, output_rate):
+        return DecimationPlanner.getSharedInstance().getPlan(
+            input_rate, output_rate, self.get_demodulator(), self.ddc_transition_bw_rate
+        )
 
     def get_decimation(self, input_rate, output_rate):
-        if output_rate <= 0:
-            raise ValueError("invalid output rate: {rate}".format(rate=output_rate))
-        decimation = 1
-        target_rate = output_rate
-        # wideband fm has a much higher frequency deviation (75kHz).
-        # we cannot cover this if we immediately decimate to the sample rate the audio will have later on, so we need
-        # to compensate here.
-        if self.get_demodulator() == "wfm" and output_rate < 200000:
-            target_rate = 200000
-        while input_rate / (decimation + 1) >= target_rate:
-            decimation += 1
-        fraction = float(input_rate / decimation) / output_rate
-        return decimation, fraction
+        plan = self.get_decimation_plan(input_rate, output_rate)
+        return plan.getDecimation(), plan.getFraction()
 
     def if_samp_rate(self):
         return self.samp_rate / self.decimation
@@ -738,15 +753,80 @@ class dsp(object):
         if self.has_pipe("dmr_control_pipe"):
             self.pipes["dmr_control_pipe"].write("{0}\n".format(filter))
 
+    def set_inprocess_tail(self, flag):
+        if self.inprocess_tail == flag:
+            return
+        self.inprocess_tail = flag
+        self.restart()
+
+    def use_inprocess_tail(self, which=None):
+        if which is None:
+            which = self.get_demodulator()
+        if not self.inprocess_tail:
+            return False
+        # the InProcessTail outputs audio at the audio rate. secondary demodulators need a different rate than the
+        # output rate, and the resampling is left to sox in the regular chain.
+        if not self.isHdAudio(which) and self.get_audio_rate() != self.get_output_rate():
+            return False
+        # local import since numpy is optional
+        from csdr.inprocess import InProcessTail
+
+        return InProcessTail.supports(which)
+
+    def get_inprocess_tail_reader(self):
+        # local import since numpy is optional
+        from csdr.inprocess import InProcessTail
+
+        tail = InProcessTail(
+            self.demodulator, self.if_samp_rate(), self.get_audio_rate(), wfm_deemphasis_tau=self.wfm_deemphasis_tau
+        )
+        # 5ms of complex float samples (8 bytes each), matching the latency of get_audio_bytes_to_read()
+        bytes_to_read = max(1, int(self.if_samp_rate() * 0.005)) * 8
+        stdout = self.process.stdout
+
+        def read():
+            while True:
+                data = stdout.read(bytes_to_read)
+                if not data:
+                    return data
+                # incomplete samples can only happen at the very end of the stream
+                data = data[: len(data) - len(data) % 8]
+                audio = tail.process(data)
+                # empty reads would be interpreted as end of stream
+                if audio:
+                    return audio
+
+        if self.audio_compression != "adpcm":
+            return read
+
+        # the adpcm encoder is stateful and inherently sequential, so this is still left to csdr
+        self.tail_encoder = subprocess.Popen(
+            ["csdr", "encode_ima_adpcm_i16_u8"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, start_new_session=True
+        )
+        encoder = self.tail_encoder
+
+        def feed():
+            try:
+                for data in iter(read, b""):
+                    encoder.stdin.write(data)
+                    encoder.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                pass
+            finally:
+                try:
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        threading.Thread(target=feed, name="csdr_tail_feed").start()
+        return partial(encoder.stdout.read, self.get_audio_bytes_to_read())
+
     def set_wfm_deemphasis_tau(self, tau):
         if self.wfm_deemphasis_tau == tau:
             return
         self.wfm_deemphasis_tau = tau
         self.restart()
 
-    def ddc_transition_bw(self):
-        return self.ddc_transition_bw_rate * (self.if_samp_rate() / float(self.samp_rate))
-
     def try_create_pipes(self, pipe_names, command_base):
         for pipe_name, pipe_type in pipe_names.items():
             if self.has_pipe(pipe_name):
@@ -833,7 +913,6 @@ class dsp(object):
                 fft_block_size=self.fft_block_size(),
                 fft_averages=self.fft_averages,
                 bpf_transition_bw=float(self.bpf_transition_bw) / self.if_samp_rate(),
-                ddc_transition_bw=self.ddc_transition_bw(),
                 flowcontrol=int(self.samp_rate * 2),
                 start_bufsize=self.base_bufsize * self.decimation,
                 nc_port=self.nc_port,
@@ -860,13 +939,14 @@ class dsp(object):
 
             audio_type = "hd_audio" if self.isHdAudio() else "audio"
             if self.output.supports_type(audio_type):
-                self.output.send_output(
-                    audio_type,
-                    partial(
+                if self.use_inprocess_tail():
+                    read_fn = self.get_inprocess_tail_reader()
+                else:
+                    read_fn = partial(
                         self.process.stdout.read,
                         self.get_fft_bytes_to_read() if self.demodulator == "fft" else self.get_audio_bytes_to_read(),
-                    ),
-                )
+                    )
+                self.output.send_output(audio_type, read_fn)
 
             self.start_secondary_demodulator()
 
@@ -903,6 +983,13 @@ class dsp(object):
                 except ProcessLookupError:
                     # been killed by something else, ignore
                     pass
+            if self.tail_encoder is not None:
+                try:
+                    self.tail_encoder.terminate()
+                    self.tail_encoder.communicate()
+                except ProcessLookupError:
+                    pass
+                self.tail_encoder = None
             self.stop_secondary_demodulator()
 
             self.try_delete_pipes(self.pipe_names)
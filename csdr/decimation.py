@@ -0,0 +1,203 @@
+import threading
+import math
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DecimationStage(object):
+    def __init__(self, decimation, input_rate, transition_bw):
+        self.decimation = decimation
+        self.input_rate = input_rate
+        # transition bandwidth, relative to the input sample rate of this stage
+        self.transition_bw = transition_bw
+
+    def getOutputRate(self):
+        return self.input_rate / self.decimation
+
+    def getTaps(self):
+        # same formula that csdr uses in firdes_filter_len()
+        taps = int(4.0 / self.transition_bw)
+        if taps % 2 == 0:
+            taps += 1
+        return taps
+
+    def getCost(self):
+        # fir_decimate_cc only calculates the output samples, so the cost per input sample is taps / decimation.
+        # every stage is a separate process, so there's a constant overhead per sample for the pipe copies on top.
+        return self.input_rate * (self.getTaps() / self.decimation + DecimationPlanner.stageOverhead)
+
+    def getCommand(self):
+        return "csdr fir_decimate_cc {decimation} {transition_bw} HAMMING".format(
+            decimation=self.decimation, transition_bw=self.transition_bw
+        )
+
+    def __dict__(self):
+        return {
+            "decimation": self.decimation,
+            "input_rate": self.input_rate,
+            "output_rate": self.getOutputRate(),
+            "transition_bw": self.transition_bw,
+            "taps": self.getTaps(),
+            "cost": self.getCost(),
+        }
+
+
+class DecimationPlan(object):
+    def __init__(self, input_rate, output_rate, stages):
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.stages = stages
+
+    def getDecimation(self):
+        decimation = 1
+        for stage in self.stages:
+            decimation *= stage.decimation
+        return decimation
+
+    def getIfRate(self):
+        return self.input_rate / self.getDecimation()
+
+    def getFraction(self):
+        return float(self.getIfRate()) / self.output_rate
+
+    def getCost(self):
+        # everything after the decimation (bandpass, squelch, demodulation...) scales with the IF sample rate
+        return sum(s.getCost() for s in self.stages) + self.getIfRate() * DecimationPlanner.downstreamCost
+
+    def __dict__(self):
+        return {
+            "input_rate": self.input_rate,
+            "output_rate": self.output_rate,
+            "decimation": self.getDecimation(),
+            "fraction": self.getFraction(),
+            "if_rate": self.getIfRate(),
+            "cost": self.getCost(),
+            "stages": [s.__dict__() for s in self.stages],
+        }
+
+
+class DecimationPlanner(object):
+    """
+    Finds a cascade of fir_decimate_cc stages that is cheaper than a single long filter.
+
+    Costs are estimated in multiply-accumulate operations per second; the numbers are rough, but good enough to compare
+    different cascades against each other.
+    """
+
+    sharedInstance = None
+    creationLock = threading.Lock()
+
+    # estimated cost per input sample for every additional process in the chain (pipe read + write)
+    stageOverhead = 8
+    # estimated cost per IF sample of the remaining chain (bandpass, squelch, demodulator, fractional decimator)
+    downstreamCost = 64
+    # limit the number of processes we are willing to add to the chain
+    maxStages = 4
+    # we may choose a lower total decimation if it factorizes better; the remainder goes to the fractional decimator
+    minDecimationRatio = 0.75
+
+    @staticmethod
+    def getSharedInstance():
+        with DecimationPlanner.creationLock:
+            if DecimationPlanner.sharedInstance is None:
+                DecimationPlanner.sharedInstance = DecimationPlanner()
+        return DecimationPlanner.sharedInstance
+
+    def __init__(self):
+        self.plans = {}
+        self.lock = threading.Lock()
+
+    def getPlan(self, input_rate, output_rate, mode, transition_bw_rate):
+        """
+        :param transition_bw_rate: transition bandwidth of the decimation filters, relative to the IF sample rate
+        """
+        key = (input_rate, output_rate, mode, transition_bw_rate)
+        with self.lock:
+            if key not in self.plans:
+                self.plans[key] = self._calculatePlan(input_rate, output_rate, mode, transition_bw_rate)
+                logger.debug("decimation plan for %s: %s", key, self.plans[key].__dict__())
+            return self.plans[key]
+
+    def getPlans(self):
+        with self.lock:
+            return [
+                {
+                    "samp_rate": key[0],
+                    "output_rate": key[1],
+                    "mode": key[2],
+                    "transition_bw_rate": key[3],
+                    **plan.__dict__(),
+                }
+                for key, plan in self.plans.items()
+            ]
+
+    def getMaxDecimation(self, input_rate, output_rate, mode):
+        if output_rate <= 0:
+            raise ValueError("invalid output rate: {rate}".format(rate=output_rate))
+        target_rate = output_rate
+        # wideband fm has a much higher frequency deviation (75kHz).
+        # we cannot cover this if we immediately decimate to the sample rate the audio will have later on, so we need
+        # to compensate here.
+        if mode == "wfm" and output_rate < 200000:
+            target_rate = 200000
+        return max(1, int(input_rate / target_rate))
+
+    def getSingleStagePlan(self, input_rate, output_rate, mode, transition_bw_rate):
+        decimation = self.getMaxDecimation(input_rate, output_rate, mode)
+        return DecimationPlan(input_rate, output_rate, self._buildStages(input_rate, [decimation], transition_bw_rate))
+
+    def _calculatePlan(self, input_rate, output_rate, mode, transition_bw_rate):
+        max_decimation = self.getMaxDecimation(input_rate, output_rate, mode)
+        best = self.getSingleStagePlan(input_rate, output_rate, mode, transition_bw_rate)
+        min_decimation = max(1, math.ceil(max_decimation * DecimationPlanner.minDecimationRatio))
+        for decimation in range(min_decimation, max_decimation + 1):
+            for factors in self._factorizations(decimation, DecimationPlanner.maxStages):
+                stages = self._buildStages(input_rate, factors, transition_bw_rate)
+                plan = DecimationPlan(input_rate, output_rate, stages)
+                if plan.getCost() < best.getCost():
+                    best = plan
+        return best
+
+    def _buildStages(self, input_rate, factors, transition_bw_rate):
+        if factors == [1]:
+            return []
+        if_rate = input_rate
+        for f in factors:
+            if_rate /= f
+        stages = []
+        rate = input_rate
+        for f in factors:
+            out_rate = rate / f
+            # this is what a single-stage decimation would use
+            final_bw = transition_bw_rate * if_rate / rate
+            # intermediate stages only need to protect the band that survives the final stage, so everything between
+            # the final IF bandwidth and the first alias is available as transition band.
+            transition_bw = max((out_rate - if_rate) / rate, final_bw)
+            stages.append(DecimationStage(f, rate, transition_bw))
+            rate = out_rate
+        return stages
+
+    def _factorizations(self, n, max_factors):
+        """
+        all ordered factorizations of n into at most max_factors factors >= 2
+        """
+        if n == 1:
+            return [[1]]
+        results = [[n]]
+        if max_factors > 1:
+            for f in self._divisors(n):
+                results += [[f] + rest for rest in self._factorizations(n // f, max_factors - 1)]
+        return results
+
+    def _divisors(self, n):
+        """
+        all divisors of n, excluding 1 and n itself
+        """
+        divisors = set()
+        for f in range(2, int(math.sqrt(n)) + 1):
+            if n % f == 0:
+                divisors.add(f)
+                divisors.add(n // f)
+        return sorted(divisors)
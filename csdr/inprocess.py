@@ -0,0 +1,198 @@
+"""
+In-process replacement for the last part of the analog demodulator chains.
+
+Instead of running fmdemod_quadri_cf, limit_ff, fractional_decimator_ff, deemphasis, agc_ff and convert_f_s16 as
+separate processes, the complex IF samples are read from the csdr chain and processed here in blocks using numpy.
+The output is native-endian signed 16 bit PCM, just like the output of "csdr convert_f_s16".
+"""
+
+import numpy as np
+import threading
+import math
+
+
+class FilterCache(object):
+    """
+    filter designs only depend on the sample rates involved, so they can be shared between all listeners
+    """
+
+    cache = {}
+    lock = threading.Lock()
+
+    @staticmethod
+    def get(key, design):
+        with FilterCache.lock:
+            if key not in FilterCache.cache:
+                FilterCache.cache[key] = design()
+            return FilterCache.cache[key]
+
+
+class Stage(object):
+    def process(self, samples):
+        return samples
+
+
+class FirFilter(Stage):
+    def __init__(self, taps):
+        self.taps = taps
+        self.history = np.zeros(len(taps) - 1, dtype=taps.dtype)
+
+    def process(self, samples):
+        buffer = np.concatenate((self.history, samples))
+        if len(self.taps) > 1:
+            self.history = buffer[-(len(self.taps) - 1) :]
+        return np.convolve(buffer, self.taps, mode="valid").astype(samples.dtype, copy=False)
+
+
+class FmDemodulator(Stage):
+    def __init__(self):
+        self.last = np.complex64(0)
+
+    def process(self, samples):
+        previous = np.concatenate(([self.last], samples[:-1]))
+        self.last = samples[-1]
+        # phase difference between consecutive samples, limited like "csdr limit_ff"
+        return np.clip(np.angle(samples * np.conj(previous)), -1.0, 1.0).astype(np.float32)
+
+
+class AmDemodulator(Stage):
+    def __init__(self, dc_block_length=1024):
+        self.envelope = np.zeros(0, dtype=np.float32)
+        self.dc_block_length = dc_block_length
+
+    def process(self, samples):
+        envelope = np.abs(samples).astype(np.float32)
+        # dc block: subtract the moving average of the envelope
+        self.envelope = np.concatenate((self.envelope, envelope))[-self.dc_block_length :]
+        return envelope - np.mean(self.envelope)
+
+
+class SsbDemodulator(Stage):
+    def process(self, samples):
+        return samples.real.astype(np.float32)
+
+
+class FractionalDecimator(Stage):
+    def __init__(self, rate):
+        self.rate = rate
+        self.position = 1.0
+        self.carry = np.float32(0)
+        self.prefilter = None
+        if rate > 1.0:
+            self.prefilter = FirFilter(FilterCache.get(("lowpass", round(rate, 6)), lambda: lowpass(0.5 / rate)))
+
+    def process(self, samples):
+        if self.prefilter is not None:
+            samples = self.prefilter.process(samples)
+        buffer = np.concatenate(([self.carry], samples))
+        last = len(buffer) - 1
+        count = max(0, math.ceil((last - self.position) / self.rate))
+        positions = self.position + np.arange(count) * self.rate
+        indexes = positions.astype(np.int64)
+        fractions = (positions - indexes).astype(np.float32)
+        output = buffer[indexes] * (1 - fractions) + buffer[indexes + 1] * fractions
+        self.position += count * self.rate - last
+        self.carry = buffer[-1]
+        return output.astype(np.float32)
+
+
+class Deemphasis(FirFilter):
+    def __init__(self, sample_rate, tau):
+        super().__init__(FilterCache.get(("deemphasis", sample_rate, tau), lambda: deemphasis(sample_rate, tau)))
+
+
+class Agc(Stage):
+    # (attack, decay) time constants in seconds
+    profiles = {
+        "fast": (0.005, 0.5),
+        "slow": (0.02, 3),
+    }
+
+    def __init__(self, sample_rate, profile="fast", max_gain=65535.0, initial_gain=1.0, reference=0.8):
+        self.gain = initial_gain
+        self.max_gain = max_gain
+        self.reference = reference
+        attack, decay = Agc.profiles[profile]
+        self.block_size = max(1, int(sample_rate / 1000))
+        # convert the time constants into per-block rates
+        block_duration = self.block_size / sample_rate
+        self.attack = 1 - math.exp(-block_duration / attack)
+        self.decay = 1 - math.exp(-block_duration / decay)
+
+    def process(self, samples):
+        if not len(samples):
+            return samples
+        blocks = math.ceil(len(samples) / self.block_size)
+        gains = np.empty(blocks + 1, dtype=np.float32)
+        gains[0] = self.gain
+        for i in range(blocks):
+            peak = np.max(np.abs(samples[i * self.block_size : (i + 1) * self.block_size]))
+            target = self.max_gain if peak == 0 else min(self.reference / peak, self.max_gain)
+            rate = self.attack if target < self.gain else self.decay
+            self.gain += (target - self.gain) * rate
+            gains[i + 1] = self.gain
+        # interpolate the gain between blocks to avoid zipper noise
+        ramp = np.interp(
+            np.arange(len(samples)), np.arange(blocks + 1) * self.block_size, gains
+        ).astype(np.float32)
+        return samples * ramp
+
+
+def lowpass(cutoff, transition_bw=0.05):
+    """
+    windowed-sinc lowpass; cutoff and transition bandwidth relative to the sample rate
+    """
+    length = int(4.0 / transition_bw)
+    if length % 2 == 0:
+        length += 1
+    n = np.arange(length) - (length - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(length)
+    return (taps / np.sum(taps)).astype(np.float32)
+
+
+def deemphasis(sample_rate, tau):
+    """
+    truncated impulse response of a single-pole lowpass with time constant tau
+    """
+    decay = math.exp(-1.0 / (tau * sample_rate))
+    length = max(1, int(math.ceil(math.log(1e-4) / math.log(decay))))
+    taps = (1 - decay) * decay ** np.arange(length)
+    return (taps / np.sum(taps)).astype(np.float32)
+
+
+class InProcessTail(object):
+    # nfm deemphasis corner frequency of roughly 200 Hz
+    nfmTau = 750e-6
+
+    def __init__(self, demodulator, if_rate, audio_rate, wfm_deemphasis_tau=50e-6):
+        self.demodulator = demodulator
+        decimator = FractionalDecimator(if_rate / audio_rate)
+        if demodulator == "nfm":
+            self.stages = [
+                FmDemodulator(),
+                decimator,
+                Deemphasis(audio_rate, InProcessTail.nfmTau),
+                Agc(audio_rate, "slow", max_gain=3),
+            ]
+        elif demodulator == "wfm":
+            self.stages = [FmDemodulator(), decimator, Deemphasis(audio_rate, wfm_deemphasis_tau)]
+        elif demodulator == "am":
+            self.stages = [AmDemodulator(), decimator, Agc(audio_rate, "slow", initial_gain=200)]
+        elif demodulator == "ssb":
+            self.stages = [SsbDemodulator(), decimator, Agc(audio_rate)]
+        else:
+            raise ValueError("demodulator not supported in-process: {0}".format(demodulator))
+
+    @staticmethod
+    def supports(demodulator):
+        return demodulator in ["nfm", "wfm", "am", "ssb"]
+
+    def process(self, data: bytes) -> bytes:
+        # the csdr chain outputs interleaved 32 bit float complex samples
+        samples = np.frombuffer(data, dtype=np.complex64)
+        if not len(samples):
+            return b""
+        for stage in self.stages:
+            samples = stage.process(samples)
+        # same as "csdr convert_f_s16": native endianness, no dithering
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
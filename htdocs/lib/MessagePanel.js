@@ -66,7 +66,20 @@ WsjtMessagePanel.prototype.render = function() {
 };
 
 WsjtMessagePanel.prototype.pushMessage = function(msg) {
+    this.pushMessages([msg]);
+};
+
+// renders all messages of a decoding cycle in one go, so that the table is only updated once
+WsjtMessagePanel.prototype.pushMessages = function(msgs) {
+    var me = this;
     var $b = $(this.el).find('tbody');
+    $b.append(msgs.map(function(msg) {
+        return me.renderMessage(msg);
+    }).join(''));
+    $b.scrollTop($b[0].scrollHeight);
+};
+
+WsjtMessagePanel.prototype.renderMessage = function(msg) {
     var t = new Date(msg['timestamp']);
     var pad = function (i) {
         return ('' + i).padStart(2, "0");
@@ -93,17 +106,14 @@ WsjtMessagePanel.prototype.pushMessage = function(msg) {
             linkedmsg = html_escape(linkedmsg);
         }
     }
-    $b.append($(
-        '<tr data-timestamp="' + msg['timestamp'] + '">' +
+    return '<tr data-timestamp="' + msg['timestamp'] + '">' +
         '<td>' + pad(t.getUTCHours()) + pad(t.getUTCMinutes()) + pad(t.getUTCSeconds()) + '</td>' +
         '<td class="decimal">' + msg['db'] + '</td>' +
         '<td class="decimal">' + msg['dt'] + '</td>' +
         '<td class="decimal freq">' + msg['freq'] + '</td>' +
         '<td class="message">' + linkedmsg + '</td>' +
-        '</tr>'
-    ));
-    $b.scrollTop($b[0].scrollHeight);
-}
+        '</tr>';
+};
 
 $.fn.wsjtMessagePanel = function(){
     if (!this.data('panel')) {
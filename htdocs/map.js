@@ -30,6 +30,8 @@ $(function(){
     var map;
     var markers = {};
     var rectangles = {};
+    // per-field station counts that are sent instead of the individual stations when zoomed out
+    var aggregates = {};
     var receiverMarker;
     var updateQueue = [];
 
@@ -201,13 +203,100 @@ $(function(){
         });
     };
 
-    var clearMap = function(){
+    var processRemovals = function(callsigns) {
+        // updates that have not been processed yet must not bring the positions back
+        updateQueue = updateQueue.filter(function(update) {
+            return callsigns.indexOf(update.callsign) < 0;
+        });
+        callsigns.forEach(function(callsign) {
+            [markers, rectangles].forEach(function(items) {
+                if (!(callsign in items)) return;
+                items[callsign].setMap();
+                delete items[callsign];
+            });
+        });
+    };
+
+    var clearAggregates = function() {
+        $.each(aggregates, function(field, item) { item.setMap(); });
+        aggregates = {};
+    };
+
+    var clearStations = function() {
         var reset = function(callsign, item) { item.setMap(); };
         $.each(markers, reset);
         $.each(rectangles, reset);
-        receiverMarker.setMap();
         markers = {};
         rectangles = {};
+        updateQueue = [];
+    };
+
+    var processAggregates = function(updates, reset) {
+        if (reset) {
+            clearStations();
+            clearAggregates();
+        }
+        updates.forEach(function(update) {
+            var rectangle = aggregates[update.field];
+            if (!update.count) {
+                if (rectangle) {
+                    rectangle.setMap();
+                    delete aggregates[update.field];
+                }
+                return;
+            }
+            var lat = (update.field.charCodeAt(1) - 65 - 9) * 10;
+            var lon = (update.field.charCodeAt(0) - 65 - 9) * 20;
+            if (!rectangle) {
+                rectangle = new google.maps.Rectangle();
+                rectangle.addListener('click', function(){
+                    showAggregateInfoWindow(this.aggregate, this.center);
+                });
+                aggregates[update.field] = rectangle;
+            }
+            rectangle.aggregate = update;
+            rectangle.center = new google.maps.LatLng({lat: lat + 5, lng: lon + 10});
+            rectangle.setOptions({
+                strokeColor: '#000000',
+                strokeWeight: 1,
+                strokeOpacity: strokeOpacity,
+                fillColor: '#000000',
+                fillOpacity: Math.min(0.1 + Math.log10(update.count) * 0.15, 0.7),
+                map: map,
+                bounds: {
+                    north: lat + 10,
+                    south: lat,
+                    west: lon,
+                    east: lon + 20
+                }
+            });
+            if (infowindow && infowindow.field && infowindow.field == update.field) {
+                showAggregateInfoWindow(update, rectangle.center);
+            }
+        });
+    };
+
+    var clearMap = function(){
+        clearStations();
+        clearAggregates();
+        receiverMarker.setMap();
+    };
+
+    var socket;
+
+    var sendViewport = function() {
+        if (!map || !socket || socket.readyState != WebSocket.OPEN) return;
+        var bounds = map.getBounds();
+        if (!bounds) return;
+        var viewport = {
+            south: bounds.getSouthWest().lat(),
+            west: bounds.getSouthWest().lng(),
+            north: bounds.getNorthEast().lat(),
+            east: bounds.getNorthEast().lng(),
+            zoom: map.getZoom()
+        };
+        if (expectedCallsign) viewport.callsign = expectedCallsign;
+        socket.send(JSON.stringify({type: 'viewport', value: viewport}));
     };
 
     var reconnect_timeout = false;
@@ -216,9 +305,12 @@ $(function(){
 
     var connect = function(){
         var ws = new WebSocket(ws_url);
+        socket = ws;
         ws.onopen = function(){
             ws.send("SERVER DE CLIENT client=map.js type=map");
             reconnect_timeout = false
+            // the server only sends the stations within the viewport
+            sendViewport();
         };
 
         ws.onmessage = function(e){
@@ -240,10 +332,18 @@ $(function(){
                                 lng: config.receiver_gps.lon
                             };
                             if (!map) $.getScript("https://maps.googleapis.com/maps/api/js?key=" + config.google_maps_api_key).done(function(){
+                                var center = receiverPos;
+                                if (expectedLocator) {
+                                    center = {
+                                        lat: (expectedLocator.charCodeAt(1) - 65 - 9) * 10 + Number(expectedLocator[3]) + .5,
+                                        lng: (expectedLocator.charCodeAt(0) - 65 - 9) * 20 + Number(expectedLocator[2]) * 2 + 1
+                                    };
+                                }
                                 map = new google.maps.Map($('.openwebrx-map')[0], {
-                                    center: receiverPos,
+                                    center: center,
                                     zoom: 5,
                                 });
+                                map.addListener('idle', sendViewport);
 
                                 $.getScript("static/lib/nite-overlay.js").done(function(){
                                     nite.init(map);
@@ -290,6 +390,16 @@ $(function(){
                     case "update":
                         processUpdates(json.value);
                     break;
+                    case "snapshot":
+                        clearAggregates();
+                        processUpdates(json.value);
+                    break;
+                    case "aggregates":
+                        processAggregates(json.value, json.reset);
+                    break;
+                    case "remove":
+                        processRemovals(json.value);
+                    break;
                     case 'receiver_details':
                         $('.webrx-top-container').header().setDetails(json['value']);
                     break;
@@ -333,13 +443,33 @@ $(function(){
             google.maps.event.addListener(infowindow, 'closeclick', function() {
                 delete infowindow.locator;
                 delete infowindow.callsign;
+                delete infowindow.field;
             });
         }
         delete infowindow.locator;
         delete infowindow.callsign;
+        delete infowindow.field;
         return infowindow;
     }
 
+    var showAggregateInfoWindow = function(aggregate, pos) {
+        var infowindow = getInfoWindow();
+        infowindow.field = aggregate.field;
+        var list = function(counts) {
+            return '<ul>' + $.map(counts, function(count, key) {
+                return '<li>' + (key || 'unknown') + ': ' + count + '</li>';
+            }).join('') + '</ul>';
+        };
+        infowindow.setContent(
+            '<h3>Field: ' + aggregate.field + '</h3>' +
+            '<div>' + aggregate.count + ' stations, zoom in for details</div>' +
+            '<div>Modes:</div>' + list(aggregate.modes) +
+            '<div>Bands:</div>' + list(aggregate.bands)
+        );
+        infowindow.setPosition(pos);
+        infowindow.open(map);
+    };
+
     var infowindow;
     var showLocatorInfoWindow = function(locator, pos) {
         var infowindow = getInfoWindow();
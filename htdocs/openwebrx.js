@@ -812,8 +812,8 @@ function on_ws_recv(evt) {
                     case "js8_message":
                         $("#openwebrx-panel-js8-message").js8().pushMessage(json['value']);
                         break;
-                    case "wsjt_message":
-                        $("#openwebrx-panel-wsjt-message").wsjtMessagePanel().pushMessage(json['value']);
+                    case "wsjt_messages":
+                        $("#openwebrx-panel-wsjt-message").wsjtMessagePanel().pushMessages(json['value']);
                         break;
                     case "dial_frequencies":
                         var as_bookmarks = json['value'].map(function (d) {
@@ -1,9 +1,12 @@
-from owrx.kiss import KissDeframer
 from owrx.map import Map, LatLngLocation
 from owrx.bands import Bandplan
-from owrx.metrics import Metrics, CounterMetric
+from owrx.metrics import Metrics, CounterMetric, DirectMetric
 from owrx.parser import Parser
 from datetime import datetime, timezone
+from collections import OrderedDict
+import threading
+import marshal
+import time
 import re
 import logging
 
@@ -47,6 +50,12 @@ def getSymbolData(symbol, table):
 
 
 class Ax25Parser(object):
+    # the same callsigns show up all the time, so they are only decoded once
+    callsignCacheSize = 10000
+
+    def __init__(self):
+        self.callsigns = {}
+
     def parse(self, ax25frame):
         control_pid = ax25frame.find(bytes([0x03, 0xF0]))
         if control_pid % 7 > 0:
@@ -65,6 +74,14 @@ class Ax25Parser(object):
         }
 
     def extractCallsign(self, input):
+        callsign = self.callsigns.get(input)
+        if callsign is None:
+            if len(self.callsigns) >= Ax25Parser.callsignCacheSize:
+                self.callsigns = {}
+            callsign = self.callsigns[bytes(input)] = self._decodeCallsign(input)
+        return callsign
+
+    def _decodeCallsign(self, input):
         cs = bytes([b >> 1 for b in input[0:6]]).decode(encoding, "replace").strip()
         ssid = (input[6] & 0b00011110) >> 1
         if ssid > 0:
@@ -152,11 +169,79 @@ class AprsLocation(LatLngLocation):
         return res
 
 
+class AprsParseCache(object):
+    """
+    Remembers the parsed contents of recently seen information fields. The same packet is often received several
+    times through different digipeaters, and fixed stations send the same beacon over and over again.
+    """
+
+    sharedInstance = None
+    creationLock = threading.Lock()
+
+    @staticmethod
+    def getSharedInstance():
+        with AprsParseCache.creationLock:
+            if AprsParseCache.sharedInstance is None:
+                AprsParseCache.sharedInstance = AprsParseCache()
+        return AprsParseCache.sharedInstance
+
+    def __init__(self, maxSize=2000, ttl=600):
+        """
+        :param maxSize: maximum number of cached entries; the least recently used entries are dropped first
+        :param ttl: seconds a cached entry stays valid. some fields, like timestamps, depend on the time of parsing.
+        """
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        metrics = Metrics.getSharedInstance()
+        self.hits = CounterMetric()
+        metrics.addMetric("aprs.cache.hits", self.hits)
+        self.misses = CounterMetric()
+        metrics.addMetric("aprs.cache.misses", self.misses)
+        metrics.addMetric("aprs.cache.hit_rate", DirectMetric(self.getHitRate))
+        metrics.addMetric("aprs.cache.size", DirectMetric(lambda: len(self.entries)))
+
+    def getHitRate(self):
+        total = self.hits.counter + self.misses.counter
+        return self.hits.counter / total if total else 0
+
+    def get(self, key):
+        """
+        :return: a copy of the cached data, or None if there is no valid entry
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits.inc()
+                    # entries are kept serialized; unserializing is a cheap way to get a deep copy
+                    return marshal.loads(entry[1])
+                del self.entries[key]
+            self.misses.inc()
+        return None
+
+    def put(self, key, data):
+        if self.maxSize <= 0:
+            return
+        try:
+            data = marshal.dumps(data)
+        except ValueError:
+            logger.warning("parsed aprs data cannot be cached: %s", data)
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+
 class AprsParser(Parser):
     def __init__(self, handler):
         super().__init__(handler)
         self.ax25parser = Ax25Parser()
-        self.deframer = KissDeframer()
+        self.cache = AprsParseCache.getSharedInstance()
         self.metrics = {}
 
     def setDialFrequency(self, freq):
@@ -185,24 +270,34 @@ class AprsParser(Parser):
             return False
         return True
 
-    def parse(self, raw):
-        for frame in self.deframer.parse(raw):
+    def parse(self, frames):
+        """
+        :param frames: list of ax25 frames, as they come from the KissClient
+        """
+        locations = []
+        for frame in frames:
             try:
                 data = self.ax25parser.parse(frame)
 
                 # TODO how can we tell if this is an APRS frame at all?
-                aprsData = self.parseAprsData(data)
+                aprsData = self.parseCachedAprsData(data)
 
                 logger.debug("decoded APRS data: %s", aprsData)
-                self.updateMap(aprsData)
+                location = self.getMapLocation(aprsData)
+                if location is not None:
+                    locations.append(location)
                 self.getMetric("total").inc()
                 if self.isDirect(aprsData):
                     self.getMetric("direct").inc()
                 self.handler.write_aprs_data(aprsData)
             except Exception:
                 logger.exception("exception while parsing aprs data")
+        Map.getSharedInstance().updateLocations(locations)
 
-    def updateMap(self, mapData):
+    def getMapLocation(self, mapData):
+        """
+        :return: (callsign, location, mode, band) tuple for the map, or None if there is no position
+        """
         if "type" in mapData and mapData["type"] == "thirdparty" and "data" in mapData:
             mapData = mapData["data"]
         if "lat" in mapData and "lon" in mapData:
@@ -213,7 +308,8 @@ class AprsParser(Parser):
                     source = mapData["item"]
                 elif mapData["type"] == "object":
                     source = mapData["object"]
-            Map.getSharedInstance().updateLocation(source, loc, "APRS", self.band)
+            return source, loc, "APRS", self.band
+        return None
 
     def hasCompressedCoordinates(self, raw):
         return raw[0] == "/" or raw[0] == "\\"
@@ -259,13 +355,30 @@ class AprsParser(Parser):
             res["comment"] = raw
         return res
 
+    def isMicE(self, information):
+        return information[0] == 0x1C or information[0] == ord("`") or information[0] == ord("'")
+
+    def parseCachedAprsData(self, data):
+        information = data["data"]
+        # Mic-E encodes the latitude in the destination
+        key = (information, data["destination"]) if self.isMicE(information) else information
+        cached = self.cache.get(key)
+        if cached is not None:
+            aprsData = {"source": data["source"], "destination": data["destination"], "path": data["path"]}
+            aprsData.update(cached)
+            return aprsData
+        aprsData = self.parseAprsData(data)
+        # the forwarded ax25 data differs between the copies of a packet
+        self.cache.put(key, {k: v for k, v in aprsData.items() if k not in ["source", "destination", "path"]})
+        return aprsData
+
     def parseAprsData(self, data):
         information = data["data"]
 
         # forward some of the ax25 data
         aprsData = {"source": data["source"], "destination": data["destination"], "path": data["path"]}
 
-        if information[0] == 0x1C or information[0] == ord("`") or information[0] == ord("'"):
+        if self.isMicE(information):
             aprsData.update(MicEParser().parse(data))
             return aprsData
 
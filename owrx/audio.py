@@ -6,9 +6,11 @@ import threading
 import wave
 import subprocess
 import os
-from multiprocessing.connection import Pipe, wait
-from datetime import datetime, timedelta
-from queue import Queue, Full, Empty
+from datetime import datetime
+from queue import Queue, PriorityQueue, Full, Empty
+import itertools
+import math
+import time
 
 
 import logging
@@ -18,24 +20,253 @@ logger.setLevel(logging.INFO)
 
 
 class QueueJob(object):
-    def __init__(self, decoder, file, freq):
+    def __init__(self, decoder, file, freq, deadline):
+        """
+        :param deadline: monotonic time after which the decoding results are of no use anymore
+        """
         self.decoder = decoder
         self.file = file
         self.freq = freq
+        self.deadline = deadline
+        self.queued = None
+        # number of threads the decoder may use for this job
+        self.threads = 1
+        # decoding depth, fixed when the job is submitted. None for decoders that don't have a depth setting.
+        self.depth = None
 
     def run(self):
         self.decoder.decode(self)
 
+    def getMode(self):
+        return self.decoder.profile.getMode()
+
+    def isExpired(self):
+        return time.monotonic() > self.deadline
+
     def unlink(self):
+        AudioStorage.getSharedInstance().release(self.file)
+
+
+class AudioStorage(ABC):
+    """
+    Decides where the audio files for the decoders are stored.
+
+    Every decoding cycle produces a wave file per decoder, so keeping them in memory saves a lot of writes on SD cards.
+    The decoders derive the time of the recording from the filename, so the files always need a proper name.
+    """
+
+    sharedInstance = None
+    creationLock = threading.Lock()
+
+    @staticmethod
+    def getSharedInstance():
+        with AudioStorage.creationLock:
+            if AudioStorage.sharedInstance is None:
+                AudioStorage.sharedInstance = AudioStorage._createStorage()
+        return AudioStorage.sharedInstance
+
+    @staticmethod
+    def _createStorage():
+        shm = "/dev/shm"
+        shm_available = os.path.isdir(shm) and os.access(shm, os.W_OK)
+        tmp_dir = CoreConfig().get_temporary_directory()
+        if MemfdAudioStorage.isAvailable():
+            logger.debug("using memfd for audio files")
+            return MemfdAudioStorage(shm if shm_available else tmp_dir)
+        if shm_available:
+            logger.debug("using %s for audio files", shm)
+            return DirectoryAudioStorage(shm, True)
+        logger.debug("using temporary directory for audio files")
+        return DirectoryAudioStorage(tmp_dir, False)
+
+    def __init__(self):
+        self.savedCounter = CounterMetric()
+        Metrics.getSharedInstance().addMetric("decoding.storage.bytes_saved", self.savedCounter)
+
+    @abstractmethod
+    def create(self, filename):
+        """
+        returns a tuple of the path to be passed to the decoder, and a binary file object to write the audio to
+        """
+        pass
+
+    @abstractmethod
+    def release(self, path):
+        pass
+
+    @abstractmethod
+    def isInMemory(self):
+        pass
+
+    def onFileComplete(self, size):
+        if self.isInMemory():
+            self.savedCounter.inc(size)
+
+
+class DirectoryAudioStorage(AudioStorage):
+    def __init__(self, directory, inMemory):
+        super().__init__()
+        self.directory = directory
+        self.inMemory = inMemory
+
+    def create(self, filename):
+        path = "{directory}/{filename}".format(directory=self.directory, filename=filename)
+        return path, open(path, "wb")
+
+    def release(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def isInMemory(self):
+        return self.inMemory
+
+
+class MemfdAudioStorage(AudioStorage):
+    """
+    Stores the audio in anonymous memory files. The decoders get the file by a symlink to the file descriptor in
+    /proc, since the name of the symlink carries the timestamp.
+    """
+
+    @staticmethod
+    def isAvailable():
+        if not hasattr(os, "memfd_create") or not os.path.isdir("/proc/self/fd"):
+            return False
+        try:
+            os.close(os.memfd_create("openwebrx-test", os.MFD_CLOEXEC))
+            return True
+        except OSError:
+            return False
+
+    def __init__(self, linkDirectory):
+        super().__init__()
+        self.linkDirectory = linkDirectory
+        self.descriptors = {}
+        self.lock = threading.Lock()
+
+    def create(self, filename):
+        path = "{directory}/{filename}".format(directory=self.linkDirectory, filename=filename)
+        fd = os.memfd_create(filename, os.MFD_CLOEXEC)
+        try:
+            # the decoders run as separate processes, so /proc/self won't work
+            os.symlink("/proc/{pid}/fd/{fd}".format(pid=os.getpid(), fd=fd), path)
+        except OSError:
+            os.close(fd)
+            raise
+        with self.lock:
+            self.descriptors[path] = fd
+        return path, open(fd, "wb", closefd=False)
+
+    def release(self, path):
+        with self.lock:
+            fd = self.descriptors.pop(path, None)
         try:
-            os.unlink(self.file)
+            os.unlink(path)
         except FileNotFoundError:
             pass
+        if fd is not None:
+            os.close(fd)
+
+    def isInMemory(self):
+        return True
 
 
 PoisonPill = object()
 
 
+class DecodingModeMetrics(object):
+    """
+    decoding queue metrics per mode: time spent waiting in the queue, missed deadlines, and the decoding depth in use
+    """
+
+    sharedInstances = {}
+    creationLock = threading.Lock()
+
+    # weight of a new measurement for the average queue wait time
+    waitTimeRate = 0.1
+
+    # depth reduction currently requested by the decoding queue
+    depthReduction = 0
+
+    @staticmethod
+    def getSharedInstance(mode):
+        with DecodingModeMetrics.creationLock:
+            if mode not in DecodingModeMetrics.sharedInstances:
+                DecodingModeMetrics.sharedInstances[mode] = DecodingModeMetrics(mode)
+        return DecodingModeMetrics.sharedInstances[mode]
+
+    @staticmethod
+    def setDepthReduction(reduction):
+        DecodingModeMetrics.depthReduction = reduction
+
+    def __init__(self, mode):
+        self.waitTime = 0
+        # callable that returns the decoding depth of the mode for a given depth reduction
+        self.depthFunction = None
+        metrics = Metrics.getSharedInstance()
+        prefix = "decoding.modes.{mode}".format(mode=mode.lower())
+        metrics.addMetric(prefix + ".queue_wait_seconds", DirectMetric(lambda: self.waitTime))
+        self.missedCounter = CounterMetric()
+        metrics.addMetric(prefix + ".missed_deadlines", self.missedCounter)
+        metrics.addMetric(prefix + ".depth", DirectMetric(self.getDepth))
+
+    def addWaitTime(self, seconds):
+        rate = DecodingModeMetrics.waitTimeRate
+        self.waitTime = (1 - rate) * self.waitTime + rate * seconds
+
+    def onDeadlineMissed(self):
+        self.missedCounter.inc()
+
+    def setDepthFunction(self, depthFunction):
+        self.depthFunction = depthFunction
+
+    def getDepth(self):
+        if self.depthFunction is None:
+            return 0
+        return self.depthFunction(DecodingModeMetrics.depthReduction) or 0
+
+
+class SystemCpuLoad(object):
+    """
+    keeps track of the idle cpu capacity of the system, as reported in /proc/stat
+    """
+
+    # minimum number of seconds between two readings of /proc/stat
+    sampleInterval = 1
+
+    def __init__(self):
+        self.cores = os.cpu_count() or 1
+        self.lastSample = self._readStat()
+        self.lastSampleTime = time.monotonic()
+        # assume an idle system until we know better
+        self.idleCores = self.cores
+        self.lock = threading.Lock()
+
+    def _readStat(self):
+        try:
+            with open("/proc/stat", "r") as f:
+                # first line: "cpu  user nice system idle iowait irq softirq steal ..."
+                values = [int(v) for v in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle = sum(values[3:5])
+        return sum(values), idle
+
+    def getIdleCores(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.lastSampleTime >= SystemCpuLoad.sampleInterval:
+                sample = self._readStat()
+                if sample is not None and self.lastSample is not None and sample[0] > self.lastSample[0]:
+                    total = sample[0] - self.lastSample[0]
+                    idle = sample[1] - self.lastSample[1]
+                    self.idleCores = self.cores * idle / total
+                self.lastSample = sample
+                self.lastSampleTime = now
+            return self.idleCores
+
+
 class QueueWorker(threading.Thread):
     def __init__(self, queue):
         self.queue = queue
@@ -44,32 +275,70 @@ class QueueWorker(threading.Thread):
 
     def run(self) -> None:
         while self.doRun:
-            job = self.queue.get()
+            try:
+                job = self.queue.get(timeout=DecoderQueue.workerIdleTimeout)
+            except Empty:
+                if self.queue.retireWorker(self):
+                    self.doRun = False
+                continue
             if job is PoisonPill:
                 self.doRun = False
+            elif job.isExpired():
+                self.queue.onDeadlineMissed(job)
+                job.unlink()
             else:
+                self.queue.onJobStarted(job)
                 try:
                     job.run()
                 except Exception:
                     logger.exception("failed to decode job")
                     self.queue.onError()
                 finally:
+                    self.queue.onJobFinished()
                     job.unlink()
 
             self.queue.task_done()
 
 
-class DecoderQueue(Queue):
+class DecoderQueue(PriorityQueue):
+    """
+    Decoding jobs are processed in the order of their deadlines, so that long decoding intervals cannot delay the
+    decoding of short intervals beyond their usefulness. Jobs that have missed their deadline are dropped.
+
+    When the queue is backed up, the decoding depth is reduced step by step, and raised again once the queue has been
+    drained. Changes are at least depthHoldTime seconds apart to prevent flapping.
+
+    The number of workers floats between minWorkers and maxWorkers. Workers are added while jobs are waiting and the
+    system has idle cpu cores. Since decoding jobs come in bursts at the interval boundaries, idle workers are only
+    retired when they haven't been needed for the bursts seen in the last burstMemory seconds. When a job is started
+    without anything waiting, decoders that can use multiple threads may use the idle cores.
+    """
+
     sharedInstance = None
     creationLock = threading.Lock()
 
+    # maximum number of steps the decoding depth is lowered by
+    maxDepthReduction = 2
+    # minimum number of seconds between two changes of the decoding depth
+    depthHoldTime = 30
+    # seconds after which an idle worker checks whether it is still needed
+    workerIdleTimeout = 30
+    # jobs that are queued within this number of seconds of each other belong to the same burst
+    burstWindow = 2
+    # seconds for which a burst is considered when deciding on the number of workers
+    burstMemory = 300
+
     @staticmethod
     def getSharedInstance():
         with DecoderQueue.creationLock:
             if DecoderQueue.sharedInstance is None:
                 pm = Config.get()
                 DecoderQueue.sharedInstance = DecoderQueue(
-                    maxsize=pm["decoding_queue_length"], workers=pm["decoding_queue_workers"]
+                    maxsize=pm["decoding_queue_length"],
+                    workers=pm["decoding_queue_workers"],
+                    # 0 means one worker per cpu core
+                    maxWorkers=pm["decoding_queue_max_workers"] or os.cpu_count() or 1,
+                    adaptiveDepth=pm["decoding_adaptive_depth"],
                 )
         return DecoderQueue.sharedInstance
 
@@ -80,8 +349,23 @@ class DecoderQueue(Queue):
                 DecoderQueue.sharedInstance.stop()
                 DecoderQueue.sharedInstance = None
 
-    def __init__(self, maxsize, workers):
+    def __init__(self, maxsize, workers, maxWorkers=None, adaptiveDepth=True):
         super().__init__(maxsize)
+        self.minWorkers = workers
+        self.maxWorkers = workers if maxWorkers is None else max(workers, maxWorkers)
+        self.cpuLoad = SystemCpuLoad()
+        self.workersLock = threading.Lock()
+        self.doRun = True
+        self.running = 0
+        # (start, size) of recent bursts of jobs
+        self.bursts = []
+        self.sequence = itertools.count()
+        self.adaptiveDepth = adaptiveDepth
+        # queue length at which the queue is considered to be backed up
+        self.highWatermark = max(1, maxsize // 2) if maxsize > 0 else max(1, workers * 2)
+        self.depthReduction = 0
+        self.lastDepthChange = 0
+        self.depthLock = threading.Lock()
         metrics = Metrics.getSharedInstance()
         metrics.addMetric("decoding.queue.length", DirectMetric(self.qsize))
         self.inCounter = CounterMetric()
@@ -92,6 +376,11 @@ class DecoderQueue(Queue):
         metrics.addMetric("decoding.queue.overflow", self.overflowCounter)
         self.errorCounter = CounterMetric()
         metrics.addMetric("decoding.queue.error", self.errorCounter)
+        self.missedCounter = CounterMetric()
+        metrics.addMetric("decoding.queue.missed_deadlines", self.missedCounter)
+        metrics.addMetric("decoding.queue.depth_reduction", DirectMetric(self.getDepthReduction))
+        metrics.addMetric("decoding.queue.workers", DirectMetric(self.getWorkerCount))
+        metrics.addMetric("decoding.queue.running", DirectMetric(lambda: self.running))
         self.workers = [self.newWorker() for _ in range(0, workers)]
 
     def stop(self):
@@ -105,25 +394,115 @@ class DecoderQueue(Queue):
         except Empty:
             pass
         # put() a PoisonPill for all active workers to shut them down
-        for w in self.workers:
+        with self.workersLock:
+            # no more retiring or adding of workers from here on, so that every worker gets exactly one PoisonPill
+            self.doRun = False
+            workers = list(self.workers)
+        for w in workers:
             if w.is_alive():
-                self.put(PoisonPill)
+                # there may be more workers than the queue has room for, so this needs to wait for the workers
+                self.inCounter.inc()
+                super(DecoderQueue, self).put((math.inf, next(self.sequence), PoisonPill))
         self.join()
 
     def put(self, item, **kwars):
         self.inCounter.inc()
+        item.queued = time.monotonic()
         try:
-            super(DecoderQueue, self).put(item, block=False)
+            super(DecoderQueue, self).put((item.deadline, next(self.sequence), item), block=False)
         except Full:
             self.overflowCounter.inc()
             raise
+        self._recordBurst(item.queued)
+        self._scaleUp()
 
     def get(self, **kwargs):
         # super.get() is blocking, so it would mess up the stats to inc() first
-        out = super(DecoderQueue, self).get(**kwargs)
+        _, _, out = super(DecoderQueue, self).get(**kwargs)
         self.outCounter.inc()
+        if out is not PoisonPill:
+            DecodingModeMetrics.getSharedInstance(out.getMode()).addWaitTime(time.monotonic() - out.queued)
+            self._adjustDepth(self.qsize() >= self.highWatermark, self.qsize() == 0)
         return out
 
+    def _adjustDepth(self, backedUp, drained):
+        if not self.adaptiveDepth:
+            return
+        now = time.monotonic()
+        with self.depthLock:
+            if now - self.lastDepthChange < DecoderQueue.depthHoldTime:
+                return
+            if backedUp and self.depthReduction < DecoderQueue.maxDepthReduction:
+                self.depthReduction += 1
+            elif drained and self.depthReduction > 0:
+                self.depthReduction -= 1
+            else:
+                return
+            self.lastDepthChange = now
+            DecodingModeMetrics.setDepthReduction(self.depthReduction)
+            logger.info("decoding queue load has changed; decoding depth reduction is now %i", self.depthReduction)
+
+    def getDepthReduction(self):
+        return self.depthReduction
+
+    def _recordBurst(self, now):
+        with self.workersLock:
+            self.bursts = [b for b in self.bursts if now - b[0] < DecoderQueue.burstMemory]
+            if self.bursts and now - self.bursts[-1][0] < DecoderQueue.burstWindow:
+                start, size = self.bursts[-1]
+                self.bursts[-1] = (start, size + 1)
+            else:
+                self.bursts.append((now, 1))
+
+    def _getBurstWorkers(self):
+        # the number of workers needed to handle recent bursts in parallel
+        if not self.bursts:
+            return 0
+        return max(size for _, size in self.bursts)
+
+    def _scaleUp(self):
+        with self.workersLock:
+            if not self.doRun or len(self.workers) >= self.maxWorkers:
+                return
+            idleWorkers = len(self.workers) - self.running
+            if self.qsize() <= idleWorkers:
+                return
+            if len(self.workers) >= self.minWorkers and self.cpuLoad.getIdleCores() < 1:
+                # more workers would only compete for the cpu with the ones we already have
+                return
+            logger.debug("adding decoding worker; now running %i workers", len(self.workers) + 1)
+            self.workers.append(self.newWorker())
+
+    def retireWorker(self, worker):
+        """
+        called by idle workers; returns True if the worker should shut down
+        """
+        with self.workersLock:
+            self.bursts = [b for b in self.bursts if time.monotonic() - b[0] < DecoderQueue.burstMemory]
+            target = min(max(self.minWorkers, self._getBurstWorkers()), self.maxWorkers)
+            if not self.doRun or len(self.workers) <= target:
+                return False
+            self.workers.remove(worker)
+            logger.debug("retiring idle decoding worker; now running %i workers", len(self.workers))
+            return True
+
+    def getWorkerCount(self):
+        with self.workersLock:
+            return len(self.workers)
+
+    def onJobStarted(self, job):
+        with self.workersLock:
+            self.running += 1
+            running = self.running
+        maxThreads = job.decoder.profile.getMaxThreads()
+        if maxThreads > 1 and self.empty():
+            # nothing else is waiting, so the idle cores can be shared by the running jobs
+            job.threads = max(1, min(maxThreads, int(self.cpuLoad.getIdleCores() / running)))
+
+    def onJobFinished(self):
+        with self.workersLock:
+            self.running -= 1
+
     def newWorker(self):
         worker = QueueWorker(self)
         worker.start()
@@ -132,6 +511,13 @@ class DecoderQueue(Queue):
     def onError(self):
         self.errorCounter.inc()
 
+    def onDeadlineMissed(self, job):
+        logger.debug("dropping %s job that has missed its deadline", job.getMode())
+        self.missedCounter.inc()
+        DecodingModeMetrics.getSharedInstance(job.getMode()).onDeadlineMissed()
+        # a missed deadline is the strongest sign of overload there is
+        self._adjustDepth(True, False)
+
 
 class AudioChopperProfile(ABC):
     @abstractmethod
@@ -144,84 +530,231 @@ class AudioChopperProfile(ABC):
 
     @abstractmethod
     def decoder_commandline(self, file):
+        """
+        profiles that return more than 1 from getMaxThreads() need to accept an additional threads argument, and
+        profiles that return a decoding_depth() need to accept an additional depth argument
+        """
         pass
 
+    def decoding_depth(self, reduction=0):
+        """
+        decoding depth to use while the decoding queue asks for the given reduction, or None if the decoder does not
+        have a depth setting
+        """
+        return None
+
+    def getMaxThreads(self):
+        """
+        maximum number of threads the decoder can make use of
+        """
+        return 1
+
+    @abstractmethod
+    def getMode(self):
+        pass
+
+    def supportsAudioOffset(self):
+        """
+        decoders that can be restricted to a part of the audio band can share a demodulator with other decoders
+        """
+        return False
+
+    def setAudioRange(self, low, high):
+        pass
+
+
+class DecodingResult(object):
+    """
+    the output of one decoding job: all lines the decoder has produced for one file
+    """
+
+    __slots__ = ["profile", "freq", "lines"]
+
+    def __init__(self, profile, freq, lines):
+        self.profile = profile
+        self.freq = freq
+        self.lines = lines
+
+
+class AudioRingBuffer(object):
+    """
+    Keeps the most recent samples of an audio stream. Samples are addressed by their index since the start of the
+    stream.
+    """
+
+    # 16 bit samples
+    sampleSize = 2
+
+    def __init__(self, samples):
+        self.size = samples * AudioRingBuffer.sampleSize
+        self.buffer = bytearray(self.size)
+        # number of bytes written in total
+        self.written = 0
+
+    def getTotal(self):
+        """
+        number of samples written since the start of the stream
+        """
+        return self.written // AudioRingBuffer.sampleSize
+
+    def getOldest(self):
+        """
+        index of the oldest sample that is still available
+        """
+        return max(0, self.written - self.size) // AudioRingBuffer.sampleSize
+
+    def write(self, data):
+        if len(data) > self.size:
+            self.written += len(data) - self.size
+            data = data[-self.size :]
+        pos = self.written % self.size
+        first = min(len(data), self.size - pos)
+        self.buffer[pos : pos + first] = data[:first]
+        self.buffer[: len(data) - first] = data[first:]
+        self.written += len(data)
+
+    def getRange(self, start, end):
+        """
+        returns the samples from start to end (exclusive) as bytes. samples that are not available are filled with
+        silence.
+        """
+        size = AudioRingBuffer.sampleSize
+        available = (max(start, self.getOldest()) * size, min(end, self.getTotal()) * size)
+        if available[0] >= available[1]:
+            return bytes((end - start) * size)
+        data = bytearray((available[0] // size - start) * size)
+        pos = available[0]
+        while pos < available[1]:
+            offset = pos % self.size
+            chunk = min(available[1] - pos, self.size - offset)
+            data += self.buffer[offset : offset + chunk]
+            pos += chunk
+        data += bytes((end - start) * size - len(data))
+        return bytes(data)
+
 
 class AudioWriter(object):
-    def __init__(self, dsp, source, profile: AudioChopperProfile):
+    """
+    Cuts the intervals of one profile out of the audio stream of an AudioChopper, and queues them for decoding.
+    """
+
+    # an interval needs to have at least this share of audio to be worth decoding
+    minimumCoverage = 0.5
+
+    def __init__(self, dsp, source, profile: AudioChopperProfile, output):
+        """
+        :param output: callable that receives a DecodingResult for every decoded file
+        """
         self.dsp = dsp
         self.source = source
         self.profile = profile
+        self.output = output
         self.tmp_dir = CoreConfig().get_temporary_directory()
-        self.wavefile = None
-        self.wavefilename = None
-        self.switchingLock = threading.Lock()
-        self.timer = None
-        (self.outputReader, self.outputWriter) = Pipe()
-
-    def getWaveFile(self):
-        filename = "{tmp_dir}/openwebrx-audiochopper-{id}-{timestamp}.wav".format(
-            tmp_dir=self.tmp_dir,
+        self.storage = AudioStorage.getSharedInstance()
+        DecodingModeMetrics.getSharedInstance(profile.getMode()).setDepthFunction(profile.decoding_depth)
+        # wall clock time and sample index of the end of the current interval
+        self.cutTime = None
+        self.cutSample = None
+
+    def getNextDecodingTime(self, now):
+        """
+        returns the end of the interval that is running at the given unix timestamp. intervals are aligned to the
+        full hour.
+        """
+        hour = now - now % 3600
+        interval = self.profile.getInterval()
+        return hour + (int((now - hour) / interval) + 1) * interval
+
+    def schedule(self, anchor, now):
+        """
+        :param anchor: the unix timestamp of the first sample of the stream
+        :param now: the current unix timestamp
+        """
+        # a new anchor keeps the pending cut, unless the stream has fallen behind by a whole interval
+        if self.cutTime is None or now - self.cutTime >= self.profile.getInterval():
+            self.cutTime = self.getNextDecodingTime(now)
+        self.cutSample = round((self.cutTime - anchor) * AudioChopper.sampleRate)
+        logger.debug("scheduling: %s", datetime.utcfromtimestamp(self.cutTime))
+
+    def process(self, buffer: AudioRingBuffer, anchor):
+        """
+        cuts all intervals that are complete in the buffer
+        """
+        interval = self.profile.getInterval()
+        while buffer.getTotal() >= self.cutSample:
+            start = self.cutSample - round(interval * AudioChopper.sampleRate)
+            if self.cutSample - max(start, 0) >= (self.cutSample - start) * AudioWriter.minimumCoverage:
+                self.queueFile(self.cutTime - interval, buffer.getRange(start, self.cutSample))
+            self.cutTime += interval
+            self.cutSample = round((self.cutTime - anchor) * AudioChopper.sampleRate)
+
+    def close(self):
+        """
+        called when the audio stream has ended
+        """
+        pass
+
+    def createFile(self, start):
+        """
+        :param start: the unix timestamp of the start of the interval
+        :return: a tuple of the path, the underlying file and the wave file to write the audio to
+        """
+        filename = "openwebrx-audiochopper-{id}-{timestamp}.wav".format(
             id=id(self),
-            timestamp=datetime.utcnow().strftime(self.profile.getFileTimestampFormat()),
+            timestamp=datetime.utcfromtimestamp(start).strftime(self.profile.getFileTimestampFormat()),
         )
-        wavefile = wave.open(filename, "wb")
+        path, rawfile = self.storage.create(filename)
+        wavefile = wave.open(rawfile, "wb")
         wavefile.setnchannels(1)
-        wavefile.setsampwidth(2)
-        wavefile.setframerate(12000)
-        return filename, wavefile
-
-    def getNextDecodingTime(self):
-        t = datetime.utcnow()
-        zeroed = t.replace(minute=0, second=0, microsecond=0)
-        delta = t - zeroed
-        interval = self.profile.getInterval()
-        seconds = (int(delta.total_seconds() / interval) + 1) * interval
-        t = zeroed + timedelta(seconds=seconds)
-        logger.debug("scheduling: {0}".format(t))
-        return t
-
-    def cancelTimer(self):
-        if self.timer:
-            self.timer.cancel()
-            self.timer = None
-
-    def _scheduleNextSwitch(self):
-        self.cancelTimer()
-        delta = self.getNextDecodingTime() - datetime.utcnow()
-        self.timer = threading.Timer(delta.total_seconds(), self.switchFiles)
-        self.timer.start()
-
-    def switchFiles(self):
-        with self.switchingLock:
-            file = self.wavefile
-            filename = self.wavefilename
-            (self.wavefilename, self.wavefile) = self.getWaveFile()
-
-        file.close()
-        job = QueueJob(self, filename, self.dsp.get_operating_freq())
+        wavefile.setsampwidth(AudioRingBuffer.sampleSize)
+        wavefile.setframerate(AudioChopper.sampleRate)
+        return path, rawfile, wavefile
+
+    def queueFile(self, start, data):
+        path, rawfile, wavefile = self.createFile(start)
+        wavefile.writeframes(data)
+        self.completeFile(path, rawfile, wavefile)
+
+    def completeFile(self, path, rawfile, wavefile):
+        # closing the wave file only finalizes the header; the underlying file needs to be closed separately
+        wavefile.close()
+        self.storage.onFileComplete(rawfile.tell())
+        rawfile.close()
+
+        # the results of this job are useful until the next file is up for decoding
+        deadline = time.monotonic() + self.profile.getInterval()
+        job = QueueJob(self, path, self.dsp.get_operating_freq(), deadline)
+        queue = DecoderQueue.getSharedInstance()
+        job.depth = self.profile.decoding_depth(queue.getDepthReduction())
         try:
-            DecoderQueue.getSharedInstance().put(job)
+            queue.put(job)
         except Full:
             logger.warning("decoding queue overflow; dropping one file")
             job.unlink()
-        self._scheduleNextSwitch()
 
     def decode(self, job: QueueJob):
         logger.debug("processing file %s", job.file)
+        kwargs = {}
+        if job.threads > 1:
+            kwargs["threads"] = job.threads
+        if job.depth is not None:
+            kwargs["depth"] = job.depth
+        command = self.profile.decoder_commandline(job.file, **kwargs)
         decoder = subprocess.Popen(
-            ["nice", "-n", "10"] + self.profile.decoder_commandline(job.file),
+            ["nice", "-n", "10"] + command,
             stdout=subprocess.PIPE,
             cwd=self.tmp_dir,
             close_fds=True,
         )
+        # results are passed on in one batch per file so that they can be parsed in one go
+        result = DecodingResult(self.profile, job.freq, [])
         try:
-            for line in decoder.stdout:
-                self.outputWriter.send((self.profile, job.freq, line))
-        except (OSError, AttributeError):
-            decoder.stdout.flush()
-            # TODO uncouple parsing from the output so that decodes can still go to the map and the spotters
-            logger.debug("output has gone away while decoding job.")
+            result.lines.extend(decoder.stdout)
+        finally:
+            decoder.stdout.close()
+            # a failing decoder may still have produced some results
+            if result.lines:
+                self.output(result)
         try:
             rc = decoder.wait(timeout=10)
             if rc != 0:
@@ -231,72 +764,173 @@ class AudioWriter(object):
             decoder.kill()
             raise
 
-    def start(self):
-        (self.wavefilename, self.wavefile) = self.getWaveFile()
-        self._scheduleNextSwitch()
 
-    def write(self, data):
-        with self.switchingLock:
-            self.wavefile.writeframes(data)
+class StreamingAudioWriter(AudioWriter):
+    """
+    AudioWriter for long intervals. The audio is appended to the file as it is received, so the ring buffer only needs
+    to hold the audio of the last read instead of the whole interval.
+    """
 
-    def stop(self):
-        self.outputWriter.close()
-        self.outputWriter = None
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # path, underlying file and wave file of the interval that is being recorded
+        self.file = None
+        # index of the next sample to be appended to the file
+        self.position = None
 
-        # drain messages left in the queue so that the queue can be successfully closed
-        # this is necessary since python keeps the file descriptors open otherwise
-        try:
-            while True:
-                self.outputReader.recv()
-        except EOFError:
-            pass
-        self.outputReader.close()
-        self.outputReader = None
+    def schedule(self, anchor, now):
+        cutTime = self.cutTime
+        super().schedule(anchor, now)
+        if self.file is not None and self.cutTime != cutTime:
+            # the stream has fallen behind by more than the interval that is being recorded
+            self.discardFile()
 
-        self.cancelTimer()
-        try:
-            self.wavefile.close()
-        except Exception:
-            logger.exception("error closing wave file")
-        try:
-            with self.switchingLock:
-                os.unlink(self.wavefilename)
-        except Exception:
-            logger.exception("error removing undecoded file")
-        self.wavefile = None
-        self.wavefilename = None
+    def process(self, buffer: AudioRingBuffer, anchor):
+        interval = self.profile.getInterval()
+        while True:
+            start = self.cutSample - round(interval * AudioChopper.sampleRate)
+            # an interval is only recorded if there is enough of it left when it is first seen
+            position = max(start, buffer.getOldest())
+            coverage = (self.cutSample - position) / (self.cutSample - start)
+            if self.file is None and coverage >= AudioWriter.minimumCoverage:
+                self.openFile(start, position)
+            if self.file is not None:
+                end = min(buffer.getTotal(), self.cutSample)
+                if end > self.position:
+                    self.file[2].writeframes(buffer.getRange(self.position, end))
+                    self.position = end
+            if buffer.getTotal() < self.cutSample:
+                return
+            if self.file is not None:
+                self.completeFile(*self.file)
+                self.file = None
+            self.cutTime += interval
+            self.cutSample = round((self.cutTime - anchor) * AudioChopper.sampleRate)
+
+    def openFile(self, start, position):
+        self.file = self.createFile(self.cutTime - self.profile.getInterval())
+        self.position = position
+        # the part of the interval that passed before the stream started is padded with silence, one second at a time
+        padding = position - start
+        while padding > 0:
+            chunk = min(padding, AudioChopper.sampleRate)
+            self.file[2].writeframes(bytes(chunk * AudioRingBuffer.sampleSize))
+            padding -= chunk
+
+    def discardFile(self):
+        path, rawfile, wavefile = self.file
+        self.file = None
+        wavefile.close()
+        rawfile.close()
+        self.storage.release(path)
+
+    def close(self):
+        if self.file is not None:
+            self.discardFile()
 
 
 class AudioChopper(threading.Thread, metaclass=ABCMeta):
+    """
+    Reads the audio for the decoders into a ring buffer, and lets the writers cut their intervals from it. Interval
+    boundaries are calculated as sample offsets from a wall clock anchor, so the cuts don't depend on any timers. The
+    anchor is reset as soon as the audio stream and the wall clock drift apart by more than one read, e.g. after a gap
+    in the stream.
+
+    Only intervals up to maxBufferedInterval are cut from the ring buffer; the writers of longer intervals append the
+    audio to their files as it is received.
+    """
+
+    sampleRate = 12000
+    # number of bytes read from the source in one go; 0.25 seconds of audio
+    readSize = 6000
+    # maximum drift between the audio stream and the wall clock before the anchor is reset, in seconds; one read
+    maxDrift = 0.25
+    # longest interval that is cut from the ring buffer, in seconds. longer intervals are streamed into their files,
+    # since FST4W-1800 alone would need 43 MB of buffer.
+    maxBufferedInterval = 60
+
     def __init__(self, dsp, source, *profiles: AudioChopperProfile):
         self.source = source
-        self.writers = [AudioWriter(dsp, source, p) for p in profiles]
+        self.results = Queue()
+        self.outputOpen = True
+        self.outputLock = threading.Lock()
+        self.writers = [
+            AudioWriter(dsp, source, p, self.onResult)
+            if p.getInterval() <= AudioChopper.maxBufferedInterval
+            else StreamingAudioWriter(dsp, source, p, self.onResult)
+            for p in profiles
+        ]
+        # keep enough audio for the longest buffered interval, plus some room for the last read
+        intervals = [p.getInterval() for p in profiles if p.getInterval() <= AudioChopper.maxBufferedInterval]
+        longest = max(intervals, default=0)
+        self.buffer = AudioRingBuffer(int((longest + 1) * AudioChopper.sampleRate))
+        self.anchor = None
         self.doRun = True
         super().__init__()
 
     def run(self) -> None:
         logger.debug("Audio chopper starting up")
-        for w in self.writers:
-            w.start()
+        # an odd number of bytes read would split a sample
+        remainder = b""
         while self.doRun:
             data = None
             try:
-                data = self.source.read(256)
+                data = self.source.read(AudioChopper.readSize)
             except ValueError:
                 pass
             if data is None or (isinstance(data, bytes) and len(data) == 0):
                 self.doRun = False
             else:
-                for w in self.writers:
-                    w.write(data)
+                data = remainder + data
+                usable = len(data) - len(data) % AudioRingBuffer.sampleSize
+                remainder = data[usable:]
+                self.buffer.write(data[:usable])
+                self.process()
 
         logger.debug("Audio chopper shutting down")
         for w in self.writers:
-            w.stop()
+            w.close()
+        with self.outputLock:
+            self.outputOpen = False
+            self.results.put(PoisonPill)
+
+    def process(self):
+        now = time.time()
+        total = self.buffer.getTotal()
+        if self.anchor is None or abs(now - self.anchor - total / AudioChopper.sampleRate) > AudioChopper.maxDrift:
+            if self.anchor is not None:
+                logger.debug("audio stream has drifted from the wall clock; resetting anchor")
+            # the last sample in the buffer has just been received
+            self.anchor = now - total / AudioChopper.sampleRate
+            for w in self.writers:
+                w.schedule(self.anchor, now)
+        for w in self.writers:
+            w.process(self.buffer, self.anchor)
+
+    def onResult(self, result: DecodingResult):
+        with self.outputLock:
+            # jobs that are still in the decoding queue may finish after shutdown; nobody is reading their results
+            if self.outputOpen:
+                self.results.put(result)
 
     def read(self):
-        try:
-            readers = wait([w.outputReader for w in self.writers])
-            return [r.recv() for r in readers]
-        except (EOFError, OSError):
+        """
+        blocks until decoding results are available, and returns all of them as a list of DecodingResult objects.
+        returns None once the chopper has shut down.
+        """
+        result = self.results.get()
+        if result is PoisonPill:
+            # keep the PoisonPill in place for subsequent calls
+            self.results.put(PoisonPill)
             return None
+        results = [result]
+        try:
+            while True:
+                result = self.results.get_nowait()
+                if result is PoisonPill:
+                    self.results.put(PoisonPill)
+                    break
+                results.append(result)
+        except Empty:
+            pass
+        return results
@@ -106,6 +106,13 @@ class Bandplan(object):
         else:
             return None
 
+    def findBandByName(self, name):
+        self._refresh()
+        for band in self.bands:
+            if band.getName() == name:
+                return band
+        return None
+
     def collectDialFrequencies(self, range):
         self._refresh()
         return [e for b in self.bands for e in b.getDialFrequencies(range)]
@@ -17,10 +17,12 @@ defaultConfig = PropertyLayer(
     audio_compression="adpcm",
     fft_compression="adpcm",
     wfm_deemphasis_tau=50e-6,
+    dsp_inprocess_tail=False,
     digimodes_enable=True,
     digimodes_fft_size=2048,
     digital_voice_unvoiced_quality=1,
     digital_voice_dmr_id_lookup=True,
+    digital_voice_dmr_id_online_lookup=True,
     # sdrs=...
     waterfall_scheme="GoogleTurboWaterfall",
     waterfall_levels=PropertyLayer(min=-88, max=-20),
@@ -30,8 +32,11 @@ defaultConfig = PropertyLayer(
     nmux_memory=50,
     google_maps_api_key="",
     map_position_retention_time=2 * 60 * 60,
+    map_update_window=500,
     decoding_queue_workers=2,
+    decoding_queue_max_workers=0,
     decoding_queue_length=10,
+    decoding_adaptive_depth=True,
     wsjt_decoding_depth=3,
     wsjt_decoding_depths=PropertyLayer(jt65=1),
     fst4_enabled_intervals=[15, 30],
@@ -41,6 +46,9 @@ defaultConfig = PropertyLayer(
     js8_decoding_depth=3,
     services_enabled=False,
     services_decoders=["ft8", "ft4", "wspr", "packet"],
+    services_activity_detection=False,
+    services_activity_threshold=6,
+    services_activity_timeout=900,
     aprs_callsign="N0CALL",
     aprs_igate_enabled=False,
     aprs_igate_server="euro.aprs2.net",
@@ -56,4 +64,6 @@ defaultConfig = PropertyLayer(
     pskreporter_antenna_information=None,
     wsprnet_enabled=False,
     wsprnet_callsign="N0CALL",
+    wsprnet_url="http://wsprnet.org/post/",
+    wsprnet_upload_workers=2,
 ).readonly()
@@ -8,7 +8,7 @@ from owrx.feature import FeatureDetector
 from owrx.version import openwebrx_version
 from owrx.bands import Bandplan
 from owrx.bookmarks import Bookmarks
-from owrx.map import Map
+from owrx.map import Map, Viewport
 from owrx.property import PropertyStack, PropertyDeleted
 from owrx.modes import Modes, DigitalMode
 from owrx.config import Config
@@ -396,8 +396,8 @@ class OpenWebRxReceiverClient(OpenWebRxClient, SdrSourceEventClient):
     def write_metadata(self, metadata):
         self.send({"type": "metadata", "value": metadata})
 
-    def write_wsjt_message(self, message):
-        self.send({"type": "wsjt_message", "value": message})
+    def write_wsjt_messages(self, messages):
+        self.send({"type": "wsjt_messages", "value": messages})
 
     def write_dial_frequencies(self, frequencies):
         self.send({"type": "dial_frequencies", "value": frequencies})
@@ -471,17 +471,25 @@ class MapConnection(OpenWebRxClient):
             "map_position_retention_time",
             "receiver_name",
         )
-        filtered_config.wire(self.write_config)
+        self.configSub = filtered_config.wire(self.write_config)
 
         self.write_config(filtered_config.__dict__())
 
         Map.getSharedInstance().addClient(self)
 
     def handleTextMessage(self, conn, message):
-        pass
+        try:
+            message = json.loads(message)
+            if "type" in message and message["type"] == "viewport" and "value" in message:
+                Map.getSharedInstance().setViewport(self, Viewport.fromJson(message["value"]))
+        except json.JSONDecodeError:
+            logger.warning("message is not json: {0}".format(message))
+        except (KeyError, TypeError, ValueError):
+            logger.warning("invalid viewport: {0}".format(message))
 
     def close(self):
         Map.getSharedInstance().removeClient(self)
+        self.configSub.cancel()
         super().close()
 
     def write_config(self, cfg):
@@ -490,6 +498,22 @@ class MapConnection(OpenWebRxClient):
     def write_update(self, update):
         self.mp_send({"type": "update", "value": update})
 
+    def write_serialized_update(self, update):
+        """
+        :param update: the update array, already serialized to json
+        """
+        self.mp_send('{"type": "update", "value": ' + update + "}")
+
+    def write_removal(self, callsigns):
+        self.mp_send({"type": "remove", "value": callsigns})
+
+    def write_snapshot(self, positions):
+        # the snapshot can span many messages; they are sent directly so they don't fill up the queue
+        self.send({"type": "snapshot", "value": positions})
+
+    def write_aggregates(self, aggregates, reset=False):
+        self.mp_send({"type": "aggregates", "value": aggregates, "reset": reset})
+
 
 class WebSocketMessageHandler(object):
     def __init__(self):
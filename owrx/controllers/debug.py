@@ -0,0 +1,14 @@
+from . import Controller
+from csdr.decimation import DecimationPlanner
+from owrx.service.cost import ResamplingCostModel
+import json
+
+
+class DebugController(Controller):
+    def decimationAction(self):
+        data = json.dumps(DecimationPlanner.getSharedInstance().getPlans())
+        self.send_response(data, content_type="application/json")
+
+    def resamplingAction(self):
+        data = json.dumps(ResamplingCostModel.getSharedInstance().getState())
+        self.send_response(data, content_type="application/json")
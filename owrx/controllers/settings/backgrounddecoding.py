@@ -1,5 +1,5 @@
 from owrx.controllers.settings import SettingsFormController, Section
-from owrx.form import CheckboxInput, ServicesCheckboxInput
+from owrx.form import CheckboxInput, ServicesCheckboxInput, NumberInput
 
 
 class BackgroundDecodingController(SettingsFormController):
@@ -16,4 +16,25 @@ class BackgroundDecodingController(SettingsFormController):
                 ),
                 ServicesCheckboxInput("services_decoders", "Enabled services"),
             ),
+            Section(
+                "Band activity detection",
+                CheckboxInput(
+                    "services_activity_detection",
+                    "Suspend decoders on frequencies without signals",
+                    infotext="The activity is detected from the spectrum, so the decoders will only be resumed when a "
+                    + "signal is visible in the waterfall",
+                ),
+                NumberInput(
+                    "services_activity_threshold",
+                    "Detection threshold",
+                    infotext="Level above the noise floor that counts as activity",
+                    append="dB",
+                ),
+                NumberInput(
+                    "services_activity_timeout",
+                    "Suspend after",
+                    infotext="Decoders are suspended when no activity has been detected for this amount of time",
+                    append="s",
+                ),
+            ),
         ]
@@ -26,6 +26,12 @@ class DecodingSettingsController(SettingsFormController):
                     infotext='See <a href="https://en.wikipedia.org/wiki/FM_broadcasting#Pre-emphasis_and_de-emphasis"'
                     + ' target="_blank">this Wikipedia article</a> for more information',
                 ),
+                CheckboxInput(
+                    "dsp_inprocess_tail",
+                    "Demodulate analog modes in-process",
+                    infotext="Runs demodulation, deemphasis, AGC and resampling of FM, AM and SSB inside OpenWebRX"
+                    + " instead of a chain of csdr processes. Requires NumPy.",
+                ),
             ),
             Section(
                 "Digital voice",
@@ -40,6 +46,12 @@ class DecodingSettingsController(SettingsFormController):
                     'Enable lookup of DMR ids in the <a href="https://www.radioid.net/" target="_blank">'
                     + "radioid</a> database to show callsigns and names",
                 ),
+                CheckboxInput(
+                    "digital_voice_dmr_id_online_lookup",
+                    "Look up DMR ids online if they are not in the offline database",
+                    infotext="The offline database can be imported from the radioid user CSV dump with"
+                    + " <code>openwebrx-admin importradioid</code>",
+                ),
             ),
             Section(
                 "Digimodes",
@@ -48,8 +60,20 @@ class DecodingSettingsController(SettingsFormController):
             ),
             Section(
                 "Decoding settings",
-                NumberInput("decoding_queue_workers", "Number of decoding workers"),
+                NumberInput("decoding_queue_workers", "Minimum number of decoding workers"),
+                NumberInput(
+                    "decoding_queue_max_workers",
+                    "Maximum number of decoding workers",
+                    infotext="Additional workers are started while decoding jobs are waiting and there is idle cpu"
+                    + " capacity.<br />Set to 0 to allow one worker per cpu core",
+                ),
                 NumberInput("decoding_queue_length", "Maximum length of decoding job queue"),
+                CheckboxInput(
+                    "decoding_adaptive_depth",
+                    "Reduce the decoding depth while the decoding queue is backed up",
+                    infotext="Lowers the WSJT decoding depth temporarily when decoding jobs start piling up, so that"
+                    + " jobs can be decoded before their results become stale",
+                ),
                 NumberInput(
                     "wsjt_decoding_depth",
                     "Default WSJT decoding depth",
@@ -147,6 +147,13 @@ class GeneralSettingsController(SettingsFormController):
                     infotext="Specifies how log markers / grids will remain visible on the map",
                     append="s",
                 ),
+                NumberInput(
+                    "map_update_window",
+                    "Map update interval",
+                    infotext="Updates to the map are collected for this time and sent to the map clients at once."
+                    + "<br />Set to 0 to send every update immediately",
+                    append="ms",
+                ),
             ),
         ]
 
@@ -83,5 +83,10 @@ class ReportingController(SettingsFormController):
                     "wsprnet callsign",
                     infotext="This callsign will be used to send spots to wsprnet.org",
                 ),
+                NumberInput(
+                    "wsprnet_upload_workers",
+                    "Concurrent uploads",
+                    infotext="Number of spots that are uploaded to wsprnet.org in parallel",
+                ),
             ),
         ]
@@ -10,6 +10,7 @@ from owrx.property import PropertyStack, PropertyLayer, PropertyValidator
 from owrx.property.validators import OrValidator, RegexValidator, BoolValidator
 from owrx.modes import Modes
 from owrx.config.core import CoreConfig
+from owrx.feature import FeatureDetector
 from csdr import csdr
 import threading
 import re
@@ -76,6 +77,7 @@ class DspManager(csdr.output, SdrSourceEventClient):
                 "start_mod",
                 "start_freq",
                 "wfm_deemphasis_tau",
+                "dsp_inprocess_tail",
             ),
         )
 
@@ -92,6 +94,9 @@ class DspManager(csdr.output, SdrSourceEventClient):
             bpf[1] = cut
             self.dsp.set_bpf(*bpf)
 
+        def set_inprocess_tail(flag):
+            self.dsp.set_inprocess_tail(flag and FeatureDetector().is_available("inprocess_dsp"))
+
         def set_dial_freq(changes):
             if (
                 "center_freq" not in self.props
@@ -134,6 +139,7 @@ class DspManager(csdr.output, SdrSourceEventClient):
             self.props.wireProperty("digital_voice_unvoiced_quality", self.dsp.set_unvoiced_quality),
             self.props.wireProperty("dmr_filter", self.dsp.set_dmr_filter),
             self.props.wireProperty("wfm_deemphasis_tau", self.dsp.set_wfm_deemphasis_tau),
+            self.props.wireProperty("dsp_inprocess_tail", set_inprocess_tail),
             self.props.filter("center_freq", "offset_freq").wire(set_dial_freq),
         ]
 
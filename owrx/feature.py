@@ -85,6 +85,7 @@ class FeatureDetector(object):
         "drm": ["dream", "sox"],
         "gpsmic": ["gpsmic", "sox"], 
         "elt406": ["elt406", "sox"],
+        "inprocess_dsp": ["numpy"],
     }
 
     def feature_availability(self):
@@ -517,6 +518,18 @@ class FeatureDetector(object):
         """
         return self.command_is_runnable("js8")
 
+    def has_numpy(self):
+        """
+        The optional in-process demodulator for analog modes is implemented using the [NumPy](https://numpy.org/)
+        python library. It is available as a package for most Linux distributions (e.g. `python3-numpy`).
+        """
+        try:
+            import numpy
+
+            return True
+        except ImportError:
+            return False
+
     def has_alsa(self):
         """
         Some SDR receivers are identifying themselves as a soundcard. In order to read their data, OpenWebRX relies
@@ -74,6 +74,9 @@ class SpectrumThread(csdr.output, SdrSourceEventClient):
         self.subscriptions = []
 
     def getClientClass(self) -> SdrClientClass:
+        # background consumers of the spectrum (e.g. the band activity detection) should not keep the sdr running
+        if all(c.getClientClass() is SdrClientClass.INACTIVE for c in self.sdrSource.spectrumClients):
+            return SdrClientClass.INACTIVE
         return SdrClientClass.USER
 
     def onStateChange(self, state: SdrSourceState):
@@ -4,6 +4,7 @@ from owrx.controllers.assets import OwrxAssetsController, AprsSymbolsController,
 from owrx.controllers.websocket import WebSocketController
 from owrx.controllers.api import ApiController
 from owrx.controllers.metrics import MetricsController
+from owrx.controllers.debug import DebugController
 from owrx.controllers.settings import SettingsController
 from owrx.controllers.settings.general import GeneralSettingsController
 from owrx.controllers.settings.sdr import SdrDeviceListController, SdrDeviceController, SdrProfileController
@@ -110,6 +111,8 @@ class Router(object):
             StaticRoute("/api/features", ApiController),
             StaticRoute("/metrics", MetricsController, options={"action": "prometheusAction"}),
             StaticRoute("/metrics.json", MetricsController),
+            StaticRoute("/debug/decimation.json", DebugController, options={"action": "decimationAction"}),
+            StaticRoute("/debug/resampling.json", DebugController, options={"action": "resamplingAction"}),
             StaticRoute("/settings", SettingsController),
             StaticRoute("/settings/general", GeneralSettingsController),
             StaticRoute(
@@ -28,7 +28,8 @@ class Js8Profiles(object):
 
 
 class Js8Profile(AudioChopperProfile, metaclass=ABCMeta):
-    def decoding_depth(self):
+    def decoding_depth(self, reduction=0):
+        # js8 always decodes at the configured depth
         pm = Config.get()
         # return global default
         if "js8_decoding_depth" in pm:
@@ -39,8 +40,12 @@ class Js8Profile(AudioChopperProfile, metaclass=ABCMeta):
     def getFileTimestampFormat(self):
         return "%y%m%d_%H%M%S"
 
-    def decoder_commandline(self, file):
-        return ["js8", "--js8", "-b", self.get_sub_mode(), "-d", str(self.decoding_depth()), file]
+    def getMode(self):
+        return "JS8"
+
+    def decoder_commandline(self, file, depth=None):
+        depth = self.decoding_depth() if depth is None else depth
+        return ["js8", "--js8", "-b", self.get_sub_mode(), "-d", str(depth), file]
 
     @abstractmethod
     def get_sub_mode(self):
@@ -82,40 +87,43 @@ class Js8TurboProfile(Js8Profile):
 class Js8Parser(Parser):
     decoderRegex = re.compile(" ?<Decode(Started|Debug|Finished)>")
 
-    def parse(self, messages):
-        for raw in messages:
-            try:
-                profile, freq, raw_msg = raw
-                self.setDialFrequency(freq)
-                msg = raw_msg.decode().rstrip()
-                if Js8Parser.decoderRegex.match(msg):
-                    return
-                if msg.startswith(" EOF on input file"):
-                    return
-
-                frame = Js8().parse_message(msg)
-                self.handler.write_js8_message(frame, self.dial_freq)
-
-                self.pushDecode()
-
-                if (isinstance(frame, Js8FrameHeartbeat) or isinstance(frame, Js8FrameCompound)) and frame.grid:
-                    Map.getSharedInstance().updateLocation(
-                        frame.callsign, LocatorLocation(frame.grid), "JS8", self.band
-                    )
-                    ReportingEngine.getSharedInstance().spot(
-                        {
-                            "callsign": frame.callsign,
-                            "mode": "JS8",
-                            "locator": frame.grid,
-                            "freq": self.dial_freq + frame.freq,
-                            "db": frame.db,
-                            "timestamp": frame.timestamp,
-                            "msg": str(frame),
-                        }
-                    )
-
-            except Exception:
-                logger.exception("error while parsing js8 message")
+    def parse(self, results):
+        for result in results:
+            self.setDialFrequency(result.freq)
+            for raw_msg in result.lines:
+                self.parseMessage(raw_msg)
+
+    def parseMessage(self, raw_msg):
+        try:
+            msg = raw_msg.decode().rstrip()
+            if Js8Parser.decoderRegex.match(msg):
+                return
+            if msg.startswith(" EOF on input file"):
+                return
+
+            frame = Js8().parse_message(msg)
+            self.handler.write_js8_message(frame, self.dial_freq)
+
+            self.pushDecode()
+
+            if (isinstance(frame, Js8FrameHeartbeat) or isinstance(frame, Js8FrameCompound)) and frame.grid:
+                Map.getSharedInstance().updateLocation(
+                    frame.callsign, LocatorLocation(frame.grid), "JS8", self.band
+                )
+                ReportingEngine.getSharedInstance().spot(
+                    {
+                        "callsign": frame.callsign,
+                        "mode": "JS8",
+                        "locator": frame.grid,
+                        "freq": self.dial_freq + frame.freq,
+                        "db": frame.db,
+                        "timestamp": frame.timestamp,
+                        "msg": str(frame),
+                    }
+                )
+
+        except Exception:
+            logger.exception("error while parsing js8 message")
 
     def pushDecode(self):
         metrics = Metrics.getSharedInstance()
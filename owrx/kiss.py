@@ -86,6 +86,9 @@ IGLOGIN {callsign} {password}
 
 
 class KissClient(object):
+    # maximum number of bytes per read from the socket
+    readSize = 16384
+
     @staticmethod
     def getFreePort():
         # direwolf has some strange hardcoded port ranges
@@ -115,34 +118,54 @@ class KissClient(object):
                     raise
                 retries += 1
             time.sleep(delay)
+        self.deframer = KissDeframer()
 
     def read(self):
-        return self.socket.recv(1)
+        """
+        reads from the socket until at least one frame is complete
+
+        :return: list of ax25 frames, or None when the connection has been closed
+        """
+        while True:
+            data = self.socket.recv(KissClient.readSize)
+            if not data:
+                return None
+            frames = self.deframer.parse(data)
+            if frames:
+                return frames
 
 
 class KissDeframer(object):
+    fend = bytes([FEND])
+    fesc = bytes([FESC])
+    escapedFend = bytes([FESC, TFEND])
+    escapedFesc = bytes([FESC, TFESC])
+
     def __init__(self):
-        self.escaped = False
-        self.buf = bytearray()
+        # data of the frame that is still incomplete
+        self.buf = b""
 
     def parse(self, input):
+        chunks = (self.buf + input).split(KissDeframer.fend)
+        # everything after the last FEND belongs to a frame that hasn't been completed yet
+        self.buf = chunks.pop()
         frames = []
-        for b in input:
-            if b == FESC:
-                self.escaped = True
-            elif self.escaped:
-                if b == TFEND:
-                    self.buf.append(FEND)
-                elif b == TFESC:
-                    self.buf.append(FESC)
-                else:
-                    logger.warning("invalid escape char: %s", str(input[0]))
-                self.escaped = False
-            elif input[0] == FEND:
-                # data frames start with 0x00
-                if len(self.buf) > 1 and self.buf[0] == 0x00:
-                    frames += [self.buf[1:]]
-                self.buf = bytearray()
-            else:
-                self.buf.append(b)
+        for chunk in chunks:
+            # data frames start with 0x00
+            if len(chunk) > 1 and chunk[0] == 0x00:
+                frame = self.unescape(chunk[1:])
+                if frame is not None:
+                    frames.append(frame)
         return frames
+
+    def unescape(self, data):
+        if KissDeframer.fesc not in data:
+            return data
+        escapes = data.count(KissDeframer.escapedFend) + data.count(KissDeframer.escapedFesc)
+        if data.count(KissDeframer.fesc) != escapes:
+            logger.warning("invalid escape sequence in kiss frame; dropping frame")
+            return None
+        # FEND first; the FESC that is left over from an escaped FESC must not start a new escape sequence
+        return data.replace(KissDeframer.escapedFend, KissDeframer.fend).replace(
+            KissDeframer.escapedFesc, KissDeframer.fesc
+        )
@@ -1,9 +1,15 @@
-from datetime import datetime, timedelta
 from owrx.config import Config
-from owrx.bands import Band
+from owrx.config.core import CoreConfig
+from owrx.bands import Band, Bandplan
+from owrx.metrics import Metrics, CounterMetric
+from owrx.jsons import Encoder
 import threading
+import json
+import heapq
 import time
 import sys
+import os
+import gc
 
 import logging
 
@@ -15,10 +21,351 @@ class Location(object):
     def __dict__(self):
         return {}
 
+    def getSquare(self):
+        """
+        the four-character maidenhead grid square this location lies within, or None if it can't be determined
+        """
+        return None
+
+
+def squareFromLatLon(lat: float, lon: float):
+    x = min(max(int((lon + 180) / 2), 0), 179)
+    y = min(max(int(lat + 90), 0), 179)
+    return chr(65 + x // 10) + chr(65 + y // 10) + str(x % 10) + str(y % 10)
+
+
+def squareOrigin(square: str):
+    """
+    :return: (west, south) corner of a four-character grid square
+    """
+    return (ord(square[0]) - 65) * 20 - 180 + int(square[2]) * 2, (ord(square[1]) - 65) * 10 - 90 + int(square[3])
+
+
+def fieldOrigin(field: str):
+    """
+    :return: (west, south) corner of a two-character grid field
+    """
+    return (ord(field[0]) - 65) * 20 - 180, (ord(field[1]) - 65) * 10 - 90
+
+
+class Viewport(object):
+    """
+    the part of the map a client is looking at
+    """
+
+    __slots__ = ["south", "west", "north", "east", "zoom", "callsign"]
+
+    def __init__(self, south: float, west: float, north: float, east: float, zoom: int, callsign: str = None):
+        self.south = south
+        self.west = west
+        self.north = north
+        self.east = east
+        self.zoom = zoom
+        # a station the client wants to see even if it is not in view
+        self.callsign = callsign
+
+    @staticmethod
+    def fromJson(value):
+        return Viewport(
+            float(value["south"]),
+            float(value["west"]),
+            float(value["north"]),
+            float(value["east"]),
+            int(value["zoom"]),
+            value.get("callsign"),
+        )
+
+    def isAggregated(self):
+        return self.zoom < Map.aggregationZoom
+
+    def getLonRanges(self):
+        # the viewport may span the antimeridian
+        if self.west <= self.east:
+            return [(self.west, self.east)]
+        return [(self.west, 180), (-180, self.east)]
+
+    def intersects(self, west, south, width, height):
+        if south > self.north or south + height < self.south:
+            return False
+        return any(west <= east and west + width >= w for w, east in self.getLonRanges())
+
+    def containsSquare(self, square):
+        if square is None:
+            return True
+        west, south = squareOrigin(square)
+        return self.intersects(west, south, 2, 1)
+
+    def containsField(self, field):
+        west, south = fieldOrigin(field)
+        return self.intersects(west, south, 20, 10)
+
+    def getSquares(self):
+        """
+        all grid squares that intersect with the viewport
+        """
+        ys = range(min(max(int(self.south + 90), 0), 179), min(max(int(self.north + 90), 0), 179) + 1)
+        for west, east in self.getLonRanges():
+            xs = range(min(max(int((west + 180) / 2), 0), 179), min(max(int((east + 180) / 2), 0), 179) + 1)
+            for x in xs:
+                for y in ys:
+                    yield chr(65 + x // 10) + chr(65 + y // 10) + str(x % 10) + str(y % 10)
+
+    def countSquares(self):
+        rows = min(max(int(self.north + 90), 0), 179) - min(max(int(self.south + 90), 0), 179) + 1
+        columns = sum(
+            min(max(int((east + 180) / 2), 0), 179) - min(max(int((west + 180) / 2), 0), 179) + 1
+            for west, east in self.getLonRanges()
+        )
+        return rows * columns
+
+
+class MapPosition(object):
+    """
+    a single station on the map. there can be tens of thousands of these, so they don't carry an instance dict.
+    """
+
+    __slots__ = ["location", "updated", "mode", "band", "square"]
+
+    def __init__(self, location: Location, updated: float, mode: str, band: Band = None):
+        self.location = location
+        # unix timestamp in seconds
+        self.updated = updated
+        self.mode = mode
+        self.band = band
+        try:
+            self.square = location.getSquare()
+        except (ValueError, TypeError, IndexError):
+            self.square = None
+
+    def getBandName(self):
+        return self.band.getName() if self.band is not None else None
+
+    def toJson(self, callsign):
+        return {
+            "callsign": callsign,
+            "location": self.location.__dict__(),
+            "lastseen": self.updated * 1000,
+            "mode": self.mode,
+            "band": self.getBandName(),
+        }
+
+
+class FieldAggregate(object):
+    """
+    number of stations within a grid field, by mode and band
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.count = 0
+        self.modes = {}
+        self.bands = {}
+
+    def _count(self, counter, key, n):
+        counter[key] = counter.get(key, 0) + n
+        if not counter[key]:
+            del counter[key]
+
+    def add(self, record: MapPosition, n=1):
+        self.count += n
+        self._count(self.modes, record.mode, n)
+        self._count(self.bands, record.getBandName(), n)
+
+    def toJson(self):
+        return {
+            "field": self.field,
+            "count": self.count,
+            "modes": self.modes.copy(),
+            # json objects can't have null keys
+            "bands": {str(k) if k is not None else "": v for k, v in self.bands.items()},
+        }
+
+
+class SpatialIndex(object):
+    """
+    buckets the stations by grid square, and keeps count of the stations per grid field
+    """
+
+    def __init__(self):
+        self.squares = {}
+        self.fields = {}
+
+    def add(self, callsign, record: MapPosition):
+        self.squares.setdefault(record.square, set()).add(callsign)
+        if record.square is not None:
+            field = record.square[0:2]
+            if field not in self.fields:
+                self.fields[field] = FieldAggregate(field)
+            self.fields[field].add(record)
+
+    def remove(self, callsign, record: MapPosition):
+        bucket = self.squares.get(record.square)
+        if bucket is None:
+            return
+        bucket.discard(callsign)
+        if not bucket:
+            del self.squares[record.square]
+        if record.square is not None:
+            field = record.square[0:2]
+            self.fields[field].add(record, -1)
+            if not self.fields[field].count:
+                del self.fields[field]
+
+    def query(self, viewport: Viewport):
+        """
+        all callsigns within the viewport. walks the squares of the viewport or the occupied squares, whichever are
+        less.
+        """
+        if viewport.countSquares() <= len(self.squares):
+            squares = [s for s in viewport.getSquares() if s in self.squares]
+        else:
+            squares = [s for s in self.squares if viewport.containsSquare(s)]
+        if None in self.squares:
+            squares.append(None)
+        return [callsign for square in squares for callsign in self.squares[square]]
+
+    def getAggregates(self, viewport: Viewport = None, fields=None):
+        if fields is None:
+            fields = self.fields.keys()
+        return [
+            self.fields[f].toJson() if f in self.fields else {"field": f, "count": 0, "modes": {}, "bands": {}}
+            for f in fields
+            if viewport is None or viewport.containsField(f)
+        ]
+
+
+class MapStore(object):
+    """
+    Keeps the map positions on disk, so that the map is not empty after a restart. Changes are appended to a log as
+    json lines by a background thread. Once the log holds a lot more entries than there are positions, it is replaced
+    with a snapshot of the current positions.
+    """
+
+    # seconds between two writes to the log
+    writeInterval = 5
+    # minimum number of log entries before a compaction is considered
+    compactionThreshold = 10000
+
+    def __init__(self, path, getPositions):
+        """
+        :param getPositions: returns a list of (callsign, record) tuples of all current positions
+        """
+        self.path = path
+        self.getPositions = getPositions
+        self.pending = []
+        self.lock = threading.Lock()
+        # number of entries in the log
+        self.entries = 0
+        threading.Thread(target=self._writeLoop, daemon=True, name="map_store").start()
+
+    def load(self, cutoff):
+        """
+        reads the log in one go
+
+        :return: dict mapping callsigns to (updated, mode, band name, square, location data) tuples updated after the
+        cutoff
+        """
+        try:
+            with open(self.path, "r") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+        except OSError:
+            logger.exception("error reading map positions from %s", self.path)
+            return {}
+        lines = data.splitlines()
+        try:
+            entries = json.loads("[" + ",".join(lines) + "]")
+        except ValueError:
+            # the last line may be incomplete if we crashed while writing it. fall back to parsing line by line.
+            entries = []
+            for line in lines:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        self.entries = len(entries)
+        positions = {}
+        for entry in entries:
+            # removals only consist of the callsign
+            if len(entry) > 1 and entry[1] > cutoff:
+                positions[entry[0]] = tuple(entry[1:])
+            else:
+                positions.pop(entry[0], None)
+        return positions
+
+    def _serialize(self, callsign, record):
+        try:
+            location = record.location.__dict__()
+            entry = [callsign, record.updated, record.mode, record.getBandName(), record.square, location]
+            return json.dumps(entry, allow_nan=False, cls=Encoder)
+        except (TypeError, ValueError):
+            logger.warning("not storing position of %s since it cannot be serialized", callsign)
+            return None
+
+    def _serializeAll(self, updated):
+        lines = [self._serialize(callsign, record) for callsign, record in updated]
+        return [line for line in lines if line is not None]
+
+    def append(self, updated, removed):
+        """
+        queues changes for the log. does not touch the disk, so it can be called while holding locks.
+
+        :param updated: list of (callsign, record) tuples
+        :param removed: list of callsigns
+        """
+        with self.lock:
+            self.pending.append((updated, removed))
+
+    def _writeLoop(self):
+        while True:
+            time.sleep(MapStore.writeInterval)
+            try:
+                self.write()
+            except Exception:
+                logger.exception("error while storing map positions")
+
+    def write(self):
+        with self.lock:
+            pending = self.pending
+            self.pending = []
+        lines = []
+        for updated, removed in pending:
+            lines += self._serializeAll(updated)
+            lines += [json.dumps([callsign], cls=Encoder) for callsign in removed]
+        if lines:
+            try:
+                with open(self.path, "a") as f:
+                    f.write("\n".join(lines) + "\n")
+                self.entries += len(lines)
+            except OSError:
+                logger.exception("error writing map positions to %s", self.path)
+        if self.entries > MapStore.compactionThreshold:
+            positions = self.getPositions()
+            if self.entries > 2 * len(positions):
+                self.compact(positions)
+
+    def compact(self, positions):
+        logger.debug("compacting map positions; %i log entries, %i positions", self.entries, len(positions))
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write("".join(line + "\n" for line in self._serializeAll(positions)))
+            os.replace(tmp, self.path)
+            self.entries = len(positions)
+        except OSError:
+            logger.exception("error writing map positions to %s", self.path)
+
 
 class Map(object):
     sharedInstance = None
     creationLock = threading.Lock()
+    # seconds between two runs of the expiry
+    pruneInterval = 10
+    # clients zoomed out further than this get per-field aggregates instead of individual stations
+    aggregationZoom = 4
+    # number of positions per message when sending the positions within a viewport
+    snapshotChunkSize = 500
 
     @staticmethod
     def getSharedInstance():
@@ -28,99 +375,304 @@ class Map(object):
         return Map.sharedInstance
 
     def __init__(self):
-        self.clients = []
+        # maps the clients to their viewport. clients don't receive anything until they have sent one.
+        self.clients = {}
         self.positions = {}
+        self.index = SpatialIndex()
+        # (updated, callsign) tuples, ordered by the time of the update. entries that have been superseded by a later
+        # update are left in here and skipped when they come up.
+        self.expiry = []
+        # number of removals since the positions dict has last been rebuilt
+        self.removals = 0
         self.positionsLock = threading.Lock()
+        # changes are collected for the duration of the update window, and then sent to the clients all at once
+        self.pendingUpdates = {}
+        self.pendingRemovals = {}
+        self.pendingFields = set()
+        self.pendingBatches = 0
+        self.flushTimer = None
+
+        metrics = Metrics.getSharedInstance()
+        self.messagesSaved = CounterMetric()
+        metrics.addMetric("map.broadcast.messages_saved", self.messagesSaved)
+        self.updatesSuperseded = CounterMetric()
+        metrics.addMetric("map.broadcast.updates_superseded", self.updatesSuperseded)
+
+        self.store = MapStore(os.path.join(CoreConfig().get_data_directory(), "map.log"), self._getStoredPositions)
+        # the restore allocates hundreds of thousands of objects that all survive. the garbage collector would keep
+        # scanning them while they are being created, which more than doubles the time it takes.
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._restore()
+        except Exception:
+            logger.exception("error while restoring map positions")
+        finally:
+            if gcEnabled:
+                gc.enable()
 
         def removeLoop():
-            loops = 0
             while True:
                 try:
                     self.removeOldPositions()
                 except Exception:
                     logger.exception("error while removing old map positions")
-                loops += 1
-                # rebuild the positions dictionary every once in a while, it consumes lots of memory otherwise
-                if loops == 60:
-                    try:
-                        self.rebuildPositions()
-                    except Exception:
-                        logger.exception("error while rebuilding positions")
-                    loops = 0
-                time.sleep(60)
+                time.sleep(Map.pruneInterval)
 
         threading.Thread(target=removeLoop, daemon=True, name="map_removeloop").start()
         super().__init__()
 
+    def _restore(self):
+        cutoff = time.time() - Config.get()["map_position_retention_time"]
+        bandplan = Bandplan.getSharedInstance()
+        bands = {None: None}
+        with self.positionsLock:
+            for callsign, (updated, mode, band, square, location) in self.store.load(cutoff).items():
+                if band not in bands:
+                    bands[band] = bandplan.findBandByName(band)
+                record = MapPosition(StoredLocation(location, square), updated, mode, bands[band])
+                self.positions[callsign] = record
+                self.index.add(callsign, record)
+                self.expiry.append((updated, callsign))
+            heapq.heapify(self.expiry)
+        if self.positions:
+            logger.info("%i map positions restored", len(self.positions))
+
+    def _getStoredPositions(self):
+        with self.positionsLock:
+            return list(self.positions.items())
+
+    def _getClients(self, aggregated):
+        return [
+            (c, viewport)
+            for c, viewport in list(self.clients.items())
+            if viewport is not None and viewport.isAggregated() == aggregated
+        ]
+
     def broadcast(self, update):
-        for c in self.clients:
+        for c, _ in self._getClients(False):
             c.write_update(update)
 
+    def _publish(self, updated, removed, aggregates):
+        """
+        :param updated: list of (callsign, record) tuples
+        :param removed: list of callsigns
+        :param aggregates: dict of the current aggregates of all fields that have changed
+        """
+        if updated or removed:
+            # every position is serialized only once, no matter how many clients it is sent to
+            positions = []
+            for callsign, record in updated:
+                try:
+                    positions.append((record.square, json.dumps(record.toJson(callsign), allow_nan=False, cls=Encoder)))
+                except (TypeError, ValueError):
+                    logger.warning("not sending position of %s since it cannot be serialized", callsign)
+            everything = "[" + ",".join(p for _, p in positions) + "]"
+            for c, viewport in self._getClients(False):
+                update = [p for square, p in positions if viewport.containsSquare(square)]
+                if not update:
+                    pass
+                elif len(update) == len(positions):
+                    c.write_serialized_update(everything)
+                else:
+                    c.write_serialized_update("[" + ",".join(update) + "]")
+                if removed:
+                    c.write_removal(removed)
+        if aggregates:
+            for c, viewport in self._getClients(True):
+                update = [a for field, a in aggregates.items() if viewport.containsField(field)]
+                if update:
+                    c.write_aggregates(update)
+
+    def _queue(self, updated, removed, changedFields):
+        """
+        adds changes to the next broadcast. newer changes for a callsign replace older ones. must be called with the
+        positionsLock held.
+
+        :return: True if the changes need to be sent out right away
+        """
+        for callsign, record in updated:
+            # remove first, so that the callsign moves to the end
+            if self.pendingUpdates.pop(callsign, None) is not None:
+                self.updatesSuperseded.inc()
+            self.pendingRemovals.pop(callsign, None)
+            self.pendingUpdates[callsign] = record
+        for callsign in removed:
+            if self.pendingUpdates.pop(callsign, None) is not None:
+                self.updatesSuperseded.inc()
+            self.pendingRemovals[callsign] = None
+        self.pendingFields |= changedFields
+        self.pendingBatches += 1
+        self.store.append(updated, removed)
+        if self.flushTimer is not None:
+            return False
+        window = Config.get()["map_update_window"] / 1000
+        if window <= 0:
+            return True
+        self.flushTimer = threading.Timer(window, self.flush)
+        self.flushTimer.daemon = True
+        self.flushTimer.start()
+        return False
+
+    def flush(self):
+        """
+        sends all pending changes to the clients
+        """
+        with self.positionsLock:
+            self.flushTimer = None
+            updated = list(self.pendingUpdates.items())
+            removed = list(self.pendingRemovals.keys())
+            aggregates = self._getChangedAggregates(self.pendingFields)
+            batches = self.pendingBatches
+            self.pendingUpdates = {}
+            self.pendingRemovals = {}
+            self.pendingFields = set()
+            self.pendingBatches = 0
+        if batches > 1:
+            self.messagesSaved.inc((batches - 1) * len(self._getClients(False) + self._getClients(True)))
+        self._publish(updated, removed, aggregates)
+
     def addClient(self, client):
-        self.clients.append(client)
-        client.write_update(
-            [
-                {
-                    "callsign": callsign,
-                    "location": record["location"].__dict__(),
-                    "lastseen": record["updated"].timestamp() * 1000,
-                    "mode": record["mode"],
-                    "band": record["band"].getName() if record["band"] is not None else None,
-                }
-                for (callsign, record) in self.positions.items()
-            ]
-        )
+        self.clients[client] = None
 
     def removeClient(self, client):
-        try:
-            self.clients.remove(client)
-        except ValueError:
-            pass
+        self.clients.pop(client, None)
+
+    def setViewport(self, client, viewport: Viewport):
+        """
+        sets the part of the map the client is looking at, and sends everything within it
+        """
+        if client not in self.clients:
+            return
+        self.clients[client] = viewport
+        if viewport.isAggregated():
+            with self.positionsLock:
+                aggregates = self.index.getAggregates(viewport)
+            client.write_aggregates(aggregates, reset=True)
+            return
+
+        with self.positionsLock:
+            callsigns = self.index.query(viewport)
+            if viewport.callsign in self.positions and viewport.callsign not in callsigns:
+                callsigns.append(viewport.callsign)
+            records = [(callsign, self.positions[callsign]) for callsign in callsigns]
+        # the serialization happens outside of the lock, one chunk at a time. an empty viewport still gets one empty
+        # chunk, so the client knows it has left the aggregated view.
+        for i in range(0, max(len(records), 1), Map.snapshotChunkSize):
+            chunk = records[i : i + Map.snapshotChunkSize]
+            client.write_snapshot([record.toJson(callsign) for callsign, record in chunk])
+
+    def _track(self, callsign, ts):
+        heapq.heappush(self.expiry, (ts, callsign))
+        # stations that are updated frequently leave lots of stale entries behind. compact when they dominate.
+        if len(self.expiry) > 2 * len(self.positions) + 1000:
+            self.expiry = [(record.updated, callsign) for callsign, record in self.positions.items()]
+            heapq.heapify(self.expiry)
+
+    def _store(self, callsign, record, changedFields):
+        old = self.positions.get(callsign)
+        if old is not None:
+            self.index.remove(callsign, old)
+            if old.square is not None:
+                changedFields.add(old.square[0:2])
+        self.positions[callsign] = record
+        self.index.add(callsign, record)
+        if record.square is not None:
+            changedFields.add(record.square[0:2])
+
+    def _delete(self, callsign, changedFields):
+        record = self.positions.pop(callsign)
+        self.index.remove(callsign, record)
+        if record.square is not None:
+            changedFields.add(record.square[0:2])
+
+    def _getChangedAggregates(self, changedFields):
+        return {a["field"]: a for a in self.index.getAggregates(fields=changedFields)}
 
     def updateLocation(self, callsign, loc: Location, mode: str, band: Band = None):
-        ts = datetime.now()
+        self.updateLocations([(callsign, loc, mode, band)])
+
+    def updateLocations(self, updates):
+        """
+        updates multiple locations at once, and sends them to the clients in a single message
+
+        :param updates: list of (callsign, location, mode, band) tuples
+        """
+        if not updates:
+            return
+        ts = time.time()
+        records = []
+        changedFields = set()
         with self.positionsLock:
-            self.positions[callsign] = {"location": loc, "updated": ts, "mode": mode, "band": band}
-        self.broadcast(
-            [
-                {
-                    "callsign": callsign,
-                    "location": loc.__dict__(),
-                    "lastseen": ts.timestamp() * 1000,
-                    "mode": mode,
-                    "band": band.getName() if band is not None else None,
-                }
-            ]
-        )
+            for callsign, loc, mode, band in updates:
+                record = MapPosition(loc, ts, mode, band)
+                self._store(callsign, record, changedFields)
+                self._track(callsign, ts)
+                records.append((callsign, record))
+            flush = self._queue(records, [], changedFields)
+        if flush:
+            self.flush()
 
     def touchLocation(self, callsign):
         # not implemented on the client side yet, so do not use!
-        ts = datetime.now()
+        ts = time.time()
         with self.positionsLock:
             if callsign in self.positions:
-                self.positions[callsign]["updated"] = ts
-        self.broadcast([{"callsign": callsign, "lastseen": ts.timestamp() * 1000}])
+                self.positions[callsign].updated = ts
+                self._track(callsign, ts)
+        self.broadcast([{"callsign": callsign, "lastseen": ts * 1000}])
 
     def removeLocation(self, callsign):
+        self.removeLocations([callsign])
+
+    def removeLocations(self, callsigns):
+        """
+        removes multiple locations at once, and informs the clients in a single message
+        """
+        changedFields = set()
         with self.positionsLock:
-            del self.positions[callsign]
-            # TODO broadcast removal to clients
+            removed = [callsign for callsign in callsigns if callsign in self.positions]
+            for callsign in removed:
+                self._delete(callsign, changedFields)
+            self._countRemovals(len(removed))
+            flush = removed and self._queue([], removed, changedFields)
+        if flush:
+            self.flush()
+
+    def _countRemovals(self, count):
+        self.removals += count
+        # dicts don't shrink when items are removed. rebuild once as many items have been removed as are left over.
+        if self.removals > 1000 and self.removals > len(self.positions):
+            logger.debug("rebuilding map storage; size before: %i", sys.getsizeof(self.positions))
+            self.positions = dict(self.positions)
+            self.removals = 0
+            logger.debug("rebuild complete; size after: %i", sys.getsizeof(self.positions))
 
     def removeOldPositions(self):
         pm = Config.get()
-        retention = timedelta(seconds=pm["map_position_retention_time"])
-        cutoff = datetime.now() - retention
+        self.pruneBefore(time.time() - pm["map_position_retention_time"])
 
-        to_be_removed = [callsign for (callsign, pos) in self.positions.items() if pos["updated"] < cutoff]
-        for callsign in to_be_removed:
-            self.removeLocation(callsign)
-
-    def rebuildPositions(self):
-        logger.debug("rebuilding map storage; size before: %i", sys.getsizeof(self.positions))
+    def pruneBefore(self, cutoff):
+        """
+        removes all positions that have not been updated since the cutoff timestamp. only looks at the expired part
+        of the expiry index.
+        """
+        removed = []
+        changedFields = set()
         with self.positionsLock:
-            p = {key: value for key, value in self.positions.items()}
-            self.positions = p
-        logger.debug("rebuild complete; size after: %i", sys.getsizeof(self.positions))
+            while self.expiry and self.expiry[0][0] < cutoff:
+                ts, callsign = heapq.heappop(self.expiry)
+                record = self.positions.get(callsign)
+                # skip entries that have been superseded by a later update
+                if record is None or record.updated != ts:
+                    continue
+                self._delete(callsign, changedFields)
+                removed.append(callsign)
+            self._countRemovals(len(removed))
+            flush = removed and self._queue([], removed, changedFields)
+        if flush:
+            self.flush()
+        return removed
 
 
 class LatLngLocation(Location):
@@ -132,6 +684,9 @@ class LatLngLocation(Location):
         res = {"type": "latlon", "lat": self.lat, "lon": self.lon}
         return res
 
+    def getSquare(self):
+        return squareFromLatLon(self.lat, self.lon)
+
 
 class LocatorLocation(Location):
     def __init__(self, locator: str):
@@ -139,3 +694,25 @@ class LocatorLocation(Location):
 
     def __dict__(self):
         return {"type": "locator", "locator": self.locator}
+
+    def getSquare(self):
+        square = self.locator[0:4].upper()
+        if len(square) < 4 or not "A" <= square[0] <= "R" or not "A" <= square[1] <= "R" or not square[2:4].isdigit():
+            return None
+        return square
+
+
+class StoredLocation(Location):
+    """
+    a location that has been restored from disk. it only knows the data that is sent to the clients.
+    """
+
+    def __init__(self, data, square):
+        self.data = data
+        self.square = square
+
+    def __dict__(self):
+        return self.data
+
+    def getSquare(self):
+        return self.square
@@ -1,5 +1,8 @@
 from owrx.config import Config
+from owrx.radioid import RadioIdDatabase
 from urllib import request
+from collections import OrderedDict
+from queue import Queue, Full
 import json
 from datetime import datetime, timedelta
 import logging
@@ -12,37 +15,94 @@ logger = logging.getLogger(__name__)
 
 class DmrCache(object):
     sharedInstance = None
+    creationLock = threading.Lock()
+    # the least recently used entries are dropped once the cache holds this many ids
+    maxSize = 10000
 
     @staticmethod
     def getSharedInstance():
-        if DmrCache.sharedInstance is None:
-            DmrCache.sharedInstance = DmrCache()
+        with DmrCache.creationLock:
+            if DmrCache.sharedInstance is None:
+                DmrCache.sharedInstance = DmrCache()
         return DmrCache.sharedInstance
 
     def __init__(self):
-        self.cache = {}
+        self.cache = OrderedDict()
         self.cacheTimeout = timedelta(seconds=86400)
+        self.lock = threading.Lock()
 
     def isValid(self, key):
+        with self.lock:
+            return self._isValid(key)
+
+    def _isValid(self, key):
         if key not in self.cache:
             return False
         entry = self.cache[key]
         return entry["timestamp"] + self.cacheTimeout > datetime.now()
 
     def put(self, key, value):
-        self.cache[key] = {"timestamp": datetime.now(), "data": value}
+        with self.lock:
+            self.cache[key] = {"timestamp": datetime.now(), "data": value}
+            self.cache.move_to_end(key)
+            while len(self.cache) > DmrCache.maxSize:
+                self.cache.popitem(last=False)
 
     def get(self, key):
-        if not self.isValid(key):
-            return None
-        return self.cache[key]["data"]
+        with self.lock:
+            if not self._isValid(key):
+                return None
+            self.cache.move_to_end(key)
+            return self.cache[key]["data"]
 
 
-class DmrMetaEnricher(object):
-    def __init__(self):
-        self.threads = {}
+class RadioIdLookup(object):
+    """
+    Looks up DMR ids on radioid.net with a fixed number of worker threads. Requests that don't fit into the queue are
+    dropped; the id will be requested again the next time it is seen.
+    """
+
+    sharedInstance = None
+    creationLock = threading.Lock()
+    workers = 2
+    queueSize = 100
 
-    def downloadRadioIdData(self, id):
+    @staticmethod
+    def getSharedInstance():
+        with RadioIdLookup.creationLock:
+            if RadioIdLookup.sharedInstance is None:
+                RadioIdLookup.sharedInstance = RadioIdLookup()
+        return RadioIdLookup.sharedInstance
+
+    def __init__(self):
+        self.queue = Queue(RadioIdLookup.queueSize)
+        self.pending = set()
+        self.lock = threading.Lock()
+        for i in range(RadioIdLookup.workers):
+            threading.Thread(target=self._work, daemon=True, name="radioid_lookup_{}".format(i)).start()
+
+    def request(self, id):
+        with self.lock:
+            if id in self.pending:
+                return
+            try:
+                self.queue.put(id, block=False)
+            except Full:
+                return
+            self.pending.add(id)
+
+    def _work(self):
+        while True:
+            id = self.queue.get()
+            try:
+                self.download(id)
+            except Exception:
+                logger.exception("error while looking up DMR id %s", id)
+            finally:
+                with self.lock:
+                    self.pending.discard(id)
+
+    def download(self, id):
         cache = DmrCache.getSharedInstance()
         try:
             logger.debug("requesting DMR metadata for id=%s", id)
@@ -51,23 +111,40 @@ class DmrMetaEnricher(object):
             cache.put(id, data)
         except json.JSONDecodeError:
             cache.put(id, None)
-        del self.threads[id]
+        except OSError:
+            # not cached, so the id will be requested again
+            logger.debug("DMR metadata request for id=%s failed", id)
+
+
+class DmrMetaEnricher(object):
+    def lookup(self, id):
+        """
+        :return: the data for the DMR id from the offline database or the cache, or None if it is not available (yet)
+        """
+        try:
+            record = RadioIdDatabase.getSharedInstance().lookup(int(id))
+        except ValueError:
+            return None
+        if record is not None:
+            return record
+        cache = DmrCache.getSharedInstance()
+        if not cache.isValid(id):
+            if Config.get()["digital_voice_dmr_id_online_lookup"]:
+                RadioIdLookup.getSharedInstance().request(id)
+            return None
+        data = cache.get(id)
+        if data is not None and "count" in data and data["count"] > 0 and "results" in data:
+            return data["results"][0]
+        return None
 
     def enrich(self, meta):
         if not Config.get()["digital_voice_dmr_id_lookup"]:
             return meta
         if "source" not in meta:
             return meta
-        id = meta["source"]
-        cache = DmrCache.getSharedInstance()
-        if not cache.isValid(id):
-            if id not in self.threads:
-                self.threads[id] = threading.Thread(target=self.downloadRadioIdData, args=[id], daemon=True)
-                self.threads[id].start()
-            return meta
-        data = cache.get(id)
-        if "count" in data and data["count"] > 0 and "results" in data:
-            meta["additional"] = data["results"][0]
+        data = self.lookup(meta["source"])
+        if data is not None:
+            meta["additional"] = data
         return meta
 
 
@@ -1,5 +1,7 @@
 import threading
 from owrx.client import ClientRegistry
+from owrx.config import Config
+from owrx.property import PropertyManager
 
 
 class Metric(object):
@@ -40,6 +42,8 @@ class Metrics(object):
     def __init__(self):
         self.metrics = {}
         self.addMetric("openwebrx.users", DirectMetric(ClientRegistry.getSharedInstance().clientCount))
+        self.addMetric("openwebrx.property.subscribers", DirectMetric(PropertyManager.getTotalSubscriberCount))
+        self.addMetric("openwebrx.config.subscribers", DirectMetric(lambda: Config.get().getSubscriberCount()))
 
     def addMetric(self, name, metric):
         self.metrics[name] = metric
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from owrx.property.validators import Validator
 from owrx.property.filter import Filter, ByPropertyName
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,8 +37,18 @@ class Subscription(object):
 
 
 class PropertyManager(ABC):
+    # number of subscriptions on all property managers
+    subscriberCount = 0
+    countLock = threading.Lock()
+
+    @staticmethod
+    def getTotalSubscriberCount():
+        return PropertyManager.subscriberCount
+
     def __init__(self):
-        self.subscribers = []
+        # subscriptions indexed by property name; None holds the subscriptions for all changes
+        self.subscribers = {}
+        self.subscriptionLock = threading.Lock()
 
     @abstractmethod
     def __getitem__(self, item):
@@ -77,38 +88,66 @@ class PropertyManager(ABC):
 
     def wire(self, callback):
         sub = Subscription(self, None, callback)
-        self.subscribers.append(sub)
+        self._addSubscription(sub)
         return sub
 
     def wireProperty(self, name, callback):
         sub = Subscription(self, name, callback)
-        self.subscribers.append(sub)
+        self._addSubscription(sub)
         if name in self:
             sub.call(self[name])
         return sub
 
+    def _addSubscription(self, sub):
+        with self.subscriptionLock:
+            if not self.subscribers:
+                self._activate()
+            self.subscribers.setdefault(sub.getName(), []).append(sub)
+        with PropertyManager.countLock:
+            PropertyManager.subscriberCount += 1
+
     def unwire(self, sub):
-        try:
-            self.subscribers.remove(sub)
-        except ValueError:
-            # happens when already removed before
-            pass
+        with self.subscriptionLock:
+            subs = self.subscribers.get(sub.getName())
+            if subs is None or sub not in subs:
+                # happens when already removed before
+                return self
+            subs.remove(sub)
+            if not subs:
+                del self.subscribers[sub.getName()]
+            if not self.subscribers:
+                self._deactivate()
+        with PropertyManager.countLock:
+            PropertyManager.subscriberCount -= 1
         return self
 
+    def getSubscriberCount(self):
+        return sum(len(subs) for subs in list(self.subscribers.values()))
+
+    def _activate(self):
+        """
+        called when the first subscription is added
+        """
+        pass
+
+    def _deactivate(self):
+        """
+        called when the last subscription has been cancelled
+        """
+        pass
+
     def _fireCallbacks(self, changes):
         if not changes:
             return
-        for c in self.subscribers:
+        for c in list(self.subscribers.get(None, [])):
             try:
-                if c.getName() is None:
-                    c.call(changes)
+                c.call(changes)
             except Exception:
                 logger.exception("exception while firing changes")
         for name in changes:
-            for c in self.subscribers:
+            for c in list(self.subscribers.get(name, [])):
                 try:
-                    if c.getName() == name:
-                        c.call(changes[name])
+                    c.call(changes[name])
                 except Exception:
                     logger.exception("exception while firing changes")
 
@@ -143,11 +182,23 @@ class PropertyLayer(PropertyManager):
 
 
 class PropertyFilter(PropertyManager):
+    """
+    A filtered view on another PropertyManager. It is only subscribed to its parent while it has subscriptions itself,
+    so cancelling them releases the filter.
+    """
+
     def __init__(self, pm: PropertyManager, filter: Filter):
         super().__init__()
         self.pm = pm
         self._filter = filter
-        self.pm.wire(self.receiveEvent)
+        self.subscription = None
+
+    def _activate(self):
+        self.subscription = self.pm.wire(self.receiveEvent)
+
+    def _deactivate(self):
+        self.subscription.cancel()
+        self.subscription = None
 
     def receiveEvent(self, changes):
         changesToForward = {name: value for name, value in changes.items() if self._filter.apply(name)}
@@ -182,9 +233,16 @@ class PropertyFilter(PropertyManager):
 
 class PropertyDelegator(PropertyManager):
     def __init__(self, pm: PropertyManager):
-        self.pm = pm
-        self.pm.wire(self._fireCallbacks)
         super().__init__()
+        self.pm = pm
+        self.subscription = None
+
+    def _activate(self):
+        self.subscription = self.pm.wire(self._fireCallbacks)
+
+    def _deactivate(self):
+        self.subscription.cancel()
+        self.subscription = None
 
     def __getitem__(self, item):
         return self.pm.__getitem__(item)
@@ -245,7 +303,10 @@ class PropertyReadOnly(PropertyDelegator):
 class PropertyStack(PropertyManager):
     def __init__(self):
         super().__init__()
+        # sorted by priority; layers with the same priority stay in the order they were added
         self.layers = []
+        # maps every key to the top layer containing it
+        self.index = {}
 
     def addLayer(self, priority: int, pm: PropertyManager):
         """
@@ -259,23 +320,34 @@ class PropertyStack(PropertyManager):
             if key not in self or self[key] != pm[key]:
                 changes[key] = pm[key]
 
+        layer = {"priority": priority, "props": pm}
+
         def eventClosure(changes):
             self.receiveEvent(pm, changes)
 
-        sub = pm.wire(eventClosure)
+        layer["sub"] = pm.wire(eventClosure)
 
-        self.layers.append({"priority": priority, "props": pm, "sub": sub})
+        position = len(self.layers)
+        while position > 0 and self.layers[position - 1]["priority"] > priority:
+            position -= 1
+        self.layers.insert(position, layer)
+
+        for key in pm.keys():
+            if key not in self.index or self.index[key]["priority"] > priority:
+                self.index[key] = layer
 
         return changes
 
     def removeLayer(self, pm: PropertyManager):
-        for layer in self.layers:
+        for layer in list(self.layers):
             if layer["props"] == pm:
                 self._fireCallbacks(self._removeLayer(layer))
 
     def _removeLayer(self, layer):
         layer["sub"].cancel()
         self.layers.remove(layer)
+        for key in [k for k, la in self.index.items() if la is layer]:
+            self._resolve(key)
         changes = {}
         pm = layer["props"]
         for key in pm.keys():
@@ -298,6 +370,8 @@ class PropertyStack(PropertyManager):
         self._fireCallbacks(changes)
 
     def receiveEvent(self, layer, changes):
+        for name in changes:
+            self._resolve(name)
         changesToForward = {name: value for name, value in changes.items() if layer == self._getTopLayer(name)}
         # deletions need to be handled separately: only send them if deleted in all layers
         deletionsToForward = {
@@ -307,14 +381,19 @@ class PropertyStack(PropertyManager):
         }
         self._fireCallbacks({**changesToForward, **deletionsToForward})
 
+    def _resolve(self, key):
+        for layer in self.layers:
+            if key in layer["props"]:
+                self.index[key] = layer
+                return
+        self.index.pop(key, None)
+
     def _getTopLayer(self, item, fallback=True):
-        layers = [la["props"] for la in sorted(self.layers, key=lambda l: l["priority"])]
-        for m in layers:
-            if item in m:
-                return m
+        if item in self.index:
+            return self.index[item]["props"]
         # return top layer as fallback
-        if fallback and layers:
-            return layers[0]
+        if fallback and self.layers:
+            return self.layers[0]["props"]
 
     def __getitem__(self, item):
         layer = self._getTopLayer(item)
@@ -325,13 +404,10 @@ class PropertyStack(PropertyManager):
         return layer.__setitem__(key, value)
 
     def __contains__(self, item):
-        layer = self._getTopLayer(item)
-        if layer:
-            return layer.__contains__(item)
-        return False
+        return item in self.index
 
     def __dict__(self):
-        return {k: self.__getitem__(k) for k in self.keys()}
+        return {k: layer["props"][k] for k, layer in self.index.items()}
 
     def __delitem__(self, key):
         for layer in self.layers:
@@ -339,4 +415,4 @@ class PropertyStack(PropertyManager):
                 layer["props"].__delitem__(key)
 
     def keys(self):
-        return set([key for l in self.layers for key in l["props"].keys()])
+        return set(self.index.keys())
@@ -3,36 +3,58 @@ import threading
 import time
 import random
 import socket
-from functools import reduce
-from operator import and_
+import struct
+import os
 from owrx.config import Config
+from owrx.config.core import CoreConfig
 from owrx.version import openwebrx_version
 from owrx.locator import Locator
 from owrx.metrics import Metrics, CounterMetric
-from owrx.reporting import Reporter
+from owrx.reporting import Reporter, SpotSpool
 
 logger = logging.getLogger(__name__)
 
 
 class PskReporter(Reporter):
+    name = "pskreporter"
     interval = 300
+    # seconds between two writes of new spots to the spool
+    spoolInterval = 60
 
     def getSupportedModes(self):
         return ["FT8", "FT4", "JT9", "JT65", "FST4", "JS8", "Q65"]
 
     def stop(self):
         self.cancelTimer()
+        with self.spotLock:
+            if self.spoolTimer:
+                self.spoolTimer.cancel()
+        self.flushSpool()
 
     def __init__(self):
-        self.spots = []
+        # pending spots, indexed by their identity for duplicate detection
+        self.spots = {}
         self.spotLock = threading.Lock()
+        # new spots that have not been written to the spool yet. they are flushed periodically, so that the spool
+        # isn't written for every decoding cycle.
+        self.unspooled = []
+        # keeps the spool writes in order. the spool is not written under the spotLock, so that spotting doesn't have
+        # to wait for the disk.
+        self.spoolLock = threading.Lock()
         self.uploader = Uploader()
         self.timer = None
+        self.spoolTimer = None
         metrics = Metrics.getSharedInstance()
         self.dupeCounter = CounterMetric()
         metrics.addMetric("pskreporter.duplicates", self.dupeCounter)
         self.spotCounter = CounterMetric()
         metrics.addMetric("pskreporter.spots", self.spotCounter)
+        self.spool = SpotSpool(os.path.join(CoreConfig().get_data_directory(), "pskreporter.spool"))
+        for spot in self.spool.load():
+            self.spots[PskReporter.spotKey(spot)] = spot
+        if self.spots:
+            logger.info("%i spots recovered from spool", len(self.spots))
+            self.scheduleNextUpload()
 
     def scheduleNextUpload(self):
         if self.timer:
@@ -42,32 +64,65 @@ class PskReporter(Reporter):
         self.timer = threading.Timer(delay, self.upload)
         self.timer.start()
 
-    def spotEquals(self, s1, s2):
-        keys = ["callsign", "timestamp", "locator", "mode", "msg"]
+    def scheduleSpoolFlush(self):
+        if self.spoolTimer:
+            return
+        self.spoolTimer = threading.Timer(PskReporter.spoolInterval, self.flushSpool)
+        self.spoolTimer.start()
+
+    def flushSpool(self):
+        with self.spoolLock:
+            with self.spotLock:
+                self.spoolTimer = None
+                spots = self.unspooled
+                self.unspooled = []
+            self.spool.append(spots)
 
-        return reduce(and_, map(lambda key: s1[key] == s2[key], keys))
+    @staticmethod
+    def spotKey(spot):
+        return spot["callsign"], spot["timestamp"], spot["locator"], spot["mode"], spot["msg"]
 
     def spot(self, spot):
+        self.spotAll([spot])
+
+    def spotAll(self, spots):
         with self.spotLock:
-            if any(x for x in self.spots if self.spotEquals(spot, x)):
-                # dupe
-                self.dupeCounter.inc()
-            else:
-                self.spotCounter.inc()
-                self.spots.append(spot)
+            for spot in spots:
+                key = PskReporter.spotKey(spot)
+                if key in self.spots:
+                    # dupe
+                    self.dupeCounter.inc()
+                else:
+                    self.spotCounter.inc()
+                    self.spots[key] = spot
+                    self.unspooled.append(spot)
             self.scheduleNextUpload()
+            if self.unspooled:
+                self.scheduleSpoolFlush()
 
     def upload(self):
         try:
             with self.spotLock:
                 self.timer = None
                 spots = self.spots
-                self.spots = []
+                self.spots = {}
 
             if spots:
-                self.uploader.upload(spots)
+                self.uploader.upload(list(spots.values()))
         except Exception:
             logger.exception("Failed to upload spots")
+            with self.spotLock:
+                # keep the spots for the next attempt; spots that came in during the upload take precedence
+                spots.update(self.spots)
+                self.spots = spots
+                self.scheduleNextUpload()
+            return
+        # the replacement contains all pending spots, including the ones that have not been flushed yet
+        with self.spoolLock:
+            with self.spotLock:
+                pending = list(self.spots.values())
+                self.unspooled = []
+            self.spool.replace(pending)
 
     def cancelTimer(self):
         if self.timer:
@@ -123,20 +178,18 @@ class Uploader(object):
         )
 
     def encodeString(self, s):
-        return [len(s)] + list(s.encode("utf-8"))
+        encoded = s.encode("utf-8")
+        return struct.pack("B", len(encoded)) + encoded
 
     def encodeSpot(self, spot):
         try:
-            return bytes(
-                self.encodeString(spot["callsign"])
-                + list(int(spot["freq"]).to_bytes(4, "big"))
-                + list(int(spot["db"]).to_bytes(1, "big", signed=True))
-                + self.encodeString(spot["mode"])
-                + self.encodeString(spot["locator"])
-                # informationsource. 1 means "automatically extracted
-                + [0x01]
-                + list(int(spot["timestamp"] / 1000).to_bytes(4, "big"))
-            )
+            out = bytearray(self.encodeString(spot["callsign"]))
+            out += struct.pack(">Ib", int(spot["freq"]), int(spot["db"]))
+            out += self.encodeString(spot["mode"])
+            out += self.encodeString(spot["locator"])
+            # informationsource. 1 means "automatically extracted
+            out += struct.pack(">BI", 0x01, int(spot["timestamp"] / 1000))
+            return bytes(out)
         except Exception:
             logger.exception("Error while encoding spot for pskreporter")
             return None
@@ -180,10 +233,8 @@ class Uploader(object):
         ]
         if "pskreporter_antenna_information" in pm and pm["pskreporter_antenna_information"] is not None:
             bodyFields += [pm["pskreporter_antenna_information"]]
-        body = [b for s in bodyFields for b in self.encodeString(s)]
-        body = self.pad(body, 4)
-        body = bytes(Uploader.receieverDelimiter + list((len(body) + 4).to_bytes(2, "big")) + body)
-        return body
+        body = self.padBytes(b"".join(self.encodeString(s) for s in bodyFields), 4)
+        return bytes(Uploader.receieverDelimiter) + struct.pack(">H", len(body) + 4) + body
 
     def getSenderInformationHeader(self):
         return bytes(
@@ -213,8 +264,5 @@ class Uploader(object):
         sInfoLength = len(sInfo) + 4
         return bytes(Uploader.senderDelimiter) + sInfoLength.to_bytes(2, "big") + sInfo
 
-    def pad(self, b, l):
-        return b + [0x00 for _ in range(0, -1 * len(b) % l)]
-
     def padBytes(self, b, l):
-        return b + bytes([0x00 for _ in range(0, -1 * len(b) % l)])
+        return b + bytes(-1 * len(b) % l)
@@ -0,0 +1,150 @@
+from owrx.config.core import CoreConfig
+import threading
+import struct
+import mmap
+import time
+import csv
+import os
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RadioIdDatabase(object):
+    """
+    Offline copy of the radioid.net DMR user database.
+
+    The user CSV dump is imported into a binary file that is sorted by id, so that it can be memory-mapped and searched
+    without loading it. The file consists of a header, an index of (id, offset, length) entries and the records, which
+    are the NUL-separated fields encoded as utf-8.
+    """
+
+    magic = b"ORID"
+    version = 1
+    header = struct.Struct("<4sII")
+    entry = struct.Struct("<III")
+    fields = ["callsign", "fname", "surname", "city", "state", "country"]
+    csvColumns = ["CALLSIGN", "FIRST_NAME", "LAST_NAME", "CITY", "STATE", "COUNTRY"]
+    # seconds between two checks whether the file has been replaced
+    checkInterval = 60
+
+    sharedInstance = None
+    creationLock = threading.Lock()
+
+    @staticmethod
+    def getSharedInstance():
+        with RadioIdDatabase.creationLock:
+            if RadioIdDatabase.sharedInstance is None:
+                RadioIdDatabase.sharedInstance = RadioIdDatabase(RadioIdDatabase.getPath())
+        return RadioIdDatabase.sharedInstance
+
+    @staticmethod
+    def getPath():
+        return os.path.join(CoreConfig().get_data_directory(), "radioid.db")
+
+    @staticmethod
+    def importCsv(source, path):
+        """
+        converts a radioid.net user CSV dump into the binary format
+
+        :return: the number of imported ids
+        """
+        records = {}
+        with open(source, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            columns = [c.strip().upper() for c in next(reader)]
+            try:
+                idColumn = columns.index("RADIO_ID")
+            except ValueError:
+                raise ValueError("{} is not a radioid user CSV file".format(source))
+            indexes = [columns.index(c) if c in columns else None for c in RadioIdDatabase.csvColumns]
+            for row in reader:
+                try:
+                    id = int(row[idColumn])
+                except (ValueError, IndexError):
+                    continue
+                values = [row[i].strip() if i is not None and i < len(row) else "" for i in indexes]
+                records[id] = "\0".join(v.replace("\0", "") for v in values).encode("utf-8")
+
+        ids = sorted(records.keys())
+        index = bytearray()
+        offset = 0
+        for id in ids:
+            index += RadioIdDatabase.entry.pack(id, offset, len(records[id]))
+            offset += len(records[id])
+
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(RadioIdDatabase.header.pack(RadioIdDatabase.magic, RadioIdDatabase.version, len(ids)))
+            f.write(index)
+            f.write(b"".join(records[id] for id in ids))
+        os.replace(tmp, path)
+        return len(ids)
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.mm = None
+        self.count = 0
+        self.modified = None
+        self.lastCheck = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.lastCheck is not None and now - self.lastCheck < RadioIdDatabase.checkInterval:
+            return
+        self.lastCheck = now
+        try:
+            modified = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            modified = None
+        if modified == self.modified:
+            return
+        self.modified = modified
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+            self.count = 0
+        if modified is None:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count = RadioIdDatabase.header.unpack_from(mm, 0)
+            if magic != RadioIdDatabase.magic or version != RadioIdDatabase.version:
+                logger.warning("%s is not a DMR id database, ignoring", self.path)
+                mm.close()
+                return
+            self.mm = mm
+            self.count = count
+            logger.info("using offline DMR id database with %i ids", count)
+        except (OSError, ValueError, struct.error):
+            logger.exception("error opening DMR id database %s", self.path)
+
+    def lookup(self, id: int):
+        """
+        :return: the record in the format of the radioid.net api, or None if the id is unknown
+        """
+        with self.lock:
+            self._refresh()
+            if self.mm is None:
+                return None
+            entry = RadioIdDatabase.entry
+            indexStart = RadioIdDatabase.header.size
+            low = 0
+            high = self.count - 1
+            while low <= high:
+                mid = (low + high) // 2
+                current, offset, length = entry.unpack_from(self.mm, indexStart + mid * entry.size)
+                if current < id:
+                    low = mid + 1
+                elif current > id:
+                    high = mid - 1
+                else:
+                    start = indexStart + self.count * entry.size + offset
+                    values = self.mm[start : start + length].decode("utf-8").split("\0")
+                    record = {"id": id}
+                    record.update(zip(RadioIdDatabase.fields, values))
+                    return record
+        return None
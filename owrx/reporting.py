@@ -1,9 +1,32 @@
 import threading
+import time
+import json
+import os
 from abc import ABC, abstractmethod
+from collections import deque
+from enum import Enum
 from owrx.config import Config
+from owrx.metrics import Metrics, CounterMetric, DirectMetric
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BackpressurePolicy(Enum):
+    # discard the oldest pending spots when the reporter falls behind
+    DROP_OLDEST = 1
+    # discard new spots when the reporter falls behind
+    DROP_NEWEST = 2
 
 
 class Reporter(ABC):
+    # used for thread and metric names
+    name = "reporter"
+    # maximum number of spots waiting for the reporter
+    channelSize = 1000
+    backpressurePolicy = BackpressurePolicy.DROP_OLDEST
+
     @abstractmethod
     def stop(self):
         pass
@@ -12,15 +35,157 @@ class Reporter(ABC):
     def spot(self, spot):
         pass
 
+    def spotAll(self, spots):
+        for spot in spots:
+            self.spot(spot)
+
     @abstractmethod
     def getSupportedModes(self):
         return []
 
 
+class SpotSpool(object):
+    """
+    Keeps pending spots of a reporter on disk, so that they can be uploaded after a restart. Spots are appended as json
+    lines; after an upload, the spool is replaced with the spots that are still pending.
+    """
+
+    # spots older than this (in seconds) are not worth uploading any more
+    maxAge = 2 * 60 * 60
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def load(self):
+        with self.lock:
+            return self._load()
+
+    def _load(self):
+        cutoff = (time.time() - SpotSpool.maxAge) * 1000
+        spots = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        spot = json.loads(line)
+                    except ValueError:
+                        # the last line may be incomplete if we crashed while writing it
+                        continue
+                    if spot.get("timestamp") is not None and spot["timestamp"] > cutoff:
+                        spots.append(spot)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.exception("error reading spool %s", self.path)
+        return spots
+
+    def _write(self, f, spots):
+        f.write("".join(json.dumps(spot) + "\n" for spot in spots))
+
+    def append(self, spots):
+        if not spots:
+            return
+        with self.lock:
+            try:
+                with open(self.path, "a") as f:
+                    self._write(f, spots)
+            except OSError:
+                logger.exception("error writing spool %s", self.path)
+
+    def replace(self, spots):
+        with self.lock:
+            self._replace(spots)
+
+    def _replace(self, spots):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                self._write(f, spots)
+            os.replace(tmp, self.path)
+        except OSError:
+            logger.exception("error writing spool %s", self.path)
+
+    def take(self, count):
+        """
+        removes up to count spots from the spool and returns them
+        """
+        with self.lock:
+            spots = self._load()
+            if spots:
+                self._replace(spots[count:])
+            return spots[:count]
+
+
+class ReporterChannel(object):
+    """
+    Feeds the spots for one reporter from a dedicated thread, so that a slow reporter cannot hold up the others.
+    """
+
+    def __init__(self, reporter: Reporter):
+        self.reporter = reporter
+        self.spots = deque()
+        self.condition = threading.Condition()
+        self.doRun = True
+        metrics = Metrics.getSharedInstance()
+        prefix = "reporting.{}".format(reporter.name)
+        metrics.addMetric(prefix + ".queue_length", DirectMetric(lambda: len(self.spots)))
+        self.dropCounter = CounterMetric()
+        metrics.addMetric(prefix + ".drops", self.dropCounter)
+        self.thread = threading.Thread(target=self.run, name="reporting_{}".format(reporter.name), daemon=True)
+        self.thread.start()
+
+    def put(self, spots):
+        with self.condition:
+            space = self.reporter.channelSize - len(self.spots)
+            if len(spots) > space:
+                self.dropCounter.inc(len(spots) - max(space, 0))
+                if self.reporter.backpressurePolicy is BackpressurePolicy.DROP_NEWEST:
+                    spots = spots[: max(space, 0)]
+                else:
+                    for _ in range(min(len(spots) - space, len(self.spots))):
+                        self.spots.popleft()
+                    spots = spots[-self.reporter.channelSize :]
+            self.spots.extend(spots)
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.doRun and not self.spots:
+                    self.condition.wait()
+                if not self.spots:
+                    return
+                spots = list(self.spots)
+                self.spots.clear()
+            try:
+                self.reporter.spotAll(spots)
+            except Exception:
+                logger.exception("error while handing spots to %s", self.reporter.name)
+
+    def stop(self):
+        with self.condition:
+            self.doRun = False
+            self.condition.notify()
+        # pending spots are still delivered, so the reporter can keep them for later
+        self.thread.join(timeout=10)
+        self.reporter.stop()
+
+
 class ReportingEngine(object):
+    """
+    Spots are accepted into a queue and handed to the reporters from a dispatcher thread, so that the parsers never
+    have to wait for a reporter.
+    """
+
     creationLock = threading.Lock()
     sharedInstance = None
 
+    # maximum number of spot batches waiting for the dispatcher
+    queueSize = 1000
+    # weight of a new measurement in the latency averages
+    latencyRate = 0.1
+
     @staticmethod
     def getSharedInstance():
         with ReportingEngine.creationLock:
@@ -47,12 +212,69 @@ class ReportingEngine(object):
             from owrx.wsprnet import WsprnetReporter
 
             self.reporters += [WsprnetReporter()]
+        self._setupDispatcher()
+
+    def _setupDispatcher(self):
+        self.channels = [ReporterChannel(r) for r in self.reporters]
+        # deque.append() and popleft() are thread safe, so producers don't need to take any lock
+        self.queue = deque()
+        self.wakeup = threading.Event()
+        self.doRun = True
+        self.enqueueLatency = 0
+        self.dispatchLatency = 0
+        metrics = Metrics.getSharedInstance()
+        metrics.addMetric("reporting.queue.length", DirectMetric(lambda: len(self.queue)))
+        self.dropCounter = CounterMetric()
+        metrics.addMetric("reporting.queue.drops", self.dropCounter)
+        metrics.addMetric("reporting.queue.enqueue_us", DirectMetric(lambda: self.enqueueLatency * 1e6))
+        metrics.addMetric("reporting.queue.dispatch_ms", DirectMetric(lambda: self.dispatchLatency * 1000))
+        self.dispatcher = threading.Thread(target=self.dispatch, name="reporting_dispatcher", daemon=True)
+        self.dispatcher.start()
 
     def stop(self):
-        for r in self.reporters:
-            r.stop()
+        self.doRun = False
+        self.wakeup.set()
+        self.dispatcher.join(timeout=10)
+        for c in self.channels:
+            c.stop()
 
     def spot(self, spot):
-        for r in self.reporters:
-            if spot["mode"] in r.getSupportedModes():
-                r.spot(spot)
+        self.spotAll([spot])
+
+    def spotAll(self, spots):
+        if not self.channels:
+            return
+        start = time.monotonic()
+        if len(self.queue) >= ReportingEngine.queueSize:
+            self.dropCounter.inc(len(spots))
+            return
+        self.queue.append((start, spots))
+        if not self.wakeup.is_set():
+            self.wakeup.set()
+        latency = time.monotonic() - start
+        rate = ReportingEngine.latencyRate
+        self.enqueueLatency = (1 - rate) * self.enqueueLatency + rate * latency
+
+    def dispatch(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            batch = []
+            queued = None
+            try:
+                while True:
+                    timestamp, spots = self.queue.popleft()
+                    queued = timestamp if queued is None else queued
+                    batch += spots
+            except IndexError:
+                pass
+            for c in self.channels:
+                modes = c.reporter.getSupportedModes()
+                supported = [spot for spot in batch if spot["mode"] in modes]
+                if supported:
+                    c.put(supported)
+            if queued is not None:
+                rate = ReportingEngine.latencyRate
+                self.dispatchLatency = (1 - rate) * self.dispatchLatency + rate * (time.monotonic() - queued)
+            if not self.doRun:
+                return
@@ -1,11 +1,13 @@
 import threading
+import time
 from owrx.source import SdrSourceEventClient, SdrSourceState, SdrBusyState, SdrClientClass
 from owrx.sdr import SdrService
 from owrx.bands import Bandplan
 from csdr.csdr import dsp, output
 from owrx.wsjt import WsjtParser
 from owrx.aprs import AprsParser
-from owrx.js8 import Js8Parser
+from owrx.js8 import Js8Parser, Js8Profile
+from owrx.parser import Parser
 from owrx.gpsmic import MicGPSParser
 from owrx.elt406 import Elt406Parser
 from owrx.config.core import CoreConfig
@@ -15,7 +17,9 @@ from owrx.property import PropertyLayer, PropertyDeleted
 from js8py import Js8Frame
 from abc import ABCMeta, abstractmethod
 from .schedule import ServiceScheduler
-from owrx.modes import Modes
+from .cost import ResamplingCostModel, CostChain
+from .activity import BandActivityDetector, DialActivityMetrics
+from owrx.modes import Modes, WsjtMode
 
 import logging
 
@@ -62,10 +66,52 @@ class Js8ServiceOutput(ServiceOutput):
         return t == "js8_demod"
 
 
+class ServiceGroupParser(Parser):
+    """
+    splits the output of a shared audio chopper between the parsers of the individual decoders
+    """
+
+    def __init__(self):
+        super().__init__(None)
+        self.wsjtParser = WsjtParser(WsjtHandler())
+        self.js8Parser = Js8Parser(Js8Handler())
+
+    def setDialFrequency(self, freq):
+        super().setDialFrequency(freq)
+        self.wsjtParser.setDialFrequency(freq)
+        self.js8Parser.setDialFrequency(freq)
+
+    def parse(self, results):
+        js8 = [r for r in results if isinstance(r.profile, Js8Profile)]
+        if js8:
+            self.js8Parser.parse(js8)
+        wsjt = [r for r in results if not isinstance(r.profile, Js8Profile)]
+        if wsjt:
+            self.wsjtParser.parse(wsjt)
+
+
+class ServiceGroupOutput(ServiceOutput):
+    def getParser(self):
+        return ServiceGroupParser()
+
+    def supports_type(self, t):
+        return t in ["wsjt_demod", "js8_demod"]
+
+
 class ServiceHandler(SdrSourceEventClient):
+    # the decoders are fed with 12kHz audio, so this is what we can fit into a single demodulator
+    maxGroupBandwidth = 5000
+    # delay before applying frequency changes, so that subsequent changes can be applied in one go
+    reconciliationDelay = 1
+
     def __init__(self, source):
         self.lock = threading.RLock()
-        self.services = []
+        self.services = {}
+        self.resamplers = {}
+        self.desired = {}
+        self.suspended = set()
+        self.activityDetector = None
+        self.detectionSub = None
         self.source = source
         self.startupTimer = None
         self.activitySub = None
@@ -92,9 +138,11 @@ class ServiceHandler(SdrSourceEventClient):
     def _start(self):
         self.running = True
         self.source.addClient(self)
+        ResamplingCostModel.getSharedInstance().addClient(self)
         props = self.source.getProps()
         self.activitySub = props.filter("center_freq", "samp_rate").wire(self.onFrequencyChange)
         self.decodersSub = Config.get().wireProperty("services_decoders", self.onFrequencyChange)
+        self.detectionSub = Config.get().wireProperty("services_activity_detection", self._setActivityDetection)
         if self.source.isAvailable():
             self._scheduleServiceStartup()
 
@@ -105,8 +153,13 @@ class ServiceHandler(SdrSourceEventClient):
         if self.decodersSub is not None:
             self.decodersSub.cancel()
             self.decodersSub = None
+        if self.detectionSub is not None:
+            self.detectionSub.cancel()
+            self.detectionSub = None
+        self._setActivityDetection(False)
         self._cancelStartupTimer()
         self.source.removeClient(self)
+        ResamplingCostModel.getSharedInstance().removeClient(self)
         self.stopServices()
         self.running = False
 
@@ -140,70 +193,176 @@ class ServiceHandler(SdrSourceEventClient):
     def stopServices(self):
         with self.lock:
             services = self.services
-            self.services = []
-
-        for service in services:
+            self.services = {}
+            resamplers = self.resamplers
+            self.resamplers = {}
+            for key in self.suspended:
+                self._resumeMetrics(key)
+            self.suspended = set()
+
+        for service in services.values():
             service.stop()
+        # resamplers must not be shut down as long as the services are still running
+        for resampler in resamplers.values():
+            resampler.stop()
 
     def onFrequencyChange(self, changes):
-        self.stopServices()
         if not self.source.isAvailable():
             return
-        self._scheduleServiceStartup()
+        self._scheduleServiceStartup(ServiceHandler.reconciliationDelay)
 
     def _cancelStartupTimer(self):
         if self.startupTimer:
             self.startupTimer.cancel()
             self.startupTimer = None
 
-    def _scheduleServiceStartup(self):
+    def _scheduleServiceStartup(self, delay=10):
         self._cancelStartupTimer()
-        self.startupTimer = threading.Timer(10, self.updateServices)
+        self.startupTimer = threading.Timer(delay, self.updateServices)
         self.startupTimer.start()
 
+    def getDesiredServices(self):
+        """
+        calculates the services that should be running with the current sdr settings.
+
+        returns a dict mapping a service key to a tuple of (source key, dial group). the source key identifies the
+        resampler a service group runs on, or None if it runs directly on the sdr source.
+        """
+        cf = self.source.getProps()["center_freq"]
+        sr = self.source.getProps()["samp_rate"]
+        srh = sr / 2
+        frequency_range = (cf - srh, cf + srh)
+
+        dials = [
+            dial
+            for dial in Bandplan.getSharedInstance().collectDialFrequencies(frequency_range)
+            if self.isSupported(dial["mode"])
+        ]
+
+        if not dials:
+            return {}
+
+        groups = self.optimizeResampling(dials, sr)
+        if groups is None:
+            sources = {None: dials}
+        else:
+            # resamplers can follow center frequency changes, but the decimation depends on the sample rate
+            sources = {(self.get_center_frequency(g), self.get_bandwidth(g), sr): g for g in groups}
+
+        desired = {}
+        for sourceKey, group in sources.items():
+            for serviceGroup in self.groupServices(group):
+                dialKey = tuple((dial["mode"], dial["frequency"]) for dial in serviceGroup)
+                # direct services need to be restarted when the sample rate changes, since it changes their decimation
+                key = (sourceKey if sourceKey is not None else sr, dialKey)
+                desired[key] = (sourceKey, serviceGroup)
+        return desired
+
     def updateServices(self):
         with self.lock:
             logger.debug("re-scheduling services due to sdr changes")
-            self.stopServices()
             if not self.source.isAvailable():
                 logger.debug("sdr source is unavailable")
+                self.stopServices()
                 return
-            cf = self.source.getProps()["center_freq"]
-            sr = self.source.getProps()["samp_rate"]
-            srh = sr / 2
-            frequency_range = (cf - srh, cf + srh)
-
-            dials = [
-                dial
-                for dial in Bandplan.getSharedInstance().collectDialFrequencies(frequency_range)
-                if self.isSupported(dial["mode"])
-            ]
 
-            if not dials:
+            desired = self.getDesiredServices()
+            if not desired:
                 logger.debug("no services available")
-                return
+            self.desired = desired
+            if self.activityDetector is not None:
+                self.activityDetector.setPassbands(self.getPassbands())
+
+            suspended = set(key for key in desired if not self.isActive(key))
+            for key in suspended - self.suspended:
+                logger.debug("suspending inactive service group %s", key)
+                self._suspendMetrics(key)
+            for key in self.suspended - suspended:
+                self._resumeMetrics(key)
+            self.suspended = suspended
+
+            obsolete = [key for key in self.services if key not in desired or key in suspended]
+            for key in obsolete:
+                self.services.pop(key).stop()
+
+            sourceKeys = set(sourceKey for key, (sourceKey, _) in desired.items() if key not in suspended)
+            for key in [key for key in self.resamplers if key not in sourceKeys]:
+                self.resamplers.pop(key).stop()
 
-            groups = self.optimizeResampling(dials, sr)
-            if groups is None:
-                for dial in dials:
-                    self.services.append(self.setupService(dial["mode"], dial["frequency"], self.source))
-            else:
-                for group in groups:
-                    cf = self.get_center_frequency(group)
-                    bw = self.get_bandwidth(group)
-                    logger.debug("group center frequency: {0}, bandwidth: {1}".format(cf, bw))
-                    resampler_props = PropertyLayer()
-                    resampler_props["center_freq"] = cf
-                    resampler_props["samp_rate"] = bw
-                    resampler = Resampler(resampler_props, self.source)
-                    resampler.start()
-
-                    for dial in group:
-                        self.services.append(self.setupService(dial["mode"], dial["frequency"], resampler))
-
-                    # resampler goes in after the services since it must not be shutdown as long as the services are
-                    # still running
-                    self.services.append(resampler)
+            cf = self.source.getProps()["center_freq"]
+            for resampler in self.resamplers.values():
+                resampler.setSdrCenterFrequency(cf)
+
+            started = 0
+            for key, (sourceKey, group) in desired.items():
+                if key in suspended:
+                    continue
+                if key in self.services:
+                    if sourceKey is None:
+                        # direct services can follow the sdr center frequency without restarting
+                        service = self.services[key]
+                        service.set_center_freq(cf)
+                        service.set_offset_freq(group[0]["frequency"] - cf)
+                    continue
+                self.services[key] = self.setupServiceGroup(group, self.getServiceSource(sourceKey))
+                started += 1
+
+            logger.debug(
+                "services updated: %i stopped, %i started, %i suspended, %i kept",
+                len(obsolete),
+                started,
+                len(suspended),
+                len(desired) - len(suspended) - started,
+            )
+
+    def _setActivityDetection(self, enabled):
+        with self.lock:
+            if enabled and self.activityDetector is None:
+                self.activityDetector = BandActivityDetector(self.source, self.onActivityChange)
+                self.activityDetector.setPassbands(self.getPassbands())
+                self.activityDetector.start()
+            elif not enabled and self.activityDetector is not None:
+                self.activityDetector.stop()
+                self.activityDetector = None
+                if self.suspended and self.source.isAvailable():
+                    self._scheduleServiceStartup(ServiceHandler.reconciliationDelay)
+
+    def getPassbands(self):
+        return {key: self.get_min_max(group) for key, (_, group) in self.desired.items()}
+
+    def isActive(self, key):
+        return self.activityDetector is None or self.activityDetector.isActive(key)
+
+    def onActivityChange(self, key, active):
+        logger.debug("activity on service group %s: %s", key, active)
+        if self.source.isAvailable():
+            self._scheduleServiceStartup(ServiceHandler.reconciliationDelay)
+
+    def _suspendMetrics(self, key):
+        sourceKey, group = self.desired[key]
+        samp_rate = self.source.getProps()["samp_rate"] if sourceKey is None else sourceKey[1]
+        # the cost of the shared chain is attributed to the dials in equal parts
+        cost = ResamplingCostModel.getSharedInstance().getCost("service", samp_rate) / len(group)
+        for dial in group:
+            DialActivityMetrics.getSharedInstance(dial["mode"], dial["frequency"]).suspend(cost)
+
+    def _resumeMetrics(self, key):
+        for mode, frequency in key[1]:
+            DialActivityMetrics.getSharedInstance(mode, frequency).resume()
+
+    def getServiceSource(self, sourceKey):
+        if sourceKey is None:
+            return self.source
+        if sourceKey not in self.resamplers:
+            cf, bw, _ = sourceKey
+            logger.debug("group center frequency: {0}, bandwidth: {1}".format(cf, bw))
+            resampler_props = PropertyLayer()
+            resampler_props["center_freq"] = cf
+            resampler_props["samp_rate"] = bw
+            resampler = Resampler(resampler_props, self.source)
+            resampler.start()
+            self.resamplers[sourceKey] = resampler
+        return self.resamplers[sourceKey]
 
     def get_min_max(self, group):
         frequencies = sorted(group, key=lambda f: f["frequency"])
@@ -245,35 +404,138 @@ class ServiceHandler(SdrSourceEventClient):
                 previous = split
             groups.append([f for f in freqs if previous < f["frequency"]])
 
-            def get_total_bandwidth(group):
-                return bandwidth + len(group) * self.get_bandwidth(group)
+            def get_group_cost(group):
+                # one resampler on the full bandwidth, plus the service chains on the resampler output
+                chains = len(self.groupServices(group))
+                return costModel.getCost("resampler", bandwidth) + chains * costModel.getCost(
+                    "service", self.get_bandwidth(group)
+                )
 
-            total_bandwidth = sum([get_total_bandwidth(group) for group in groups])
             return {
                 "num_splits": num_splits,
-                "total_bandwidth": total_bandwidth,
+                "predicted_cost": sum([get_group_cost(group) for group in groups]),
                 "groups": groups,
             }
 
+        costModel = ResamplingCostModel.getSharedInstance()
         usages = [calculate_usage(i) for i in range(0, len(freqs))]
         # another possible outcome might be that it's best not to resample at all. this is a special case.
         usages += [
             {
                 "num_splits": None,
-                "total_bandwidth": bandwidth * len(freqs),
+                "predicted_cost": len(self.groupServices(freqs)) * costModel.getCost("service", bandwidth),
                 "groups": [freqs],
             }
         ]
-        results = sorted(usages, key=lambda f: f["total_bandwidth"])
+        results = sorted(usages, key=lambda f: f["predicted_cost"])
 
         for r in results:
-            logger.debug("splits: {0}, total: {1}".format(r["num_splits"], r["total_bandwidth"]))
+            logger.debug("splits: {0}, predicted cost: {1}".format(r["num_splits"], r["predicted_cost"]))
 
         best = results[0]
+        costModel.recordDecision(
+            self.getCostSourceId(),
+            {
+                "samp_rate": bandwidth,
+                "timestamp": time.time(),
+                "chosen": best["num_splits"],
+                "options": [
+                    {
+                        "num_splits": r["num_splits"],
+                        "predicted_cost": r["predicted_cost"],
+                        "groups": [
+                            {
+                                "center_freq": self.get_center_frequency(g),
+                                "bandwidth": self.get_bandwidth(g),
+                                "dials": ["{mode}@{frequency}".format(**dial) for dial in g],
+                            }
+                            for g in r["groups"]
+                        ],
+                    }
+                    for r in results
+                ],
+            },
+        )
         if best["num_splits"] is None:
             return None
         return best["groups"]
 
+    def getCostSourceId(self):
+        return self.source.getId()
+
+    def getCostChains(self):
+        with self.lock:
+            chains = [
+                CostChain("resampler", self.source.getProps()["samp_rate"], [r.process.pid])
+                for r in self.resamplers.values()
+                if r.process is not None
+            ]
+            for service in self.services.values():
+                processes = [p for p in [service.process, service.secondary_process_demod] if p is not None]
+                if processes:
+                    chains.append(CostChain("service", service.samp_rate, [p.pid for p in processes]))
+        return chains
+
+    def isGroupable(self, mode):
+        return isinstance(Modes.findByModulation(mode), WsjtMode) or mode == "js8"
+
+    def supportsAudioOffset(self, mode):
+        profiles = dsp.get_chopper_profiles(mode)
+        return profiles is not None and all(p.supportsAudioOffset() for p in profiles)
+
+    def groupServices(self, dials):
+        """
+        combine the audio chopper based decoders that fit into a single USB passband, so that they can share one
+        demodulator chain. the lowest dial frequency of a group is used as the dial of the shared demodulator, the other
+        decoders are restricted to their part of the audio band.
+        """
+        groups = []
+        current = None
+        for dial in sorted(dials, key=lambda d: d["frequency"]):
+            if not self.isGroupable(dial["mode"]):
+                groups.append([dial])
+                continue
+            if current is not None:
+                offset = dial["frequency"] - current[0]["frequency"]
+                high = offset + Modes.findByModulation(dial["mode"]).get_bandpass().high_cut
+                if high <= ServiceHandler.maxGroupBandwidth and (offset == 0 or self.supportsAudioOffset(dial["mode"])):
+                    current.append(dial)
+                    continue
+            current = [dial]
+            groups.append(current)
+        return groups
+
+    def setupServiceGroup(self, group, source):
+        if len(group) == 1:
+            return self.setupService(group[0]["mode"], group[0]["frequency"], source)
+
+        frequency = group[0]["frequency"]
+        logger.debug(
+            "setting up shared demodulator on frequency %i for %s",
+            frequency,
+            ", ".join("{mode} ({frequency})".format(**dial) for dial in group),
+        )
+        profiles = []
+        low_cut = None
+        high_cut = None
+        for dial in group:
+            offset = dial["frequency"] - frequency
+            bandpass = Modes.findByModulation(dial["mode"]).get_bandpass()
+            low = offset + bandpass.low_cut
+            high = offset + bandpass.high_cut
+            low_cut = low if low_cut is None else min(low_cut, low)
+            high_cut = high if high_cut is None else max(high_cut, high)
+            for profile in dsp.get_chopper_profiles(dial["mode"]) or []:
+                if profile.supportsAudioOffset():
+                    profile.setAudioRange(low, high)
+                profiles.append(profile)
+
+        d = self._createDsp(ServiceGroupOutput(frequency), group[0]["mode"], frequency, source)
+        d.set_bpf(low_cut, high_cut)
+        d.set_secondary_profiles(profiles)
+        d.start()
+        return d
+
     def setupService(self, mode, frequency, source):
         logger.debug("setting up service {0} on frequency {1}".format(mode, frequency))
         # TODO selecting outputs will need some more intelligence here
@@ -283,6 +545,11 @@ class ServiceHandler(SdrSourceEventClient):
             output = Js8ServiceOutput(frequency)
         else:
             output = WsjtServiceOutput(frequency)
+        d = self._createDsp(output, mode, frequency, source)
+        d.start()
+        return d
+
+    def _createDsp(self, output, mode, frequency, source):
         d = dsp(output)
         d.nc_port = source.getPort()
         center_freq = source.getProps()["center_freq"]
@@ -296,12 +563,11 @@ class ServiceHandler(SdrSourceEventClient):
         d.set_samp_rate(source.getProps()["samp_rate"])
         d.set_temporary_directory(CoreConfig().get_temporary_directory())
         d.set_service()
-        d.start()
         return d
 
 
 class WsjtHandler(object):
-    def write_wsjt_message(self, msg):
+    def write_wsjt_messages(self, messages):
         pass
 
 
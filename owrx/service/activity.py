@@ -0,0 +1,235 @@
+from owrx.source import SdrSourceEventClient, SdrSourceState, SdrBusyState, SdrClientClass
+from owrx.property import PropertyStack
+from owrx.config import Config
+from owrx.metrics import Metrics, DirectMetric
+from array import array
+import threading
+import time
+import math
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SpectrumFrameDecoder(object):
+    """
+    turns the frames produced by the spectrum dsp chain back into dB values. this is the same decoding that is done in
+    openwebrx.js for the waterfall.
+    """
+
+    # csdr prepends this number of samples to every compressed fft frame, so that the adpcm codec can settle
+    padding = 10
+
+    indexTable = [-1, -1, -1, -1, 2, 4, 6, 8, -1, -1, -1, -1, 2, 4, 6, 8]
+    stepTable = [
+        7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45, 50, 55, 60, 66, 73, 80, 88, 97,
+        107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796,
+        876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871,
+        5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623,
+        27086, 29794, 32767
+    ]
+
+    def decode(self, data, compression):
+        if compression == "adpcm":
+            return [v / 100 for v in self._decodeAdpcm(data)[SpectrumFrameDecoder.padding :]]
+        return array("f", data).tolist()
+
+    def _decodeAdpcm(self, data):
+        # every fft frame is compressed separately, so the codec state starts fresh for every frame
+        stepIndex = 0
+        predictor = 0
+        step = 0
+        output = []
+        for byte in data:
+            for nibble in (byte & 0x0F, byte >> 4):
+                stepIndex = min(max(stepIndex + SpectrumFrameDecoder.indexTable[nibble], 0), 88)
+                diff = step >> 3
+                if nibble & 1:
+                    diff += step >> 2
+                if nibble & 2:
+                    diff += step >> 1
+                if nibble & 4:
+                    diff += step
+                if nibble & 8:
+                    diff = -diff
+                predictor = min(max(predictor + diff, -32768), 32767)
+                step = SpectrumFrameDecoder.stepTable[stepIndex]
+                output.append(predictor)
+        return output
+
+
+class BandActivityDetector(SdrSourceEventClient):
+    """
+    Watches the spectrum of an sdr source and decides whether there is any signal within a set of passbands.
+
+    The noise floor is tracked as a low percentile of all fft bins. A passband counts as active as long as any of its
+    bins has been above the noise floor by the configured threshold within the configured timeout.
+    """
+
+    # seconds between two analyzed frames; the spectrum comes in much faster than we need it
+    analysisInterval = 1
+    # the part of the fft bins that is considered to be noise
+    noisePercentile = 0.2
+    # weight of a new measurement for the tracked noise floor
+    noiseFloorRate = 0.05
+
+    def __init__(self, source, listener):
+        self.source = source
+        self.listener = listener
+        self.stack = PropertyStack()
+        self.stack.addLayer(0, source.getProps())
+        self.stack.addLayer(1, Config.get())
+        self.props = self.stack.filter(
+            "center_freq",
+            "samp_rate",
+            "fft_compression",
+            "services_activity_threshold",
+            "services_activity_timeout",
+        )
+        self.decoder = SpectrumFrameDecoder()
+        self.passbands = {}
+        self.lastActivity = {}
+        self.active = {}
+        self.noiseFloor = None
+        self.lastAnalysis = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.source.addSpectrumClient(self)
+
+    def stop(self):
+        self.source.removeSpectrumClient(self)
+        # removing the layers cancels the subscriptions on the sdr and the global config
+        self.stack.removeLayer(self.source.getProps())
+        self.stack.removeLayer(Config.get())
+
+    def getClientClass(self) -> SdrClientClass:
+        # watching the spectrum is not a reason to keep the sdr running
+        return SdrClientClass.INACTIVE
+
+    def onStateChange(self, state: SdrSourceState):
+        pass
+
+    def onBusyStateChange(self, state: SdrBusyState):
+        pass
+
+    def setPassbands(self, passbands):
+        """
+        passbands is a dict mapping a key to a (low, high) tuple of absolute frequencies. new passbands start out as
+        active.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.passbands = dict(passbands)
+            self.lastActivity = {key: self.lastActivity.get(key, now) for key in passbands}
+            self.active = {key: self.active.get(key, True) for key in passbands}
+
+    def isActive(self, key):
+        with self.lock:
+            return self.active.get(key, True)
+
+    def getNoiseFloor(self):
+        return self.noiseFloor
+
+    def write_spectrum_data(self, data):
+        now = time.monotonic()
+        if now - self.lastAnalysis < BandActivityDetector.analysisInterval:
+            return
+        self.lastAnalysis = now
+        try:
+            levels = self.decoder.decode(data, self.props["fft_compression"])
+        except Exception:
+            logger.exception("unable to decode spectrum data")
+            return
+        if not levels:
+            return
+
+        noise = sorted(levels)[int(len(levels) * BandActivityDetector.noisePercentile)]
+        if self.noiseFloor is None:
+            self.noiseFloor = noise
+        else:
+            rate = BandActivityDetector.noiseFloorRate
+            self.noiseFloor = (1 - rate) * self.noiseFloor + rate * noise
+
+        threshold = self.noiseFloor + self.props["services_activity_threshold"]
+        timeout = self.props["services_activity_timeout"]
+        samp_rate = self.props["samp_rate"]
+        start = self.props["center_freq"] - samp_rate / 2
+        bins = len(levels)
+
+        changes = []
+        with self.lock:
+            for key, (low, high) in self.passbands.items():
+                first = min(max(int((low - start) / samp_rate * bins), 0), bins - 1)
+                last = min(max(math.ceil((high - start) / samp_rate * bins), first + 1), bins)
+                if max(levels[first:last]) > threshold:
+                    self.lastActivity[key] = now
+                active = now - self.lastActivity[key] < timeout
+                if active != self.active[key]:
+                    self.active[key] = active
+                    changes.append((key, active))
+
+        for key, active in changes:
+            try:
+                self.listener(key, active)
+            except Exception:
+                logger.exception("error while handling activity change")
+
+
+class DialActivityMetrics(object):
+    """
+    keeps track of the time a dial has been suspended due to inactivity, and the cpu time that has been saved by that
+    """
+
+    sharedInstances = {}
+    creationLock = threading.Lock()
+
+    @staticmethod
+    def getSharedInstance(mode, frequency):
+        with DialActivityMetrics.creationLock:
+            key = (mode, frequency)
+            if key not in DialActivityMetrics.sharedInstances:
+                DialActivityMetrics.sharedInstances[key] = DialActivityMetrics(mode, frequency)
+        return DialActivityMetrics.sharedInstances[key]
+
+    def __init__(self, mode, frequency):
+        self.suspendedTime = 0
+        self.cpuSaved = 0
+        self.since = None
+        self.cost = 0
+        self.lock = threading.Lock()
+        metrics = Metrics.getSharedInstance()
+        prefix = "services.activity.{mode}.{frequency}".format(mode=mode, frequency=frequency)
+        metrics.addMetric(prefix + ".suspended", DirectMetric(lambda: 0 if self.since is None else 1))
+        metrics.addMetric(prefix + ".suspended_seconds", DirectMetric(self.getSuspendedTime))
+        metrics.addMetric(prefix + ".cpu_saved_seconds", DirectMetric(self.getCpuSaved))
+
+    def suspend(self, cost):
+        """
+        :param cost: the estimated cpu usage of the dial while running, in cpu seconds per second
+        """
+        with self.lock:
+            if self.since is None:
+                self.since = time.monotonic()
+                self.cost = cost
+
+    def resume(self):
+        with self.lock:
+            if self.since is None:
+                return
+            duration = time.monotonic() - self.since
+            self.suspendedTime += duration
+            self.cpuSaved += duration * self.cost
+            self.since = None
+
+    def _getCurrent(self):
+        return 0 if self.since is None else time.monotonic() - self.since
+
+    def getSuspendedTime(self):
+        with self.lock:
+            return self.suspendedTime + self._getCurrent()
+
+    def getCpuSaved(self):
+        with self.lock:
+            return self.cpuSaved + self._getCurrent() * self.cost
@@ -0,0 +1,180 @@
+import threading
+import time
+import os
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessGroupCpu(object):
+    """
+    reads the accumulated cpu time of process groups from /proc.
+
+    all our csdr chains are started with start_new_session=True, so the process group id is the pid of the shell that
+    runs the chain, and all the processes in the pipeline share it.
+    """
+
+    ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    @staticmethod
+    def getCpuTimes():
+        times = {}
+        try:
+            entries = os.listdir("/proc")
+        except OSError:
+            # no procfs, possibly we're on a Mac
+            return times
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            try:
+                with open("/proc/{pid}/stat".format(pid=entry), "r") as f:
+                    stat = f.read()
+            except OSError:
+                # process has gone away in the meantime
+                continue
+            # the process name may contain spaces, so the fields are counted from the closing parenthesis
+            fields = stat[stat.rindex(")") + 2 :].split(" ")
+            pgrp = int(fields[2])
+            cpu = (int(fields[11]) + int(fields[12])) / ProcessGroupCpu.ticks
+            times[pgrp] = times.get(pgrp, 0) + cpu
+        return times
+
+
+class CostChain(object):
+    """
+    a running chain as seen by the cost model: its kind ("resampler" or "service"), the sample rate going into it, and
+    the process groups doing the work.
+    """
+
+    def __init__(self, kind, samp_rate, pgids):
+        self.kind = kind
+        self.samp_rate = samp_rate
+        self.pgids = tuple(sorted(pgids))
+
+    def getKey(self):
+        return self.kind, self.samp_rate, self.pgids
+
+
+class ResamplingCostModel(object):
+    """
+    Predicts the cpu load of the chains used for background services, in cpu cores per million input samples per
+    second.
+
+    The defaults are rough estimates; while services are running, the actual cpu usage of their process groups is
+    measured and the coefficients are adjusted towards the measured values.
+    """
+
+    sharedInstance = None
+    creationLock = threading.Lock()
+
+    defaults = {
+        # nc + shift + fir_decimate + nmux on the full sdr bandwidth
+        "resampler": 0.08,
+        # nc + shift + fir_decimate + bandpass + demodulation on the bandwidth of the chain's source
+        "service": 0.06,
+    }
+    # weight of a new measurement in the moving average
+    learningRate = 0.2
+    # seconds between measurements
+    measurementInterval = 60
+
+    @staticmethod
+    def getSharedInstance():
+        with ResamplingCostModel.creationLock:
+            if ResamplingCostModel.sharedInstance is None:
+                ResamplingCostModel.sharedInstance = ResamplingCostModel()
+        return ResamplingCostModel.sharedInstance
+
+    def __init__(self):
+        self.coefficients = dict(ResamplingCostModel.defaults)
+        self.measurements = {kind: 0 for kind in ResamplingCostModel.defaults}
+        self.decisions = {}
+        self.clients = []
+        self.lastSample = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.endEvent = threading.Event()
+
+    def getCost(self, kind, samp_rate):
+        with self.lock:
+            return self.coefficients[kind] * samp_rate / 1e6
+
+    def recordDecision(self, sourceId, decision):
+        with self.lock:
+            self.decisions[sourceId] = decision
+
+    def getState(self):
+        with self.lock:
+            return {
+                "coefficients": dict(self.coefficients),
+                "measurements": dict(self.measurements),
+                "decisions": {k: dict(v) for k, v in self.decisions.items()},
+            }
+
+    def addClient(self, client):
+        """
+        clients need to implement getCostChains(), returning a list of CostChain instances, and getCostSourceId(),
+        identifying the decision the chains belong to.
+        """
+        with self.lock:
+            self.clients.append(client)
+            if self.thread is None:
+                self.endEvent.clear()
+                self.thread = threading.Thread(target=self.run, name="resampling_cost_model")
+                self.thread.start()
+
+    def removeClient(self, client):
+        with self.lock:
+            try:
+                self.clients.remove(client)
+            except ValueError:
+                pass
+            if not self.clients and self.thread is not None:
+                self.endEvent.set()
+                self.thread = None
+
+    def run(self):
+        while not self.endEvent.wait(timeout=ResamplingCostModel.measurementInterval):
+            try:
+                self.measure()
+            except Exception:
+                logger.exception("error while measuring service cpu usage")
+
+    def measure(self):
+        with self.lock:
+            clients = list(self.clients)
+        now = time.monotonic()
+        cpuTimes = ProcessGroupCpu.getCpuTimes()
+        sample = {}
+        observed = {kind: [] for kind in self.coefficients}
+        for client in clients:
+            actual = 0
+            predicted = 0
+            for chain in client.getCostChains():
+                key = chain.getKey()
+                cpu = sum(cpuTimes.get(pgid, 0) for pgid in chain.pgids)
+                sample[key] = (now, cpu)
+                predicted += self.getCost(chain.kind, chain.samp_rate)
+                if key not in self.lastSample or chain.samp_rate <= 0:
+                    continue
+                lastTime, lastCpu = self.lastSample[key]
+                usage = (cpu - lastCpu) / (now - lastTime)
+                actual += usage
+                observed[chain.kind].append(usage / (chain.samp_rate / 1e6))
+            with self.lock:
+                decision = self.decisions.get(client.getCostSourceId())
+                if decision is not None:
+                    decision["running"] = {"predicted": predicted, "actual": actual, "timestamp": time.time()}
+
+        with self.lock:
+            self.lastSample = sample
+            for kind, values in observed.items():
+                if not values:
+                    continue
+                measured = sum(values) / len(values)
+                rate = ResamplingCostModel.learningRate
+                self.coefficients[kind] = (1 - rate) * self.coefficients[kind] + rate * measured
+                self.measurements[kind] += 1
+                logger.debug("cost coefficient for %s chains is now %f", kind, self.coefficients[kind])
@@ -1,4 +1,6 @@
 from .direct import DirectSource
+from owrx.config.core import CoreConfig
+from csdr.pipe import Pipe
 
 import logging
 
@@ -16,19 +18,43 @@ class Resampler(DirectSource):
         if_samp_rate = sdrProps["samp_rate"] / self.decimation
         self.transition_bw = 0.15 * (if_samp_rate / float(sdrProps["samp_rate"]))
         props["samp_rate"] = if_samp_rate
+        self.shiftPipe = None
 
         self.sdr = sdr
         super().__init__(None, props)
 
+    def preStart(self):
+        self.shiftPipe = Pipe.create(
+            "{tmp_dir}/openwebrx_resampler_shift".format(tmp_dir=CoreConfig().get_temporary_directory()), Pipe.WRITE
+        )
+        self._sendShift()
+
     def getCommand(self):
         return [
             "nc -v 127.0.0.1 {nc_port}".format(nc_port=self.sdr.getPort()),
-            "csdr shift_addfast_cc {shift}".format(shift=self.shift),
+            "csdr shift_addfast_cc --fifo {shift_pipe}".format(shift_pipe=self.shiftPipe),
             "csdr fir_decimate_cc {decimation} {ddc_transition_bw} HAMMING".format(
                 decimation=self.decimation, ddc_transition_bw=self.transition_bw
             ),
         ] + self.getNmuxCommand()
 
+    def setSdrCenterFrequency(self, center_freq):
+        """
+        follow a center frequency change of the underlying sdr without restarting
+        """
+        self.shift = (center_freq - self.getProps()["center_freq"]) / self.sdr.getProps()["samp_rate"]
+        self._sendShift()
+
+    def _sendShift(self):
+        if self.shiftPipe is not None:
+            self.shiftPipe.write("%g\n" % self.shift)
+
+    def stop(self):
+        super().stop()
+        if self.shiftPipe is not None:
+            self.shiftPipe.close()
+            self.shiftPipe = None
+
     def activateProfile(self, profile_id=None):
         logger.warning("Resampler does not support setting profiles")
         pass
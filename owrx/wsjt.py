@@ -15,7 +15,19 @@ logger = logging.getLogger(__name__)
 
 
 class WsjtProfile(AudioChopperProfile, metaclass=ABCMeta):
-    def decoding_depth(self):
+    audioRange = None
+    # jt9 can spread a decode over multiple threads
+    maxThreads = 4
+
+    def decoding_depth(self, reduction=0):
+        # an overloaded decoding queue lowers the depth, but never below 1
+        return max(1, self.configured_decoding_depth() - reduction)
+
+    def job_depth(self, depth):
+        # the configured depth applies when the command line is requested outside of the decoding queue
+        return self.decoding_depth() if depth is None else depth
+
+    def configured_decoding_depth(self):
         pm = Config.get()
         mode = self.getMode().lower()
         # mode-specific setting?
@@ -27,6 +39,26 @@ class WsjtProfile(AudioChopperProfile, metaclass=ABCMeta):
         # default when no setting is provided
         return 3
 
+    def supportsAudioOffset(self):
+        return True
+
+    def setAudioRange(self, low, high):
+        self.audioRange = (low, high)
+
+    def getAudioRangeArguments(self):
+        if self.audioRange is None:
+            return []
+        low, high = self.audioRange
+        return ["-L", str(low), "-H", str(high)]
+
+    def getMaxThreads(self):
+        return self.maxThreads
+
+    def getThreadArguments(self, threads):
+        if threads <= 1:
+            return []
+        return ["-m", str(threads)]
+
     def getTimestampFormat(self):
         if self.getInterval() < 60:
             return "%H%M%S"
@@ -35,17 +67,18 @@ class WsjtProfile(AudioChopperProfile, metaclass=ABCMeta):
     def getFileTimestampFormat(self):
         return "%y%m%d_" + self.getTimestampFormat()
 
-    @abstractmethod
-    def getMode(self):
-        pass
-
 
 class Ft8Profile(WsjtProfile):
     def getInterval(self):
         return 15
 
-    def decoder_commandline(self, file):
-        return ["jt9", "--ft8", "-d", str(self.decoding_depth()), file]
+    def decoder_commandline(self, file, threads=1, depth=None):
+        return (
+            ["jt9", "--ft8", "-d", str(self.job_depth(depth))]
+            + self.getThreadArguments(threads)
+            + self.getAudioRangeArguments()
+            + [file]
+        )
 
     def getMode(self):
         return "FT8"
@@ -55,13 +88,20 @@ class WsprProfile(WsjtProfile):
     def getInterval(self):
         return 120
 
-    def decoder_commandline(self, file):
+    # wsprd is single-threaded
+    maxThreads = 1
+
+    def decoder_commandline(self, file, depth=None):
         cmd = ["wsprd"]
-        if self.decoding_depth() > 1:
+        if self.job_depth(depth) > 1:
             cmd += ["-d"]
         cmd += [file]
         return cmd
 
+    def supportsAudioOffset(self):
+        # wsprd always searches the 1400 - 1600 Hz audio window
+        return False
+
     def getMode(self):
         return "WSPR"
 
@@ -70,8 +110,13 @@ class Jt65Profile(WsjtProfile):
     def getInterval(self):
         return 60
 
-    def decoder_commandline(self, file):
-        return ["jt9", "--jt65", "-d", str(self.decoding_depth()), file]
+    def decoder_commandline(self, file, threads=1, depth=None):
+        return (
+            ["jt9", "--jt65", "-d", str(self.job_depth(depth))]
+            + self.getThreadArguments(threads)
+            + self.getAudioRangeArguments()
+            + [file]
+        )
 
     def getMode(self):
         return "JT65"
@@ -81,8 +126,13 @@ class Jt9Profile(WsjtProfile):
     def getInterval(self):
         return 60
 
-    def decoder_commandline(self, file):
-        return ["jt9", "--jt9", "-d", str(self.decoding_depth()), file]
+    def decoder_commandline(self, file, threads=1, depth=None):
+        return (
+            ["jt9", "--jt9", "-d", str(self.job_depth(depth))]
+            + self.getThreadArguments(threads)
+            + self.getAudioRangeArguments()
+            + [file]
+        )
 
     def getMode(self):
         return "JT9"
@@ -92,8 +142,13 @@ class Ft4Profile(WsjtProfile):
     def getInterval(self):
         return 7.5
 
-    def decoder_commandline(self, file):
-        return ["jt9", "--ft4", "-d", str(self.decoding_depth()), file]
+    def decoder_commandline(self, file, threads=1, depth=None):
+        return (
+            ["jt9", "--ft4", "-d", str(self.job_depth(depth))]
+            + self.getThreadArguments(threads)
+            + self.getAudioRangeArguments()
+            + [file]
+        )
 
     def getMode(self):
         return "FT4"
@@ -108,8 +163,13 @@ class Fst4Profile(WsjtProfile):
     def getInterval(self):
         return self.interval
 
-    def decoder_commandline(self, file):
-        return ["jt9", "--fst4", "-p", str(self.interval), "-d", str(self.decoding_depth()), file]
+    def decoder_commandline(self, file, threads=1, depth=None):
+        return (
+            ["jt9", "--fst4", "-p", str(self.interval), "-d", str(self.job_depth(depth))]
+            + self.getThreadArguments(threads)
+            + self.getAudioRangeArguments()
+            + [file]
+        )
 
     def getMode(self):
         return "FST4"
@@ -130,8 +190,16 @@ class Fst4wProfile(WsjtProfile):
     def getInterval(self):
         return self.interval
 
-    def decoder_commandline(self, file):
-        return ["jt9", "--fst4w", "-p", str(self.interval), "-d", str(self.decoding_depth()), file]
+    def decoder_commandline(self, file, threads=1, depth=None):
+        return (
+            ["jt9", "--fst4w", "-p", str(self.interval), "-d", str(self.job_depth(depth))]
+            + self.getThreadArguments(threads)
+            + [file]
+        )
+
+    def supportsAudioOffset(self):
+        # fst4w decodes around a fixed audio frequency
+        return False
 
     def getMode(self):
         return "FST4W"
@@ -187,8 +255,13 @@ class Q65Profile(WsjtProfile):
     def getInterval(self):
         return self.interval
 
-    def decoder_commandline(self, file):
-        return ["jt9", "--q65", "-p", str(self.interval), "-b", self.mode.name, "-d", str(self.decoding_depth()), file]
+    def decoder_commandline(self, file, threads=1, depth=None):
+        return (
+            ["jt9", "--q65", "-p", str(self.interval), "-b", self.mode.name, "-d", str(self.job_depth(depth))]
+            + self.getThreadArguments(threads)
+            + self.getAudioRangeArguments()
+            + [file]
+        )
 
     @staticmethod
     def getEnabledProfiles():
@@ -211,46 +284,73 @@ class Q65Profile(WsjtProfile):
 
 
 class WsjtParser(Parser):
-    def parse(self, messages):
-        for data in messages:
+    """
+    Parses the decoding results of one cycle at a time. Map, reporting and client updates are sent once per cycle.
+    """
+
+    def __init__(self, handler):
+        super().__init__(handler)
+        # the message parsers are stateless, so they can be shared by all cycles
+        self.qsoMessageParser = QsoMessageParser()
+        self.beaconMessageParser = BeaconMessageParser()
+
+    def parse(self, results):
+        for result in results:
+            try:
+                self.parseResult(result)
+            except Exception:
+                logger.exception("Exception while parsing wsjt decoding result")
+
+    def parseResult(self, result):
+        profile = result.profile
+        self.setDialFrequency(result.freq)
+        mode = profile.getMode()
+        interval = profile.getInterval()
+        if mode in ["WSPR", "FST4W"]:
+            messageParser = self.beaconMessageParser
+        else:
+            messageParser = self.qsoMessageParser
+        # decoders cache the timestamp, which is the same for all messages of a cycle
+        if mode == "WSPR":
+            decoder = WsprDecoder(profile, messageParser)
+        else:
+            decoder = Jt9Decoder(profile, messageParser)
+
+        messages = []
+        locations = []
+        spots = []
+        for raw_msg in result.lines:
             try:
-                profile, freq, raw_msg = data
-                self.setDialFrequency(freq)
                 msg = raw_msg.decode().rstrip()
                 # known debug messages we know to skip
                 if msg.startswith("<DecodeFinished>"):
-                    return
+                    continue
                 if msg.startswith(" EOF on input file"):
-                    return
-
-                mode = profile.getMode()
-                if mode in ["WSPR", "FST4W"]:
-                    messageParser = BeaconMessageParser()
-                else:
-                    messageParser = QsoMessageParser()
-                if mode == "WSPR":
-                    decoder = WsprDecoder(profile, messageParser)
-                else:
-                    decoder = Jt9Decoder(profile, messageParser)
-                out = decoder.parse(msg, freq)
+                    continue
+
+                out = decoder.parse(msg, result.freq)
                 if isinstance(profile, Q65Profile) and not out["msg"]:
                     # all efforts in vain, it's just a potential signal indicator
-                    return
+                    continue
                 out["mode"] = mode
-                out["interval"] = profile.getInterval()
+                out["interval"] = interval
 
-                self.pushDecode(mode)
                 if "callsign" in out and "locator" in out:
-                    Map.getSharedInstance().updateLocation(
-                        out["callsign"], LocatorLocation(out["locator"]), mode, self.band
-                    )
-                    ReportingEngine.getSharedInstance().spot(out)
-
-                self.handler.write_wsjt_message(out)
+                    locations.append((out["callsign"], LocatorLocation(out["locator"]), mode, self.band))
+                    spots.append(out)
+                messages.append(out)
             except Exception:
                 logger.exception("Exception while parsing wsjt message")
 
-    def pushDecode(self, mode):
+        if not messages:
+            return
+        self.pushDecode(mode, len(messages))
+        Map.getSharedInstance().updateLocations(locations)
+        if spots:
+            ReportingEngine.getSharedInstance().spotAll(spots)
+        self.handler.write_wsjt_messages(messages)
+
+    def pushDecode(self, mode, count=1):
         metrics = Metrics.getSharedInstance()
         band = "unknown"
         if self.band is not None:
@@ -267,24 +367,32 @@ class WsjtParser(Parser):
             metric = CounterMetric()
             metrics.addMetric(name, metric)
 
-        metric.inc()
+        metric.inc(count)
 
 
 class Decoder(ABC):
     def __init__(self, profile, messageParser):
         self.profile = profile
         self.messageParser = messageParser
+        self.dateformat = profile.getTimestampFormat()
+        # all messages of a decoding cycle carry the same timestamp, so strptime() only needs to run once
+        self.timestampCache = (None, None)
 
     def parse_timestamp(self, instring):
-        dateformat = self.profile.getTimestampFormat()
+        dateformat = self.dateformat
         remain = instring[len(dateformat) + 1 :]
+        tsstring = instring[0 : len(dateformat)]
+        if self.timestampCache[0] == tsstring:
+            return remain, self.timestampCache[1]
         try:
-            ts = datetime.strptime(instring[0 : len(dateformat)], dateformat)
-            return remain, int(
+            ts = datetime.strptime(tsstring, dateformat)
+            timestamp = int(
                 datetime.combine(datetime.utcnow().date(), ts.time()).replace(tzinfo=timezone.utc).timestamp() * 1000
             )
         except ValueError:
-            return remain, None
+            timestamp = None
+        self.timestampCache = (tsstring, timestamp)
+        return remain, timestamp
 
     @abstractmethod
     def parse(self, msg, dial_freq):
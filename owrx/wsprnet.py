@@ -1,36 +1,127 @@
-from owrx.reporting import Reporter
+from owrx.reporting import Reporter, SpotSpool, BackpressurePolicy
 from owrx.version import openwebrx_version
 from owrx.config import Config
+from owrx.config.core import CoreConfig
 from owrx.locator import Locator
-from owrx.metrics import Metrics, CounterMetric
-from queue import Queue, Full
-from urllib import request, parse
+from owrx.metrics import Metrics, CounterMetric, DirectMetric
+from queue import Queue, Full, Empty
+from urllib import parse
+from http import client
 import threading
 import logging
+import time
+import os
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
 
+PoisonPill = object()
+
+
+class UploadError(Exception):
+    pass
+
+
+class WsprnetConnection(object):
+    """
+    A keep-alive http connection to the wsprnet upload url. The connection is reopened after errors.
+    """
+
+    timeout = 60
+
+    def __init__(self, url):
+        parsed = parse.urlsplit(url)
+        self.connectionClass = client.HTTPSConnection if parsed.scheme == "https" else client.HTTPConnection
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path = parsed.path or "/"
+        if parsed.query:
+            self.path += "?" + parsed.query
+        self.connection = None
+
+    def post(self, body):
+        if self.connection is None:
+            self.connection = self.connectionClass(self.host, self.port, timeout=WsprnetConnection.timeout)
+        try:
+            self.connection.request(
+                "POST", self.path, body, headers={"Content-Type": "application/x-www-form-urlencoded"}
+            )
+            response = self.connection.getresponse()
+            # the response needs to be read completely before the connection can be reused
+            response.read()
+        except Exception:
+            self.close()
+            raise
+        if response.will_close:
+            self.close()
+        if response.status >= 400:
+            raise UploadError("wsprnet returned status {}".format(response.status))
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
 class Worker(threading.Thread):
-    def __init__(self, queue: Queue):
-        self.queue = queue
+    # number of retries for a spot before it is dropped
+    maxRetries = 5
+    # delay before the first retry, doubled for every further retry (seconds)
+    retryDelay = 2
+    maxRetryDelay = 120
+    # seconds after which an idle worker checks the spool
+    idleTimeout = 10
+
+    def __init__(self, reporter: "WsprnetReporter"):
+        self.reporter = reporter
         self.doRun = True
         # some constants that we don't expect to change
         config = Config.get()
         self.callsign = config["wsprnet_callsign"]
         self.locator = Locator.fromCoordinates(config["receiver_gps"])
+        self.connection = WsprnetConnection(config["wsprnet_url"])
 
         super().__init__(daemon=True)
 
     def run(self):
         while self.doRun:
             try:
-                spot = self.queue.get()
-                self.uploadSpot(spot)
-                self.queue.task_done()
-            except Exception:
-                logger.exception("Exception while uploading WSPRNet spot")
+                spot = self.reporter.queue.get(timeout=Worker.idleTimeout)
+            except Empty:
+                self.reporter.refill()
+                continue
+            if spot is PoisonPill:
+                self.doRun = False
+            else:
+                try:
+                    self.uploadWithRetries(spot)
+                except Exception:
+                    logger.exception("Exception while uploading WSPRNet spot")
+                # don't wait for the queue to run empty if there are spooled spots
+                self.reporter.refill(WsprnetReporter.queueSize // 2)
+            self.reporter.queue.task_done()
+        self.connection.close()
+
+    def uploadWithRetries(self, spot):
+        body = self.encodeSpot(spot)
+        for attempt in range(0, Worker.maxRetries + 1):
+            if attempt > 0:
+                self.reporter.retryCounter.inc()
+                delay = min(Worker.retryDelay * 2 ** (attempt - 1), Worker.maxRetryDelay)
+                if self.reporter.endEvent.wait(delay):
+                    # shutting down; keep the spot for later
+                    self.reporter.spool.append([spot])
+                    return
+            start = time.monotonic()
+            try:
+                self.connection.post(body)
+                self.reporter.onUpload(time.monotonic() - start)
+                return
+            except (OSError, client.HTTPException, UploadError) as e:
+                logger.debug("WSPRNet upload failed (attempt %i): %s", attempt + 1, e)
+        logger.warning("WSPRNet upload failed after %i retries; dropping one spot", Worker.maxRetries)
+        self.reporter.dropCounter.inc()
 
     def _getMode(self, spot):
         interval = round(spot["interval"] / 60)
@@ -39,11 +130,11 @@ class Worker(threading.Thread):
             return interval + 1
         return interval
 
-    def uploadSpot(self, spot):
+    def encodeSpot(self, spot):
         # function=wspr&date=210114&time=1732&sig=-15&dt=0.5&drift=0&tqrg=7.040019&tcall=DF2UU&tgrid=JN48&dbm=37&version=2.3.0-rc3&rcall=DD5JFK&rgrid=JN58SC&rqrg=7.040047&mode=2
         # {'timestamp': 1610655960000, 'db': -23.0, 'dt': 0.3, 'freq': 7040048, 'drift': -1, 'msg': 'LA3JJ JO59 37', 'callsign': 'LA3JJ', 'locator': 'JO59', 'mode': 'WSPR'}
         date = datetime.fromtimestamp(spot["timestamp"] / 1000, tz=timezone.utc)
-        data = parse.urlencode(
+        return parse.urlencode(
             {
                 "function": "wspr",
                 "date": date.strftime("%y%m%d"),
@@ -63,30 +154,107 @@ class Worker(threading.Thread):
                 "mode": self._getMode(spot),
             }
         ).encode()
-        request.urlopen("http://wsprnet.org/post/", data, timeout=60)
 
 
 class WsprnetReporter(Reporter):
+    """
+    Uploads spots to wsprnet with a configurable number of concurrent workers. Spots that don't fit into the queue are
+    spooled to disk and uploaded once the queue has room again; so are the spots that are pending on shutdown.
+    """
+
+    name = "wsprnet"
+    queueSize = 100
+    # spots are spooled when the uploads fall behind, so only a stuck reporter can fill up its channel. in that case,
+    # the spots that are already waiting are kept in order.
+    backpressurePolicy = BackpressurePolicy.DROP_NEWEST
+    # weight of a new measurement for the average upload latency
+    latencyRate = 0.1
+
     def __init__(self):
-        # max 100 entries
-        self.queue = Queue(100)
-        # single worker
-        Worker(self.queue).start()
+        self.queue = Queue(WsprnetReporter.queueSize)
+        self.endEvent = threading.Event()
+        self.spool = SpotSpool(os.path.join(CoreConfig().get_data_directory(), "wsprnet.spool"))
+        self.spooled = False
+        self.spoolLock = threading.Lock()
+        self.latency = 0
 
         # metrics
         metrics = Metrics.getSharedInstance()
         self.spotCounter = CounterMetric()
         metrics.addMetric("wsprnet.spots", self.spotCounter)
+        self.uploadCounter = CounterMetric()
+        metrics.addMetric("wsprnet.uploads", self.uploadCounter)
+        self.retryCounter = CounterMetric()
+        metrics.addMetric("wsprnet.retries", self.retryCounter)
+        self.dropCounter = CounterMetric()
+        metrics.addMetric("wsprnet.drops", self.dropCounter)
+        self.spoolCounter = CounterMetric()
+        metrics.addMetric("wsprnet.spooled", self.spoolCounter)
+        metrics.addMetric("wsprnet.latency_ms", DirectMetric(lambda: self.latency * 1000))
+
+        self.workers = [Worker(self) for _ in range(0, max(1, Config.get()["wsprnet_upload_workers"]))]
+        for w in self.workers:
+            w.start()
+        # pick up what's left from the last run
+        self.spooled = True
+        self.refill()
 
     def stop(self):
-        pass
+        with self.spoolLock:
+            self.endEvent.set()
+            pending = []
+            try:
+                while True:
+                    pending.append(self.queue.get_nowait())
+                    self.queue.task_done()
+            except Empty:
+                pass
+            self.spool.append(pending)
+        for _ in self.workers:
+            self.queue.put(PoisonPill)
 
     def spot(self, spot):
-        try:
-            self.queue.put(spot, block=False)
-            self.spotCounter.inc()
-        except Full:
-            logger.warning("WSPRNet Queue overflow, one spot lost")
+        self.spotCounter.inc()
+        with self.spoolLock:
+            if self.spooled or self.endEvent.is_set():
+                # keep the order; spooled spots are older
+                self._spool(spot)
+                return
+            try:
+                self.queue.put(spot, block=False)
+            except Full:
+                self._spool(spot)
+
+    def _spool(self, spot):
+        self.spoolCounter.inc()
+        self.spooled = True
+        self.spool.append([spot])
+
+    def refill(self, minimumRoom=1):
+        """
+        moves spooled spots back into the queue as far as there is room
+        """
+        if not self.spooled:
+            return
+        with self.spoolLock:
+            if self.endEvent.is_set():
+                return
+            room = WsprnetReporter.queueSize - self.queue.qsize()
+            if room < minimumRoom:
+                return
+            spots = self.spool.take(room)
+            if len(spots) < room:
+                self.spooled = False
+            for spot in spots:
+                try:
+                    self.queue.put(spot, block=False)
+                except Full:
+                    self._spool(spot)
+
+    def onUpload(self, latency):
+        self.uploadCounter.inc()
+        rate = WsprnetReporter.latencyRate
+        self.latency = (1 - rate) * self.latency + rate * latency
 
     def getSupportedModes(self):
         return ["WSPR", "FST4W"]
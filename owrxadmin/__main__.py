@@ -1,5 +1,6 @@
 from owrx.version import openwebrx_version
 from owrxadmin.commands import NewUser, DeleteUser, ResetPassword, ListUsers, DisableUser, EnableUser, HasUser
+from owrxadmin.commands import ImportRadioId
 import argparse
 import sys
 import traceback
@@ -40,6 +41,10 @@ def main():
     hasuser_parser.add_argument("user", help="Username to be checked")
     hasuser_parser.set_defaults(cls=HasUser)
 
+    importradioid_parser = subparsers.add_parser("importradioid", help="Import the radioid DMR user database")
+    importradioid_parser.add_argument("file", help="User CSV file downloaded from radioid.net")
+    importradioid_parser.set_defaults(cls=ImportRadioId)
+
     parser.add_argument("-v", "--version", action="store_true", help="Show the software version")
     parser.add_argument(
         "--noninteractive", action="store_true", help="Don't ask for any user input (useful for automation)"
@@ -1,6 +1,7 @@
 from abc import ABC, ABCMeta, abstractmethod
 from getpass import getpass
 from owrx.users import UserList, User, DefaultPasswordClass
+from owrx.radioid import RadioIdDatabase
 import sys
 import random
 import string
@@ -113,3 +114,10 @@ class HasUser(Command):
                 print('User "{name}" does not exist.'.format(name=args.user))
             # in bash, a return code > 0 is interpreted as "false"
             sys.exit(1)
+
+
+class ImportRadioId(Command):
+    def run(self, args):
+        path = RadioIdDatabase.getPath()
+        count = RadioIdDatabase.importCsv(args.file, path)
+        print("Imported {count} DMR ids into {path}".format(count=count, path=path))
@@ -0,0 +1,97 @@
+"""
+Measures the APRS parser throughput with and without the parse cache. The corpus consists of typical packets of all
+the supported types, replayed like on a busy channel: stations beacon periodically, and most packets are heard
+through several digipeaters.
+
+Run with "python3 -m test.benchmarks.bench_aprs" from the repository root.
+"""
+
+from owrx.aprs import AprsParser, AprsParseCache
+from owrx.metrics import Metrics
+from unittest.mock import patch
+import random
+import time
+
+# source, destination, information. {n} is replaced to make the packets of every station unique.
+corpus = [
+    ("DL1ABC-9", "APRS", "!5230.00N/01320.00E>088/036/A=000123 mobile {n}"),
+    ("DB0XYZ", "APDW16", "!5307.12N/00852.33E#PHG5360 W2, digipeater {n}"),
+    ("DL2WX", "APRS", "@092345z4903.50N/07201.75W_220/004g005t077r000p000P000h50b09900wRSW{n}"),
+    ("DL3CMP", "APRS", "=/5L!!<*e7>7P[ compressed {n}"),
+    ("DL4MIC-7", "S32U6T", '`(_fn"Oj/]"4-}} {n}='),
+    ("DL4ST", "APRS", ">092345zNet Control Center {n}"),
+    ("DL5OB", "APRS", ";OBJ{n:<6}*092345z4903.50N/07201.75W>088/036"),
+    ("DL6IT", "APRS", ")AID{n}!4903.50N/07201.75WA"),
+    ("DL7MS", "APRS", "::DL1ABC   :Hello there {n}{{003"),
+    ("DB0IG", "APRS", "}}DL8TP>APRS,TCPIP,DB0IG*:!5230.00N/01320.00E-via igate {n}"),
+]
+paths = [["WIDE1-1", "WIDE2-1"], ["DB0ABC*", "WIDE2-1"], ["DB0ABC", "DB0DEF*"], ["DB0GHI*", "WIDE2*"]]
+stationCount = 300
+cycles = 10
+
+
+def encodeCallsign(callsign, last=False):
+    repeated = callsign.endswith("*")
+    callsign = callsign.rstrip("*")
+    ssid = int(callsign.split("-")[1]) if "-" in callsign else 0
+    call = callsign.split("-")[0]
+    return bytes([b << 1 for b in call.ljust(6).encode()]) + bytes(
+        [(0x80 if repeated else 0) | 0x60 | ssid << 1 | (1 if last else 0)]
+    )
+
+
+def encodeFrame(source, destination, path, information):
+    addresses = [destination, source] + path
+    return (
+        b"".join(encodeCallsign(c, i == len(addresses) - 1) for i, c in enumerate(addresses))
+        + bytes([0x03, 0xF0])
+        + information.encode()
+    )
+
+
+def generateTraffic():
+    random.seed(0)
+    stations = []
+    for i in range(stationCount):
+        source, destination, information = corpus[i % len(corpus)]
+        # keep the callsign length intact so that the packets stay valid
+        stations.append(("{}{}".format(source[:2], i % 10) + source[3:], destination, information, i))
+    frames = []
+    for cycle in range(cycles):
+        for source, destination, information, i in stations:
+            # every third station is on the move, so its packets change with every beacon
+            n = i + cycle * stationCount if i % 3 == 0 else i
+            # every beacon is heard through one to three digipeaters
+            for path in random.sample(paths, random.randint(1, 3)):
+                frames.append(encodeFrame(source, destination, path, information.format(n=n)))
+    return frames
+
+
+class Handler(object):
+    def write_aprs_data(self, data):
+        pass
+
+
+def measure(name, frames, cache):
+    parser = AprsParser(Handler())
+    parser.cache = cache
+    start = time.perf_counter()
+    parser.parse(frames)
+    duration = time.perf_counter() - start
+    print("{name}: {fps:.0f} frames/s".format(name=name, fps=len(frames) / duration))
+
+
+def main():
+    frames = generateTraffic()
+    metrics = Metrics.__new__(Metrics)
+    metrics.metrics = {}
+    with patch.object(Metrics, "getSharedInstance", return_value=metrics), patch("owrx.aprs.Map"):
+        print("{} frames".format(len(frames)))
+        measure("without cache", frames, AprsParseCache(maxSize=0))
+        cache = AprsParseCache()
+        measure("with cache", frames, cache)
+        print("hit rate: {:.1%}".format(cache.getHitRate()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Measures the throughput of reading a KISS stream from a socket, comparing single byte reads with the byte-wise deframer
+that was used before against bulk reads with the split-based deframer.
+
+Run with "python3 -m test.benchmarks.bench_kiss" from the repository root.
+"""
+
+from owrx.kiss import KissClient, KissDeframer, FEND, FESC, TFEND, TFESC
+import threading
+import socket
+import time
+
+frameCount = 20000
+
+
+def encodeCallsign(callsign, ssid=0, last=False):
+    return bytes([b << 1 for b in callsign.ljust(6).encode()]) + bytes([0x60 | ssid << 1 | (1 if last else 0)])
+
+
+def generateStream():
+    # a typical position report, as direwolf would send it
+    frames = []
+    for i in range(frameCount):
+        ax25 = (
+            encodeCallsign("APRS")
+            + encodeCallsign("DL{}AB".format(i % 10), i % 16)
+            + encodeCallsign("WIDE1", 1, last=True)
+            + bytes([0x03, 0xF0])
+            + "!5230.00N/01320.00E-PHG2360/test station {}".format(i).encode()
+        )
+        escaped = ax25.replace(bytes([FESC]), bytes([FESC, TFESC])).replace(bytes([FEND]), bytes([FESC, TFEND]))
+        frames.append(bytes([FEND, 0x00]) + escaped + bytes([FEND]))
+    return b"".join(frames)
+
+
+class LegacyKissDeframer(object):
+    def __init__(self):
+        self.escaped = False
+        self.buf = bytearray()
+
+    def parse(self, input):
+        frames = []
+        for b in input:
+            if b == FESC:
+                self.escaped = True
+            elif self.escaped:
+                if b == TFEND:
+                    self.buf.append(FEND)
+                elif b == TFESC:
+                    self.buf.append(FESC)
+                self.escaped = False
+            elif b == FEND:
+                if len(self.buf) > 1 and self.buf[0] == 0x00:
+                    frames += [self.buf[1:]]
+                self.buf = bytearray()
+            else:
+                self.buf.append(b)
+        return frames
+
+
+def legacyRead(sock):
+    deframer = LegacyKissDeframer()
+    frames = 0
+    while True:
+        data = sock.recv(1)
+        if not data:
+            return frames
+        frames += len(deframer.parse(data))
+
+
+def bulkRead(sock):
+    client = KissClient.__new__(KissClient)
+    client.socket = sock
+    client.deframer = KissDeframer()
+    frames = 0
+    while True:
+        batch = client.read()
+        if batch is None:
+            return frames
+        frames += len(batch)
+
+
+def measure(name, stream, reader):
+    reading, writing = socket.socketpair()
+
+    def write():
+        writing.sendall(stream)
+        writing.close()
+
+    threading.Thread(target=write).start()
+    start = time.perf_counter()
+    frames = reader(reading)
+    duration = time.perf_counter() - start
+    reading.close()
+    print(
+        "{name}: {frames} frames, {mb:.2f} MB/s, {fps:.0f} frames/s".format(
+            name=name, frames=frames, mb=len(stream) / duration / 1e6, fps=frames / duration
+        )
+    )
+
+
+def main():
+    stream = generateStream()
+    measure("single byte reads, byte-wise deframer", stream, legacyRead)
+    measure("bulk reads, split deframer", stream, bulkRead)
+
+
+if __name__ == "__main__":
+    main()
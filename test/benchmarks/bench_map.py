@@ -0,0 +1,108 @@
+"""
+Measures the memory per station and the time needed to expire the map positions of 50000 stations, compared to the
+full scan over a dict of dicts that was used before the expiry index, and the time needed to find the stations within
+a viewport. Also measures writing and restoring the on-disk snapshot of 100000 stations.
+
+Run with "python3 -m test.benchmarks.bench_map" from the repository root.
+"""
+
+from owrx.map import Map, Viewport, LocatorLocation
+from owrx.metrics import Metrics
+from unittest.mock import patch, MagicMock
+from tempfile import TemporaryDirectory
+from datetime import datetime, timedelta
+import tracemalloc
+import time
+
+stationCount = 50000
+storedCount = 100000
+# stations are updated once per decoding cycle, in batches
+batchSize = 100
+
+
+def generateUpdates(stationCount=stationCount):
+    # spread the stations all over the world
+    locators = [
+        chr(65 + i % 18) + chr(65 + i // 18 % 18) + str(i % 10) + str(i // 324 % 10) for i in range(stationCount)
+    ]
+    return [("DL{}ABC".format(i), LocatorLocation(locator), "FT8", None) for i, locator in enumerate(locators)]
+
+
+def measure(name, fn):
+    start = time.perf_counter()
+    result = fn()
+    print("{name}: {ms:.1f} ms".format(name=name, ms=(time.perf_counter() - start) * 1000))
+    return result
+
+
+def measureMemory(name, fn):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("{name}: {b:.0f} bytes per station".format(name=name, b=(after - before) / stationCount))
+    return result
+
+
+def dictOfDicts(updates):
+    ts = datetime.now()
+    # the locations are shared with the indexed variant, so only the records are counted
+    return {
+        callsign: {"location": loc, "updated": ts, "mode": mode, "band": band} for callsign, loc, mode, band in updates
+    }
+
+
+def main():
+    updates = generateUpdates()
+    metrics = Metrics.__new__(Metrics)
+    metrics.metrics = {}
+    coreConfig = MagicMock()
+    # there are no clients, so the updates are not held back for broadcasting
+    config = {"map_update_window": 0, "map_position_retention_time": 3600}
+    with TemporaryDirectory() as directory, patch.object(Metrics, "getSharedInstance", return_value=metrics), patch(
+        "owrx.map.Config.get", return_value=config
+    ), patch("owrx.map.CoreConfig", return_value=coreConfig), patch("owrx.map.threading.Thread"):
+        coreConfig.get_data_directory.return_value = directory
+        m = Map()
+
+        def indexed():
+            for i in range(0, len(updates), batchSize):
+                m.updateLocations(updates[i : i + batchSize])
+            m.store.write()
+            return m
+
+        legacy = measureMemory("dict of dicts", lambda: dictOfDicts(updates))
+        measureMemory("slotted records incl. expiry and spatial index", indexed)
+
+        viewport = Viewport(47, 5, 55, 15, 6)
+        count = len(measure("stations in a viewport, spatial index", lambda: m.index.query(viewport)))
+        print("({} stations in view)".format(count))
+        measure("aggregates in a world viewport", lambda: m.index.getAggregates(Viewport(-90, -180, 90, 180, 2)))
+
+        cutoff = time.time() + 1
+        legacyCutoff = datetime.now() + timedelta(seconds=1)
+        hour = timedelta(hours=1)
+        measure(
+            "full scan, nothing expired",
+            lambda: [c for c, p in legacy.items() if p["updated"] < legacyCutoff - hour],
+        )
+        measure("expiry index, nothing expired", lambda: m.pruneBefore(cutoff - 3600))
+        measure(
+            "full scan, all expired",
+            lambda: [legacy.pop(c) for c in [c for c, p in legacy.items() if p["updated"] < legacyCutoff]],
+        )
+        measure("expiry index, all expired", lambda: m.pruneBefore(cutoff))
+
+    with TemporaryDirectory() as directory, patch.object(Metrics, "getSharedInstance", return_value=metrics), patch(
+        "owrx.map.Config.get", return_value=config
+    ), patch("owrx.map.CoreConfig", return_value=coreConfig), patch("owrx.map.threading.Thread"):
+        coreConfig.get_data_directory.return_value = directory
+        stored = Map()
+        stored.updateLocations(generateUpdates(storedCount))
+        measure("writing {} stations to the log".format(storedCount), stored.store.write)
+        measure("restoring {} stations".format(storedCount), Map)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Measures the cost of collecting and encoding 10000 spots within one PskReporter upload window, compared to a linear
+duplicate scan as it was used before the spots were indexed.
+
+Run with "python3 -m test.benchmarks.bench_pskreporter" from the repository root.
+"""
+
+from owrx.pskreporter import PskReporter, Uploader
+from owrx.metrics import Metrics
+from unittest.mock import patch, MagicMock
+from tempfile import TemporaryDirectory
+import random
+import time
+
+spotCount = 10000
+# spots are handed over once per decoding cycle
+batchSize = 50
+keys = ["callsign", "timestamp", "locator", "mode", "msg"]
+
+
+def generateSpots():
+    random.seed(0)
+    now = int(time.time() * 1000)
+    spots = []
+    for i in range(spotCount):
+        # roughly every fifth spot is a duplicate of an earlier one
+        if spots and random.random() < 0.2:
+            spots.append(dict(random.choice(spots)))
+            continue
+        callsign = "DL{}ABC".format(i)
+        spots.append(
+            {
+                "callsign": callsign,
+                "timestamp": now - random.randrange(300) * 1000,
+                "locator": "JO62",
+                "mode": "FT8",
+                "msg": "CQ {} JO62".format(callsign),
+                "freq": 14074000 + random.randrange(3000),
+                "db": random.randrange(-24, 10),
+            }
+        )
+    return spots
+
+
+def linearScan(spots):
+    pending = []
+    for spot in spots:
+        if not any(all(spot[k] == x[k] for k in keys) for x in pending):
+            pending.append(spot)
+    return pending
+
+
+def measure(name, fn):
+    start = time.perf_counter()
+    fn()
+    print("{name}: {ms:.1f} ms".format(name=name, ms=(time.perf_counter() - start) * 1000))
+
+
+def main():
+    spots = generateSpots()
+    metrics = Metrics.__new__(Metrics)
+    metrics.metrics = {}
+    with TemporaryDirectory() as directory:
+        coreConfig = MagicMock()
+        coreConfig.get_data_directory.return_value = directory
+        with patch.object(Metrics, "getSharedInstance", return_value=metrics), patch(
+            "owrx.pskreporter.CoreConfig", return_value=coreConfig
+        ):
+            reporter = PskReporter()
+            reporter.scheduleNextUpload = lambda: None
+
+            def indexed():
+                for i in range(0, len(spots), batchSize):
+                    reporter.spotAll(spots[i : i + batchSize])
+
+            # the linear scan is quadratic; a quarter of the spots already takes a while
+            measure("linear duplicate scan, {} spots".format(spotCount // 4), lambda: linearScan(spots[: spotCount // 4]))
+            measure("indexed spots incl. spool, {} spots".format(spotCount), indexed)
+            uploader = Uploader.__new__(Uploader)
+            pending = list(reporter.spots.values())
+            measure("encoding {} spots".format(len(pending)), lambda: [uploader.encodeSpot(s) for s in pending])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+from unittest import TestCase, skipIf
+from unittest.mock import Mock
+
+try:
+    import numpy
+    from csdr.csdr import dsp
+except ImportError:
+    dsp = None
+
+
+@skipIf(dsp is None, "csdr dependencies are not available")
+class InProcessTailSelectionTest(TestCase):
+    def getDsp(self, demodulator, secondary=None, output_rate=12000):
+        d = dsp(Mock())
+        d.demodulator = demodulator
+        d.secondary_demodulator = secondary
+        d.output_rate = output_rate
+        d.inprocess_tail = True
+        return d
+
+    def testUsedForAudio(self):
+        self.assertTrue(self.getDsp("nfm").use_inprocess_tail())
+        self.assertTrue(self.getDsp("ssb").use_inprocess_tail())
+
+    def testUsedForHdAudio(self):
+        self.assertTrue(self.getDsp("wfm").use_inprocess_tail())
+
+    def testNotUsedForPacket(self):
+        self.assertFalse(self.getDsp("nfm", "packet").use_inprocess_tail())
+
+    def testNotUsedForWsjt(self):
+        self.assertFalse(self.getDsp("ssb", "ft8", output_rate=48000).use_inprocess_tail())
@@ -0,0 +1,46 @@
+from unittest import TestCase
+from csdr.decimation import DecimationPlanner
+
+
+class DecimationPlannerTest(TestCase):
+    def testNoDecimationRequired(self):
+        plan = DecimationPlanner().getPlan(48000, 48000, "nfm", 0.15)
+        self.assertEqual(plan.stages, [])
+        self.assertEqual(plan.getDecimation(), 1)
+        self.assertEqual(plan.getFraction(), 1.0)
+
+    def testStagesMatchTotalDecimation(self):
+        plan = DecimationPlanner().getPlan(10000000, 48000, "nfm", 0.15)
+        self.assertGreater(len(plan.stages), 1)
+        self.assertEqual(plan.getIfRate(), 10000000 / plan.getDecimation())
+        self.assertGreaterEqual(plan.getIfRate(), 48000)
+        rate = 10000000
+        for stage in plan.stages:
+            self.assertEqual(stage.input_rate, rate)
+            rate = stage.getOutputRate()
+
+    def testCascadeIsCheaper(self):
+        planner = DecimationPlanner()
+        plan = planner.getPlan(2400000, 12000, "usb", 0.15)
+        single = planner.getSingleStagePlan(2400000, 12000, "usb", 0.15)
+        self.assertLess(plan.getCost(), single.getCost())
+
+    def testWfmKeepsBandwidth(self):
+        plan = DecimationPlanner().getPlan(2400000, 48000, "wfm", 0.15)
+        self.assertGreaterEqual(plan.getIfRate(), 200000)
+
+    def testPlanIsCached(self):
+        planner = DecimationPlanner()
+        self.assertIs(planner.getPlan(2400000, 12000, "usb", 0.15), planner.getPlan(2400000, 12000, "usb", 0.15))
+        self.assertEqual(len(planner.getPlans()), 1)
+
+    def testInvalidOutputRate(self):
+        with self.assertRaises(ValueError):
+            DecimationPlanner().getPlan(2400000, 0, "nfm", 0.15)
+
+    def testUsesTransitionBandwidth(self):
+        planner = DecimationPlanner()
+        narrow = planner.getSingleStagePlan(2400000, 48000, "nfm", 0.05)
+        wide = planner.getSingleStagePlan(2400000, 48000, "nfm", 0.15)
+        self.assertGreater(narrow.stages[0].getTaps(), wide.stages[0].getTaps())
+        self.assertIsNot(planner.getPlan(2400000, 48000, "nfm", 0.05), planner.getPlan(2400000, 48000, "nfm", 0.15))
@@ -0,0 +1,50 @@
+from unittest import TestCase, skipIf
+
+try:
+    import numpy as np
+    from csdr.inprocess import InProcessTail
+except ImportError:
+    np = None
+
+
+@skipIf(np is None, "numpy is not available")
+class InProcessTailTest(TestCase):
+    def _run(self, demodulator, samples, if_rate=14400, audio_rate=12000):
+        tail = InProcessTail(demodulator, if_rate, audio_rate)
+        data = samples.astype(np.complex64).tobytes()
+        output = b"".join(tail.process(data[i : i + 576]) for i in range(0, len(data), 576))
+        return np.frombuffer(output, dtype=np.int16)
+
+    def _peakFrequency(self, audio, audio_rate=12000):
+        spectrum = np.abs(np.fft.rfft(audio[-audio_rate:].astype(np.float64)))
+        return (np.argmax(spectrum[1:]) + 1) * audio_rate / len(audio[-audio_rate:])
+
+    def testOutputRate(self):
+        t = np.arange(14400 * 2) / 14400
+        audio = self._run("ssb", np.exp(2j * np.pi * 1000 * t) * 0.1)
+        self.assertAlmostEqual(len(audio), 24000, delta=2)
+
+    def testSsbTone(self):
+        t = np.arange(14400 * 2) / 14400
+        audio = self._run("ssb", np.exp(2j * np.pi * 1000 * t) * 0.1)
+        self.assertAlmostEqual(self._peakFrequency(audio), 1000, delta=2)
+
+    def testFmTone(self):
+        t = np.arange(14400 * 2) / 14400
+        audio = self._run("nfm", np.exp(2j * np.pi * 300 * t + 4j * np.pi * np.sin(2 * np.pi * 1000 * t)))
+        self.assertAlmostEqual(self._peakFrequency(audio), 1000, delta=2)
+
+    def testAmTone(self):
+        t = np.arange(14400 * 2) / 14400
+        audio = self._run("am", (1 + 0.5 * np.sin(2 * np.pi * 800 * t)) * np.exp(2j * np.pi * 300 * t))
+        self.assertAlmostEqual(self._peakFrequency(audio), 800, delta=2)
+
+    def testAgcDoesNotClip(self):
+        t = np.arange(14400 * 2) / 14400
+        audio = self._run("am", (1 + 0.5 * np.sin(2 * np.pi * 800 * t)) * np.exp(2j * np.pi * 300 * t))
+        self.assertLess(np.max(np.abs(audio[-12000:])), 32767)
+
+    def testUnsupportedDemodulator(self):
+        self.assertFalse(InProcessTail.supports("dmr"))
+        with self.assertRaises(ValueError):
+            InProcessTail("dmr", 48000, 48000)
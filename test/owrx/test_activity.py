@@ -0,0 +1,25 @@
+from unittest import TestCase, skipIf
+from unittest.mock import Mock, patch
+from owrx.property import PropertyLayer
+
+try:
+    from owrx.service.activity import BandActivityDetector
+except ImportError:
+    BandActivityDetector = None
+
+
+@skipIf(BandActivityDetector is None, "service dependencies are not available")
+class BandActivityDetectorTest(TestCase):
+    def testStopCancelsSubscriptions(self):
+        config = PropertyLayer(services_activity_threshold=10, services_activity_timeout=30, fft_compression="none")
+        sdrProps = PropertyLayer(center_freq=14100000, samp_rate=2400000)
+        source = Mock()
+        source.getProps.return_value = sdrProps
+        with patch("owrx.service.activity.Config.get", return_value=config):
+            detector = BandActivityDetector(source, Mock())
+            detector.start()
+            self.assertEqual(detector.props["samp_rate"], 2400000)
+            detector.stop()
+        self.assertEqual(config.getSubscriberCount(), 0)
+        self.assertEqual(sdrProps.getSubscriberCount(), 0)
+        source.removeSpectrumClient.assert_called_once_with(detector)
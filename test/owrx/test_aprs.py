@@ -0,0 +1,87 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from owrx.aprs import AprsParser, AprsParseCache
+from owrx.metrics import Metrics
+
+
+def encodeCallsign(callsign, last=False):
+    call, _, ssid = callsign.partition("-")
+    return bytes([b << 1 for b in call.ljust(6).encode()]) + bytes([0x60 | int(ssid or 0) << 1 | (1 if last else 0)])
+
+
+def encodeFrame(source, destination, path, information):
+    addresses = [destination, source] + path
+    return (
+        b"".join(encodeCallsign(c, i == len(addresses) - 1) for i, c in enumerate(addresses))
+        + bytes([0x03, 0xF0])
+        + information
+    )
+
+
+class AprsParseCacheTest(TestCase):
+    def setUp(self):
+        # the shared metrics instance needs a full configuration, which is not available here
+        metrics = Metrics.__new__(Metrics)
+        metrics.metrics = {}
+        for patcher in [patch.object(Metrics, "getSharedInstance", return_value=metrics), patch("owrx.aprs.Map")]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.handler = MagicMock()
+        self.parser = AprsParser(self.handler)
+        self.cache = self.parser.cache = AprsParseCache()
+
+    def getParsed(self):
+        return [c[0][0] for c in self.handler.write_aprs_data.call_args_list]
+
+    def testDigipeatedCopiesAreCached(self):
+        information = b"!5230.00N/01320.00E>088/036 mobile"
+        self.parser.parse(
+            [
+                encodeFrame("DL1ABC-9", "APRS", ["WIDE1-1"], information),
+                encodeFrame("DL1ABC-9", "APRS", ["DB0ABC", "WIDE2-1"], information),
+            ]
+        )
+        first, second = self.getParsed()
+        self.assertEqual(first["path"], ["WIDE1-1"])
+        self.assertEqual(second["path"], ["DB0ABC", "WIDE2-1"])
+        del first["path"], second["path"]
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.getHitRate(), 0.5)
+
+    def testCachedDataIsCopied(self):
+        frame = encodeFrame("DL1ABC-9", "APRS", [], b"!5230.00N/01320.00E>088/036 mobile")
+        self.parser.parse([frame, frame])
+        first, second = self.getParsed()
+        first["symbol"]["symbol"] = "x"
+        self.parser.parse([frame])
+        self.assertNotEqual(self.getParsed()[2]["symbol"]["symbol"], "x")
+        self.assertIsNot(first["symbol"], second["symbol"])
+
+    def testMicEIsKeyedOnDestination(self):
+        information = b'`(_fn"Oj/]"4-}='
+        self.parser.parse(
+            [
+                encodeFrame("DL4MIC-7", "S32U6T", [], information),
+                encodeFrame("DL4MIC-7", "S32U6U", [], information),
+            ]
+        )
+        first, second = self.getParsed()
+        self.assertNotEqual(first["lat"], second["lat"])
+        self.assertEqual(self.cache.hits.getValue()["count"], 0)
+
+    def testExpiredEntriesAreNotReturned(self):
+        cache = AprsParseCache(ttl=10)
+        with patch("owrx.aprs.time.monotonic", return_value=100):
+            cache.put(b"key", {"type": "status"})
+            self.assertEqual(cache.get(b"key"), {"type": "status"})
+        with patch("owrx.aprs.time.monotonic", return_value=111):
+            self.assertIsNone(cache.get(b"key"))
+
+    def testLeastRecentlyUsedEntryIsDropped(self):
+        cache = AprsParseCache(maxSize=2)
+        cache.put(b"a", {"n": 1})
+        cache.put(b"b", {"n": 2})
+        cache.get(b"a")
+        cache.put(b"c", {"n": 3})
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(cache.get(b"a"), {"n": 1})
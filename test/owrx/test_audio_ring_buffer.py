@@ -0,0 +1,35 @@
+from unittest import TestCase
+from owrx.audio import AudioRingBuffer
+import struct
+
+
+def samples(*values):
+    return struct.pack("<{}h".format(len(values)), *values)
+
+
+class AudioRingBufferTest(TestCase):
+    def testRange(self):
+        buffer = AudioRingBuffer(10)
+        buffer.write(samples(1, 2, 3, 4))
+        self.assertEqual(buffer.getTotal(), 4)
+        self.assertEqual(buffer.getRange(1, 3), samples(2, 3))
+
+    def testWrapAround(self):
+        buffer = AudioRingBuffer(4)
+        buffer.write(samples(1, 2, 3))
+        buffer.write(samples(4, 5, 6))
+        self.assertEqual(buffer.getTotal(), 6)
+        self.assertEqual(buffer.getRange(2, 6), samples(3, 4, 5, 6))
+
+    def testOversizedWrite(self):
+        buffer = AudioRingBuffer(3)
+        buffer.write(samples(1, 2, 3, 4, 5))
+        self.assertEqual(buffer.getTotal(), 5)
+        self.assertEqual(buffer.getRange(2, 5), samples(3, 4, 5))
+
+    def testMissingSamplesAreSilent(self):
+        buffer = AudioRingBuffer(4)
+        buffer.write(samples(1, 2, 3, 4, 5, 6))
+        # samples 0 and 1 have been overwritten, and sample 6 has not been written yet
+        self.assertEqual(buffer.getRange(0, 7), samples(0, 0, 3, 4, 5, 6, 0))
+        self.assertEqual(buffer.getRange(-2, 0), samples(0, 0))
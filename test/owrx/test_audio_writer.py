@@ -0,0 +1,103 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+from owrx.audio import AudioChopper, AudioRingBuffer, AudioStorage, AudioWriter, DecoderQueue
+from owrx.audio import DirectoryAudioStorage, StreamingAudioWriter
+from owrx.metrics import Metrics
+import tempfile
+import shutil
+import struct
+import wave
+
+
+class FakeProfile(object):
+    def getInterval(self):
+        return 2
+
+    def getFileTimestampFormat(self):
+        return "%y%m%d_%H%M%S"
+
+    def getMode(self):
+        return "TEST"
+
+    def decoding_depth(self, reduction=0):
+        return None
+
+
+class FakeQueue(object):
+    def __init__(self):
+        self.jobs = []
+
+    def getDepthReduction(self):
+        return 0
+
+    def put(self, job):
+        self.jobs.append(job)
+
+
+class AudioWriterTest(TestCase):
+    # an hour boundary, so that the intervals start at the beginning of the stream
+    anchor = 1700002800
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        # the shared metrics instance needs a full configuration, which is not available here
+        metrics = Metrics.__new__(Metrics)
+        metrics.metrics = {}
+        coreConfig = MagicMock()
+        coreConfig.get_temporary_directory.return_value = self.dir
+        self.queue = FakeQueue()
+        for patcher in [
+            patch.object(Metrics, "getSharedInstance", return_value=metrics),
+            patch("owrx.audio.CoreConfig", return_value=coreConfig),
+            patch.object(DecoderQueue, "getSharedInstance", return_value=self.queue),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        storage = DirectoryAudioStorage(self.dir, False)
+        patcher = patch.object(AudioStorage, "getSharedInstance", return_value=storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, writerClass, bufferSize, anchor, samples):
+        writer = writerClass(MagicMock(), None, FakeProfile(), None)
+        buffer = AudioRingBuffer(bufferSize)
+        writer.schedule(anchor, anchor)
+        for start in range(0, len(samples), AudioChopper.readSize // 2):
+            chunk = samples[start : start + AudioChopper.readSize // 2]
+            buffer.write(struct.pack("<{}h".format(len(chunk)), *chunk))
+            writer.process(buffer, anchor)
+        writer.close()
+        files = []
+        for job in self.queue.jobs:
+            with wave.open(job.file, "rb") as f:
+                files.append(f.readframes(f.getnframes()))
+        self.queue.jobs = []
+        return files
+
+    def testStreamingMatchesBuffered(self):
+        samples = [i % 30000 for i in range(5 * AudioChopper.sampleRate)]
+        interval = 2 * AudioChopper.sampleRate
+        buffered = self.record(AudioWriter, interval + AudioChopper.sampleRate, self.anchor, samples)
+        streamed = self.record(StreamingAudioWriter, AudioChopper.readSize, self.anchor, samples)
+        self.assertEqual(len(buffered), 2)
+        self.assertEqual(streamed, buffered)
+
+    def testLateStartIsPadded(self):
+        samples = [1] * (3 * AudioChopper.sampleRate)
+        # the stream starts half a second into the first interval
+        anchor = self.anchor + 0.5
+        buffered = self.record(AudioWriter, 3 * AudioChopper.sampleRate, anchor, samples)
+        streamed = self.record(StreamingAudioWriter, AudioChopper.readSize, anchor, samples)
+        self.assertEqual(streamed, buffered)
+        padding = AudioChopper.sampleRate // 2 * AudioRingBuffer.sampleSize
+        self.assertEqual(streamed[0][:padding], bytes(padding))
+        self.assertEqual(len(streamed[0]), 2 * AudioChopper.sampleRate * AudioRingBuffer.sampleSize)
+
+    def testPendingCutSurvivesNewAnchor(self):
+        writer = AudioWriter(MagicMock(), None, FakeProfile(), None)
+        writer.schedule(self.anchor, self.anchor + 1)
+        self.assertEqual(writer.cutTime, self.anchor + 2)
+        # the stream lags behind, so the end of the interval is still pending when the anchor is reset
+        writer.schedule(self.anchor + 0.3, self.anchor + 2.1)
+        self.assertEqual(writer.cutTime, self.anchor + 2)
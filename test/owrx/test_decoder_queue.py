@@ -0,0 +1,153 @@
+from unittest import TestCase
+from unittest.mock import patch
+from owrx.audio import DecoderQueue, DecodingModeMetrics, QueueJob
+from owrx.metrics import Metrics
+from queue import Full
+import time
+
+
+class FakeProfile(object):
+    def __init__(self, mode):
+        self.mode = mode
+
+    def getMode(self):
+        return self.mode
+
+    def getMaxThreads(self):
+        return 4
+
+
+class FakeDecoder(object):
+    def __init__(self, mode, decoded):
+        self.profile = FakeProfile(mode)
+        self.decoded = decoded
+
+    def decode(self, job):
+        self.decoded.append(job.file)
+
+
+class FakeJob(QueueJob):
+    def __init__(self, decoder, file, deadline):
+        super().__init__(decoder, file, 0, deadline)
+        self.unlinked = False
+
+    def unlink(self):
+        self.unlinked = True
+
+
+class DecoderQueueTest(TestCase):
+    def setUp(self):
+        self.queue = None
+        # the shared metrics instance needs a full configuration, which is not available here
+        metrics = Metrics.__new__(Metrics)
+        metrics.metrics = {}
+        patcher = patch.object(Metrics, "getSharedInstance", return_value=metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        if self.queue is not None:
+            self.queue.stop()
+
+    def testJobsAreOrderedByDeadline(self):
+        self.queue = DecoderQueue(maxsize=10, workers=0)
+        decoded = []
+        now = time.monotonic()
+        self.queue.put(FakeJob(FakeDecoder("WSPR", decoded), "wspr", now + 120))
+        self.queue.put(FakeJob(FakeDecoder("FT4", decoded), "ft4", now + 7.5))
+        self.queue.put(FakeJob(FakeDecoder("FT8", decoded), "ft8", now + 15))
+        self.assertEqual([self.queue.get().file for _ in range(3)], ["ft4", "ft8", "wspr"])
+        for _ in range(3):
+            self.queue.task_done()
+
+    def testExpiredJobsAreSkipped(self):
+        self.queue = DecoderQueue(maxsize=10, workers=0)
+        decoded = []
+        expired = FakeJob(FakeDecoder("FT8", decoded), "expired", time.monotonic() - 1)
+        valid = FakeJob(FakeDecoder("FT8", decoded), "valid", time.monotonic() + 15)
+        self.queue.put(expired)
+        self.queue.put(valid)
+        self.queue.workers = [self.queue.newWorker()]
+        self.queue.join()
+        self.assertEqual(decoded, ["valid"])
+        self.assertTrue(expired.unlinked)
+        self.assertEqual(self.queue.missedCounter.getValue()["count"], 1)
+
+    def testOverflow(self):
+        self.queue = DecoderQueue(maxsize=1, workers=0)
+        decoded = []
+        self.queue.put(FakeJob(FakeDecoder("FT8", decoded), "first", time.monotonic() + 15))
+        with self.assertRaises(Full):
+            self.queue.put(FakeJob(FakeDecoder("FT8", decoded), "second", time.monotonic() + 15))
+        self.assertEqual(self.queue.overflowCounter.getValue()["count"], 1)
+
+    def testStopWithMoreWorkersThanQueueLength(self):
+        queue = DecoderQueue(maxsize=1, workers=4)
+        queue.stop()
+        for worker in queue.workers:
+            worker.join(timeout=10)
+            self.assertFalse(worker.is_alive())
+
+    def testDepthReductionHysteresis(self):
+        self.queue = DecoderQueue(maxsize=10, workers=0)
+        self.queue.lastDepthChange = -DecoderQueue.depthHoldTime
+        self.queue._adjustDepth(True, False)
+        self.assertEqual(self.queue.getDepthReduction(), 1)
+        # changes within the hold time are ignored
+        self.queue._adjustDepth(True, False)
+        self.queue._adjustDepth(False, True)
+        self.assertEqual(self.queue.getDepthReduction(), 1)
+        self.queue.lastDepthChange -= DecoderQueue.depthHoldTime
+        self.queue._adjustDepth(False, True)
+        self.assertEqual(self.queue.getDepthReduction(), 0)
+
+    def testDepthMetricFollowsReduction(self):
+        self.addCleanup(DecodingModeMetrics.setDepthReduction, 0)
+        self.queue = DecoderQueue(maxsize=10, workers=0)
+        modeMetrics = DecodingModeMetrics("FT8")
+        self.assertEqual(modeMetrics.getDepth(), 0)
+        modeMetrics.setDepthFunction(lambda reduction: max(1, 3 - reduction))
+        self.assertEqual(modeMetrics.getDepth(), 3)
+        self.queue.lastDepthChange = -DecoderQueue.depthHoldTime
+        self.queue._adjustDepth(True, False)
+        self.assertEqual(modeMetrics.getDepth(), 2)
+
+    def testWorkersAreAddedForWaitingJobs(self):
+        self.queue = DecoderQueue(maxsize=10, workers=0, maxWorkers=2)
+        self.queue.cpuLoad.getIdleCores = lambda: 4
+        decoded = []
+        for i in range(3):
+            self.queue.put(FakeJob(FakeDecoder("FT8", decoded), str(i), time.monotonic() + 15))
+        self.queue.join()
+        self.assertEqual(sorted(decoded), ["0", "1", "2"])
+        self.assertEqual(self.queue.getWorkerCount(), 2)
+
+    def testNoWorkersAreAddedWithoutIdleCpu(self):
+        self.queue = DecoderQueue(maxsize=10, workers=1, maxWorkers=4)
+        self.queue.cpuLoad.getIdleCores = lambda: 0.5
+        decoded = []
+        for i in range(3):
+            self.queue.put(FakeJob(FakeDecoder("FT8", decoded), str(i), time.monotonic() + 15))
+        self.queue.join()
+        self.assertEqual(self.queue.getWorkerCount(), 1)
+
+    def testIdleWorkersAreRetiredAfterBursts(self):
+        self.queue = DecoderQueue(maxsize=10, workers=0, maxWorkers=4)
+        self.queue.minWorkers = 1
+        worker = object()
+        self.queue.workers = [worker, object(), object()]
+        self.queue.bursts = [(time.monotonic(), 2)]
+        self.assertTrue(self.queue.retireWorker(worker))
+        # the remaining workers are needed to handle a burst of two jobs
+        self.assertFalse(self.queue.retireWorker(self.queue.workers[0]))
+        self.queue.bursts = []
+        self.assertTrue(self.queue.retireWorker(self.queue.workers[0]))
+        self.queue.workers = []
+
+    def testIdleCoresAreUsedForThreads(self):
+        self.queue = DecoderQueue(maxsize=10, workers=0)
+        self.queue.cpuLoad.getIdleCores = lambda: 3.5
+        job = FakeJob(FakeDecoder("FT8", []), "ft8", time.monotonic() + 15)
+        self.queue.onJobStarted(job)
+        self.assertEqual(job.threads, 3)
+        self.queue.onJobFinished()
@@ -0,0 +1,39 @@
+from unittest import TestCase
+from owrx.kiss import KissDeframer, FEND, FESC, TFEND, TFESC
+
+
+def kissFrame(payload, command=0x00):
+    escaped = payload.replace(bytes([FESC]), bytes([FESC, TFESC])).replace(bytes([FEND]), bytes([FESC, TFEND]))
+    return bytes([FEND, command]) + escaped + bytes([FEND])
+
+
+class KissDeframerTest(TestCase):
+    def testFramesInOneChunk(self):
+        deframer = KissDeframer()
+        self.assertEqual(deframer.parse(kissFrame(b"first") + kissFrame(b"second")), [b"first", b"second"])
+
+    def testFrameAcrossChunks(self):
+        deframer = KissDeframer()
+        data = kissFrame(b"first") + kissFrame(b"second")
+        self.assertEqual(deframer.parse(data[:4]), [])
+        self.assertEqual(deframer.parse(data[4:10]), [b"first"])
+        self.assertEqual(deframer.parse(data[10:]), [b"second"])
+
+    def testFendInTheMiddleOfAChunk(self):
+        deframer = KissDeframer()
+        self.assertEqual(deframer.parse(b"garbage" + kissFrame(b"frame") + b"\x00part"), [b"frame"])
+        self.assertEqual(deframer.parse(b"ial" + bytes([FEND])), [b"partial"])
+
+    def testEscapes(self):
+        deframer = KissDeframer()
+        payload = bytes([0x01, FEND, FESC, TFEND, FESC, TFESC, 0x02])
+        self.assertEqual(deframer.parse(kissFrame(payload)), [payload])
+
+    def testNonDataFramesAreIgnored(self):
+        deframer = KissDeframer()
+        self.assertEqual(deframer.parse(kissFrame(b"\x05", command=0x06) + kissFrame(b"data")), [b"data"])
+
+    def testInvalidEscapeDropsFrame(self):
+        deframer = KissDeframer()
+        data = bytes([FEND, 0x00, 0x01, FESC, 0x02, FEND])
+        self.assertEqual(deframer.parse(data + kissFrame(b"data")), [b"data"])
@@ -0,0 +1,187 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from owrx.map import Map, MapStore, Viewport, LocatorLocation, LatLngLocation
+from owrx.bands import Bandplan
+from owrx.metrics import Metrics
+import tempfile
+import shutil
+import json
+import time
+
+
+class MapTest(TestCase):
+    def setUp(self):
+        # the shared metrics instance needs a full configuration, which is not available here
+        metrics = Metrics.__new__(Metrics)
+        metrics.metrics = {}
+        self.config = {"map_update_window": 0, "map_position_retention_time": 3600}
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        coreConfig = MagicMock()
+        coreConfig.get_data_directory.return_value = self.dir
+        for patcher in [
+            patch.object(Metrics, "getSharedInstance", return_value=metrics),
+            patch("owrx.map.Config.get", return_value=self.config),
+            patch("owrx.map.CoreConfig", return_value=coreConfig),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.map = self.getMap()
+        self.client = MagicMock()
+        self.map.addClient(self.client)
+        self.map.setViewport(self.client, Viewport(-90, -180, 90, 180, 10))
+
+    def getMap(self):
+        # the background threads are not needed here
+        with patch("owrx.map.threading.Thread"):
+            return Map()
+
+    def testPruneRemovesExpiredPositions(self):
+        self.map.updateLocations([("DL1ABC", LocatorLocation("JO62"), "FT8", None)])
+        cutoff = time.time() + 1
+        self.map.updateLocations([("DL2XYZ", LocatorLocation("JO31"), "FT8", None)])
+        self.map.positions["DL2XYZ"].updated = cutoff + 1
+        self.map._track("DL2XYZ", cutoff + 1)
+        self.assertEqual(self.map.pruneBefore(cutoff), ["DL1ABC"])
+        self.assertEqual(list(self.map.positions.keys()), ["DL2XYZ"])
+
+    def testUpdatedPositionIsKept(self):
+        self.map.updateLocation("DL1ABC", LocatorLocation("JO62"), "FT8")
+        cutoff = time.time() + 1
+        self.map.positions["DL1ABC"].updated = cutoff + 1
+        self.map._track("DL1ABC", cutoff + 1)
+        self.assertEqual(self.map.pruneBefore(cutoff), [])
+        self.assertIn("DL1ABC", self.map.positions)
+
+    def testRemovalsAreBroadcastInOneMessage(self):
+        self.map.updateLocations([("DL{}ABC".format(i), LocatorLocation("JO62"), "FT8", None) for i in range(3)])
+        self.map.pruneBefore(time.time() + 1)
+        self.client.write_removal.assert_called_once_with(["DL0ABC", "DL1ABC", "DL2ABC"])
+        self.map.removeLocation("DL0ABC")
+        self.client.write_removal.assert_called_once()
+
+    def testStaleExpiryEntriesAreCompacted(self):
+        for _ in range(2000):
+            self.map.updateLocation("DL1ABC", LocatorLocation("JO62"), "FT8")
+        self.assertLess(len(self.map.expiry), 1010)
+
+    def testUpdatesAreFilteredByViewport(self):
+        self.map.setViewport(self.client, Viewport(50, 10, 54, 16, 8))
+        self.map.updateLocations(
+            [
+                ("DL1ABC", LocatorLocation("JO62"), "FT8", None),
+                ("K1ABC", LocatorLocation("FN42"), "FT8", None),
+                ("DL2XYZ", LatLngLocation(52.5, 13.4), "APRS", None),
+            ]
+        )
+        update = json.loads(self.client.write_serialized_update.call_args[0][0])
+        self.assertEqual([u["callsign"] for u in update], ["DL1ABC", "DL2XYZ"])
+
+    def testInvalidPositionsAreNotSerialized(self):
+        class BrokenLocation(LatLngLocation):
+            def __dict__(self):
+                return {**super().__dict__(), "course": float("nan")}
+
+        self.map.updateLocations(
+            [
+                ("DL1ABC", LocatorLocation("JO62"), "FT8", None),
+                ("DL2XYZ", BrokenLocation(52.5, 13.4), "APRS", None),
+            ]
+        )
+        update = json.loads(self.client.write_serialized_update.call_args[0][0])
+        self.assertEqual([u["callsign"] for u in update], ["DL1ABC"])
+        self.map.store.write()
+        with open(self.map.store.path, "r") as f:
+            self.assertEqual([json.loads(line)[0] for line in f], ["DL1ABC"])
+
+    def testViewportAcrossTheAntimeridian(self):
+        self.map.updateLocations([("ZL1ABC", LocatorLocation("RF72"), "FT8", None)])
+        self.map.setViewport(self.client, Viewport(-60, 170, -20, -170, 8))
+        snapshot = self.client.write_snapshot.call_args[0][0]
+        self.assertEqual([u["callsign"] for u in snapshot], ["ZL1ABC"])
+
+    def testSnapshotIsChunked(self):
+        self.map.updateLocations(
+            [("DL{}ABC".format(i), LocatorLocation("JO62"), "FT8", None) for i in range(Map.snapshotChunkSize + 1)]
+        )
+        self.client.reset_mock()
+        self.map.setViewport(self.client, Viewport(50, 10, 54, 16, 8))
+        self.assertEqual([len(c[0][0]) for c in self.client.write_snapshot.call_args_list], [Map.snapshotChunkSize, 1])
+
+    def testAggregatesAtLowZoom(self):
+        self.map.updateLocations(
+            [
+                ("DL1ABC", LocatorLocation("JO62"), "FT8", None),
+                ("DL2XYZ", LocatorLocation("JO31"), "FT4", None),
+                ("K1ABC", LocatorLocation("FN42"), "FT8", None),
+            ]
+        )
+        self.map.setViewport(self.client, Viewport(30, -10, 70, 30, 2))
+        aggregates = self.client.write_aggregates.call_args[0][0]
+        self.assertEqual(aggregates, [{"field": "JO", "count": 2, "modes": {"FT8": 1, "FT4": 1}, "bands": {"": 2}}])
+
+        self.client.reset_mock()
+        self.map.removeLocation("DL1ABC")
+        self.client.write_aggregates.assert_called_once_with(
+            [{"field": "JO", "count": 1, "modes": {"FT4": 1}, "bands": {"": 1}}]
+        )
+        self.client.write_serialized_update.assert_not_called()
+
+    def testUpdatesAreCoalesced(self):
+        self.config["map_update_window"] = 500
+        with patch("owrx.map.threading.Timer") as timer:
+            self.map.updateLocation("DL1ABC", LocatorLocation("JO62"), "FT8")
+            self.map.updateLocation("DL2XYZ", LocatorLocation("JO31"), "FT8")
+            self.map.updateLocation("DL1ABC", LocatorLocation("JO63"), "FT4")
+            self.map.updateLocation("DL3DEF", LocatorLocation("JO40"), "FT8")
+            self.map.removeLocation("DL3DEF")
+        timer.assert_called_once_with(0.5, self.map.flush)
+        self.client.write_serialized_update.assert_not_called()
+        self.map.flush()
+        update = json.loads(self.client.write_serialized_update.call_args[0][0])
+        self.assertEqual(
+            [(u["callsign"], u["location"]["locator"]) for u in update], [("DL2XYZ", "JO31"), ("DL1ABC", "JO63")]
+        )
+        self.client.write_removal.assert_called_once_with(["DL3DEF"])
+        self.assertEqual(self.map.messagesSaved.getValue()["count"], 4)
+        self.assertEqual(self.map.updatesSuperseded.getValue()["count"], 2)
+
+    def testPositionsAreRestored(self):
+        band = Bandplan.getSharedInstance().findBandByName("20m")
+        self.map.updateLocations(
+            [
+                ("DL1ABC", LocatorLocation("JO62"), "FT8", band),
+                ("DL2XYZ", LatLngLocation(52.5, 13.4), "APRS", None),
+                ("DL3DEF", LocatorLocation("JO40"), "FT8", None),
+            ]
+        )
+        self.map.removeLocation("DL3DEF")
+        self.map.store.write()
+
+        restored = self.getMap()
+        self.assertEqual(restored.positions.keys(), {"DL1ABC", "DL2XYZ"})
+        self.assertEqual(restored.positions["DL1ABC"].toJson("DL1ABC"), self.map.positions["DL1ABC"].toJson("DL1ABC"))
+        self.assertEqual(restored.positions["DL2XYZ"].square, "JO62")
+        self.assertEqual(sorted(restored.index.query(Viewport(50, 10, 54, 16, 8))), ["DL1ABC", "DL2XYZ"])
+
+    def testExpiredPositionsAreNotRestored(self):
+        self.map.updateLocation("DL1ABC", LocatorLocation("JO62"), "FT8")
+        self.map.store.write()
+        self.config["map_position_retention_time"] = -1
+        self.assertEqual(self.getMap().positions, {})
+
+    def testIncompleteLogIsRestored(self):
+        self.map.updateLocation("DL1ABC", LocatorLocation("JO62"), "FT8")
+        self.map.store.write()
+        with open(self.map.store.path, "a") as f:
+            f.write('["DL2XYZ", 12')
+        self.assertEqual(self.getMap().positions.keys(), {"DL1ABC"})
+
+    def testLogIsCompacted(self):
+        with patch.object(MapStore, "compactionThreshold", 10):
+            for _ in range(20):
+                self.map.updateLocation("DL1ABC", LocatorLocation("JO62"), "FT8")
+            self.map.store.write()
+        with open(self.map.store.path, "r") as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(self.getMap().positions.keys(), {"DL1ABC"})
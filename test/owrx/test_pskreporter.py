@@ -0,0 +1,126 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from owrx.pskreporter import PskReporter, Uploader
+from owrx.reporting import SpotSpool
+from owrx.metrics import Metrics
+import tempfile
+import shutil
+import time
+import os
+
+
+def makeSpot(callsign="DL1ABC", timestamp=None, msg="CQ DL1ABC JO62"):
+    return {
+        "callsign": callsign,
+        "timestamp": int(time.time() * 1000) if timestamp is None else timestamp,
+        "locator": "JO62",
+        "mode": "FT8",
+        "msg": msg,
+        "freq": 14074512,
+        "db": -12.0,
+    }
+
+
+class PskReporterTest(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        # the shared metrics instance needs a full configuration, which is not available here
+        metrics = Metrics.__new__(Metrics)
+        metrics.metrics = {}
+        coreConfig = MagicMock()
+        coreConfig.get_data_directory.return_value = self.dir
+        for patcher in [
+            patch.object(Metrics, "getSharedInstance", return_value=metrics),
+            patch("owrx.pskreporter.CoreConfig", return_value=coreConfig),
+            # no real uploads or timers; they would outlive the test directory
+            patch("owrx.pskreporter.Uploader"),
+            patch.object(PskReporter, "scheduleNextUpload"),
+            patch.object(PskReporter, "scheduleSpoolFlush"),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def getReporter(self):
+        return PskReporter()
+
+    def testDuplicatesAreDropped(self):
+        reporter = self.getReporter()
+        spot = makeSpot()
+        reporter.spotAll([spot, dict(spot), makeSpot(callsign="DL2XYZ")])
+        reporter.spot(dict(spot))
+        self.assertEqual(len(reporter.spots), 2)
+        self.assertEqual(reporter.dupeCounter.getValue()["count"], 2)
+
+    def testPendingSpotsSurviveRestart(self):
+        reporter = self.getReporter()
+        reporter.spotAll([makeSpot(), makeSpot(callsign="DL2XYZ")])
+        reporter.stop()
+        recovered = self.getReporter()
+        self.assertEqual(recovered.spots.keys(), reporter.spots.keys())
+
+    def testSpoolIsWrittenPeriodically(self):
+        reporter = self.getReporter()
+        reporter.spotAll([makeSpot()])
+        reporter.spotAll([makeSpot(callsign="DL2XYZ")])
+        reporter.scheduleSpoolFlush.assert_called()
+        self.assertEqual(self.getReporter().spots, {})
+        reporter.flushSpool()
+        self.assertEqual(len(self.getReporter().spots), 2)
+
+    def testFlushAfterUploadKeepsSpoolEmpty(self):
+        reporter = self.getReporter()
+        reporter.spotAll([makeSpot()])
+        reporter.upload()
+        reporter.flushSpool()
+        self.assertEqual(self.getReporter().spots, {})
+
+    def testFailedUploadIsRetained(self):
+        reporter = self.getReporter()
+        reporter.spotAll([makeSpot()])
+        reporter.uploader.upload.side_effect = OSError("network is unreachable")
+        reporter.upload()
+        self.assertEqual(len(reporter.spots), 1)
+        reporter.uploader.upload.side_effect = None
+        reporter.upload()
+        self.assertEqual(len(reporter.spots), 0)
+        self.assertEqual(self.getReporter().spots, {})
+
+    def testSpoolIsWrittenOutsideSpotLock(self):
+        reporter = self.getReporter()
+        reporter.spool = MagicMock()
+        locked = []
+
+        def write(spots):
+            locked.append(reporter.spotLock.locked())
+
+        reporter.spool.append.side_effect = write
+        reporter.spool.replace.side_effect = write
+        reporter.spotAll([makeSpot()])
+        reporter.flushSpool()
+        reporter.upload()
+        self.assertEqual(locked, [False, False])
+
+    def testSpoolSkipsStaleAndBrokenEntries(self):
+        path = os.path.join(self.dir, "spool")
+        spool = SpotSpool(path)
+        spool.append([makeSpot(timestamp=0), makeSpot()])
+        with open(path, "a") as f:
+            f.write('{"callsign": "DL')
+        self.assertEqual(len(spool.load()), 1)
+
+
+class UploaderTest(TestCase):
+    def testEncodeSpot(self):
+        uploader = Uploader.__new__(Uploader)
+        encoded = uploader.encodeSpot(makeSpot(timestamp=1600000000000))
+        expected = (
+            bytes([6]) + b"DL1ABC"
+            + (14074512).to_bytes(4, "big")
+            + (-12).to_bytes(1, "big", signed=True)
+            + bytes([3]) + b"FT8"
+            + bytes([4]) + b"JO62"
+            + bytes([1])
+            + (1600000000).to_bytes(4, "big")
+        )
+        self.assertEqual(encoded, expected)
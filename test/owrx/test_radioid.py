@@ -0,0 +1,148 @@
+from unittest import TestCase
+from unittest.mock import patch
+from owrx.radioid import RadioIdDatabase
+from owrx.meta import DmrCache, DmrMetaEnricher
+from datetime import timedelta
+import tempfile
+import os
+
+
+class RadioIdDatabaseTest(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "radioid.db")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def writeCsv(self, rows):
+        source = os.path.join(self.dir.name, "user.csv")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("RADIO_ID,CALLSIGN,FIRST_NAME,LAST_NAME,CITY,STATE,COUNTRY\n")
+            for row in rows:
+                f.write(row + "\n")
+        return source
+
+    def testLookup(self):
+        source = self.writeCsv(
+            [
+                "2620001,DL1ABC,Jürgen,Müller,Berlin,Berlin,Germany",
+                "1023001,VE3XYZ,John,Smith,Toronto,Ontario,Canada",
+                "invalid,N0CALL,,,,,",
+                "3100001,K1ABC,Jane,Doe,\"Boston, MA\",Massachusetts,United States",
+            ]
+        )
+        self.assertEqual(RadioIdDatabase.importCsv(source, self.path), 3)
+        db = RadioIdDatabase(self.path)
+        self.assertEqual(
+            db.lookup(2620001),
+            {
+                "id": 2620001,
+                "callsign": "DL1ABC",
+                "fname": "Jürgen",
+                "surname": "Müller",
+                "city": "Berlin",
+                "state": "Berlin",
+                "country": "Germany",
+            },
+        )
+        self.assertEqual(db.lookup(1023001)["callsign"], "VE3XYZ")
+        self.assertEqual(db.lookup(3100001)["city"], "Boston, MA")
+        self.assertIsNone(db.lookup(1))
+        self.assertIsNone(db.lookup(2620002))
+        self.assertIsNone(db.lookup(9999999))
+
+    def testManyIds(self):
+        source = self.writeCsv(["{},CALL{}".format(i * 7, i) for i in range(1000)])
+        RadioIdDatabase.importCsv(source, self.path)
+        db = RadioIdDatabase(self.path)
+        for i in range(1000):
+            self.assertEqual(db.lookup(i * 7)["callsign"], "CALL{}".format(i))
+            self.assertIsNone(db.lookup(i * 7 + 1))
+
+    def testMissingDatabase(self):
+        self.assertIsNone(RadioIdDatabase(self.path).lookup(2620001))
+
+    def testInvalidDatabase(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a database")
+        self.assertIsNone(RadioIdDatabase(self.path).lookup(2620001))
+
+    def testReopensReplacedDatabase(self):
+        RadioIdDatabase.importCsv(self.writeCsv(["2620001,DL1ABC"]), self.path)
+        db = RadioIdDatabase(self.path)
+        self.assertEqual(db.lookup(2620001)["callsign"], "DL1ABC")
+        RadioIdDatabase.importCsv(self.writeCsv(["2620001,DL2XYZ"]), self.path)
+        os.utime(self.path, (0, 0))
+        db.lastCheck = None
+        self.assertEqual(db.lookup(2620001)["callsign"], "DL2XYZ")
+
+    def testRejectsOtherCsv(self):
+        source = os.path.join(self.dir.name, "other.csv")
+        with open(source, "w") as f:
+            f.write("a,b,c\n1,2,3\n")
+        with self.assertRaises(ValueError):
+            RadioIdDatabase.importCsv(source, self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+
+class DmrCacheTest(TestCase):
+    def testEvictsLeastRecentlyUsed(self):
+        cache = DmrCache()
+        with patch.object(DmrCache, "maxSize", 3):
+            for i in range(3):
+                cache.put(i, {"id": i})
+            self.assertEqual(cache.get(0), {"id": 0})
+            cache.put(3, {"id": 3})
+            self.assertTrue(cache.isValid(0))
+            self.assertFalse(cache.isValid(1))
+            self.assertEqual(len(cache.cache), 3)
+
+
+    def testExpiredEntry(self):
+        cache = DmrCache()
+        cache.put(1, {"id": 1})
+        cache.cacheTimeout = timedelta(seconds=-1)
+        self.assertFalse(cache.isValid(1))
+        self.assertIsNone(cache.get(1))
+        self.assertIsNone(cache.get(2))
+
+
+class DmrMetaEnricherTest(TestCase):
+    def setUp(self):
+        self.config = {"digital_voice_dmr_id_lookup": True, "digital_voice_dmr_id_online_lookup": True}
+        patcher = patch("owrx.meta.Config.get", return_value=self.config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = patch("owrx.meta.RadioIdDatabase.getSharedInstance").start()
+        self.db.return_value.lookup.return_value = None
+        self.lookup = patch("owrx.meta.RadioIdLookup.getSharedInstance").start()
+        self.cache = patch("owrx.meta.DmrCache.getSharedInstance", return_value=DmrCache()).start()
+        self.addCleanup(patch.stopall)
+
+    def testUsesOfflineDatabase(self):
+        self.db.return_value.lookup.return_value = {"id": 2620001, "callsign": "DL1ABC"}
+        meta = DmrMetaEnricher().enrich({"source": "2620001"})
+        self.assertEqual(meta["additional"]["callsign"], "DL1ABC")
+        self.db.return_value.lookup.assert_called_with(2620001)
+        self.lookup.return_value.request.assert_not_called()
+
+    def testFallsBackToOnlineLookup(self):
+        meta = DmrMetaEnricher().enrich({"source": "2620001"})
+        self.assertNotIn("additional", meta)
+        self.lookup.return_value.request.assert_called_once_with("2620001")
+
+        self.cache.return_value.put("2620001", {"count": 1, "results": [{"callsign": "DL1ABC"}]})
+        meta = DmrMetaEnricher().enrich({"source": "2620001"})
+        self.assertEqual(meta["additional"]["callsign"], "DL1ABC")
+        self.lookup.return_value.request.assert_called_once()
+
+    def testOnlineLookupDisabled(self):
+        self.config["digital_voice_dmr_id_online_lookup"] = False
+        DmrMetaEnricher().enrich({"source": "2620001"})
+        self.lookup.return_value.request.assert_not_called()
+
+    def testIgnoresInvalidIds(self):
+        meta = DmrMetaEnricher().enrich({"source": "abc"})
+        self.assertNotIn("additional", meta)
+        self.lookup.return_value.request.assert_not_called()
@@ -0,0 +1,86 @@
+from unittest import TestCase
+from unittest.mock import patch
+from owrx.reporting import ReportingEngine, Reporter, ReporterChannel, BackpressurePolicy
+from owrx.metrics import Metrics
+import threading
+import time
+
+
+class FakeReporter(Reporter):
+    def __init__(self, name, modes, block=None):
+        self.name = name
+        self.modes = modes
+        self.block = block
+        self.spots = []
+        self.received = threading.Event()
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def spot(self, spot):
+        if self.block is not None:
+            self.block.wait()
+        self.spots.append(spot)
+        self.received.set()
+
+    def getSupportedModes(self):
+        return self.modes
+
+
+class ReportingEngineTest(TestCase):
+    def setUp(self):
+        # the shared metrics instance needs a full configuration, which is not available here
+        metrics = Metrics.__new__(Metrics)
+        metrics.metrics = {}
+        patcher = patch.object(Metrics, "getSharedInstance", return_value=metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def getEngine(self, *reporters):
+        engine = ReportingEngine.__new__(ReportingEngine)
+        engine.reporters = list(reporters)
+        engine._setupDispatcher()
+        return engine
+
+    def testSpotsAreDispatchedByMode(self):
+        ft8 = FakeReporter("ft8", ["FT8"])
+        wspr = FakeReporter("wspr", ["WSPR"])
+        engine = self.getEngine(ft8, wspr)
+        engine.spotAll([{"mode": "FT8", "callsign": "A"}, {"mode": "WSPR", "callsign": "B"}])
+        self.assertTrue(ft8.received.wait(5))
+        self.assertTrue(wspr.received.wait(5))
+        engine.stop()
+        self.assertEqual([s["callsign"] for s in ft8.spots], ["A"])
+        self.assertEqual([s["callsign"] for s in wspr.spots], ["B"])
+        self.assertTrue(ft8.stopped and wspr.stopped)
+
+    def testSlowReporterDoesNotBlock(self):
+        block = threading.Event()
+        slow = FakeReporter("slow", ["FT8"], block)
+        fast = FakeReporter("fast", ["FT8"])
+        engine = self.getEngine(slow, fast)
+        start = time.monotonic()
+        for i in range(100):
+            engine.spot({"mode": "FT8", "callsign": str(i)})
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertTrue(fast.received.wait(5))
+        block.set()
+        engine.stop()
+        self.assertEqual(len(slow.spots), 100)
+
+    def testBackpressurePolicies(self):
+        for policy, expected in [
+            (BackpressurePolicy.DROP_OLDEST, ["2", "3", "4"]),
+            (BackpressurePolicy.DROP_NEWEST, ["0", "1", "2"]),
+        ]:
+            reporter = FakeReporter("test", ["FT8"])
+            reporter.channelSize = 3
+            reporter.backpressurePolicy = policy
+            channel = ReporterChannel(reporter)
+            # holding the condition keeps the channel thread from consuming, so that the channel fills up
+            with channel.condition:
+                channel.put([{"mode": "FT8", "callsign": str(i)} for i in range(5)])
+                self.assertEqual([s["callsign"] for s in channel.spots], expected)
+                self.assertEqual(channel.dropCounter.getValue()["count"], 2)
+            channel.stop()
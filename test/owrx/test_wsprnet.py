@@ -0,0 +1,128 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from owrx.wsprnet import WsprnetReporter, Worker
+from owrx.metrics import Metrics
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+import threading
+import tempfile
+import shutil
+import time
+
+
+class WsprnetStandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            fail = server.failures > 0
+            if fail:
+                server.failures -= 1
+            else:
+                server.received.append(parse_qs(body.decode()))
+        self.send_response(500 if fail else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def makeSpot(callsign="DL1ABC"):
+    return {
+        "timestamp": int(time.time() * 1000),
+        "db": -23.0,
+        "dt": 0.3,
+        "freq": 7040048,
+        "drift": -1,
+        "msg": "{} JO59 37".format(callsign),
+        "callsign": callsign,
+        "locator": "JO59",
+        "dbm": "37",
+        "mode": "WSPR",
+        "interval": 120,
+    }
+
+
+class WsprnetReporterTest(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), WsprnetStandIn)
+        self.server.lock = threading.Lock()
+        self.server.received = []
+        self.server.connections = set()
+        self.server.failures = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        # the shared metrics instance needs a full configuration, which is not available here
+        metrics = Metrics.__new__(Metrics)
+        metrics.metrics = {}
+        coreConfig = MagicMock()
+        coreConfig.get_data_directory.return_value = self.dir
+        config = {
+            "wsprnet_callsign": "N0CALL",
+            "receiver_gps": {"lat": 48.0, "lon": 11.0},
+            "wsprnet_url": "http://127.0.0.1:{}/post/".format(self.server.server_address[1]),
+            "wsprnet_upload_workers": 1,
+        }
+        for patcher in [
+            patch.object(Metrics, "getSharedInstance", return_value=metrics),
+            patch("owrx.wsprnet.CoreConfig", return_value=coreConfig),
+            patch("owrx.wsprnet.Config.get", return_value=config),
+            patch.object(Worker, "retryDelay", 0.01),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def waitFor(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "timeout")
+            time.sleep(0.01)
+
+    def testUploadsOverOneConnection(self):
+        reporter = WsprnetReporter()
+        self.addCleanup(reporter.stop)
+        reporter.spotAll([makeSpot(), makeSpot("DL2XYZ")])
+        self.waitFor(lambda: len(self.server.received) == 2)
+        self.assertEqual(self.server.received[0]["tcall"], ["DL1ABC"])
+        self.assertEqual(self.server.received[0]["mode"], ["2"])
+        # keep-alive: both spots went over the same connection
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(reporter.uploadCounter.getValue()["count"], 2)
+
+    def testRetriesFailedUploads(self):
+        self.server.failures = 2
+        reporter = WsprnetReporter()
+        self.addCleanup(reporter.stop)
+        reporter.spot(makeSpot())
+        self.waitFor(lambda: len(self.server.received) == 1)
+        self.assertEqual(reporter.retryCounter.getValue()["count"], 2)
+
+    def testDropsAfterMaxRetries(self):
+        self.server.failures = Worker.maxRetries + 1
+        reporter = WsprnetReporter()
+        self.addCleanup(reporter.stop)
+        reporter.spot(makeSpot())
+        self.waitFor(lambda: reporter.dropCounter.getValue()["count"] == 1)
+        self.assertEqual(self.server.received, [])
+
+    def testOverflowIsSpooled(self):
+        with patch.object(WsprnetReporter, "queueSize", 1), patch.object(Worker, "run", lambda w: None):
+            reporter = WsprnetReporter()
+            reporter.spotAll([makeSpot(), makeSpot("DL2XYZ"), makeSpot("DL3QRS")])
+            self.assertEqual(reporter.spoolCounter.getValue()["count"], 2)
+            reporter.stop()
+        # the next instance uploads everything that was left
+        reporter = WsprnetReporter()
+        self.addCleanup(reporter.stop)
+        self.waitFor(lambda: len(self.server.received) == 3)
+        self.assertEqual(
+            sorted(r["tcall"][0] for r in self.server.received), ["DL1ABC", "DL2XYZ", "DL3QRS"]
+        )
@@ -0,0 +1,59 @@
+"""
+Measures reads from a PropertyStack shaped like the config stacks: 5 layers with 200 keys each, overlapping so that
+the keys resolve to different layers.
+
+Run with "python3 -m test.property.bench_property_stack" from the repository root.
+"""
+
+from owrx.property import PropertyLayer, PropertyStack
+import time
+
+layerCount = 5
+keyCount = 200
+iterations = 200
+
+
+def createStack():
+    stack = PropertyStack()
+    # add the layers in reverse order so that the stack has to sort them
+    for priority in reversed(range(layerCount)):
+        layer = PropertyLayer()
+        for i in range(keyCount):
+            # the higher priority layers only override some of the keys
+            if i % (priority + 1) == 0:
+                layer["key_{}".format(i)] = "value {} {}".format(priority, i)
+        stack.addLayer(priority, layer)
+    return stack
+
+
+def measure(name, operation, count):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        operation()
+    duration = time.perf_counter() - start
+    print("{name}: {rate:.0f} ops/s".format(name=name, rate=count * iterations / duration))
+
+
+def main():
+    stack = createStack()
+    keys = ["key_{}".format(i) for i in range(keyCount)]
+    missing = ["missing_{}".format(i) for i in range(keyCount)]
+
+    def get():
+        for key in keys:
+            stack[key]
+
+    def contains():
+        for key in keys:
+            key in stack
+        for key in missing:
+            key in stack
+
+    print("{} layers, {} keys".format(layerCount, keyCount))
+    measure("get", get, len(keys))
+    measure("contains", contains, len(keys) + len(missing))
+    measure("dict", stack.__dict__, 1)
+
+
+if __name__ == "__main__":
+    main()
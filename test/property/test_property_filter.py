@@ -1,6 +1,7 @@
 from unittest import TestCase
 from unittest.mock import Mock
 from owrx.property import PropertyLayer, PropertyFilter, PropertyDeleted
+from owrx.property.filter import ByPropertyName
 
 
 class PropertyFilterTest(TestCase):
@@ -80,3 +81,31 @@ class PropertyFilterTest(TestCase):
         pf.wire(mock.method)
         del pf["testkey"]
         mock.method.assert_called_once_with({"testkey": PropertyDeleted})
+
+    def testSubscribesToParentOnlyWhileSubscribed(self):
+        pm = PropertyLayer()
+        pf = PropertyFilter(pm, ByPropertyName("testkey"))
+        self.assertEqual(pm.getSubscriberCount(), 0)
+        sub = pf.wire(Mock().method)
+        other = pf.wireProperty("testkey", Mock().method)
+        self.assertEqual(pm.getSubscriberCount(), 1)
+        sub.cancel()
+        self.assertEqual(pm.getSubscriberCount(), 1)
+        other.cancel()
+        self.assertEqual(pm.getSubscriberCount(), 0)
+
+    def testResubscribes(self):
+        pm = PropertyLayer()
+        pf = PropertyFilter(pm, ByPropertyName("testkey"))
+        pf.wire(Mock().method).cancel()
+        mock = Mock()
+        pf.wire(mock.method)
+        pm["testkey"] = "testvalue"
+        mock.method.assert_called_once_with({"testkey": "testvalue"})
+
+    def testFilterWithoutSubscriptionsDoesNotLeak(self):
+        pm = PropertyLayer()
+        for _ in range(10):
+            pf = PropertyFilter(pm, ByPropertyName("testkey"))
+            pf.wire(Mock().method).cancel()
+        self.assertEqual(pm.subscribers, {})
@@ -1,4 +1,4 @@
-from owrx.property import PropertyLayer, PropertyDeleted
+from owrx.property import PropertyLayer, PropertyDeleted, PropertyManager
 from unittest import TestCase
 from unittest.mock import Mock
 
@@ -91,3 +91,37 @@ class PropertyLayerTest(TestCase):
         with self.assertRaises(KeyError):
             del pm["testkey"]
         mock.method.assert_not_called()
+
+    def testDispatchesByName(self):
+        pm = PropertyLayer()
+        first = Mock()
+        second = Mock()
+        pm.wireProperty("first", first.method)
+        pm.wireProperty("second", second.method)
+        pm["first"] = "value"
+        first.method.assert_called_once_with("value")
+        second.method.assert_not_called()
+
+    def testUnsubscribeDuringEvent(self):
+        pm = PropertyLayer()
+        mock = Mock()
+        subs = []
+
+        def cancel(value):
+            for s in subs:
+                s.cancel()
+
+        subs.append(pm.wireProperty("testkey", cancel))
+        subs.append(pm.wireProperty("testkey", mock.method))
+        pm["testkey"] = "value"
+        mock.method.assert_called_once_with("value")
+        self.assertEqual(pm.getSubscriberCount(), 0)
+
+    def testTotalSubscriberCount(self):
+        count = PropertyManager.getTotalSubscriberCount()
+        pm = PropertyLayer()
+        sub = pm.wire(Mock().method)
+        self.assertEqual(PropertyManager.getTotalSubscriberCount(), count + 1)
+        sub.cancel()
+        sub.cancel()
+        self.assertEqual(PropertyManager.getTotalSubscriberCount(), count)
@@ -215,3 +215,47 @@ class PropertyStackTest(TestCase):
         ps.wire(mock.method)
         del low_pm["testkey"]
         mock.method.assert_called_once_with({"testkey": PropertyDeleted})
+
+    def testKeyAddedToHigherLayer(self):
+        ps = PropertyStack()
+        low_pm = PropertyLayer(testkey="low value")
+        high_pm = PropertyLayer()
+        ps.addLayer(1, low_pm)
+        ps.addLayer(0, high_pm)
+        high_pm["testkey"] = "high value"
+        self.assertEqual(ps["testkey"], "high value")
+        del high_pm["testkey"]
+        self.assertEqual(ps["testkey"], "low value")
+        del low_pm["testkey"]
+        self.assertNotIn("testkey", ps)
+        self.assertEqual(ps.keys(), set())
+
+    def testLayerOrderIndependentOfInsertion(self):
+        ps = PropertyStack()
+        layers = {priority: PropertyLayer(testkey=priority) for priority in [3, 0, 2, 1]}
+        for priority, pm in layers.items():
+            ps.addLayer(priority, pm)
+        self.assertEqual([la["priority"] for la in ps.layers], [0, 1, 2, 3])
+        self.assertEqual(ps["testkey"], 0)
+        ps.removeLayer(layers[0])
+        self.assertEqual(ps["testkey"], 1)
+        ps.replaceLayer(1, PropertyLayer())
+        self.assertEqual(ps["testkey"], 2)
+
+    def testEqualPriorityKeepsFirstLayer(self):
+        ps = PropertyStack()
+        ps.addLayer(0, PropertyLayer(testkey="first"))
+        ps.addLayer(0, PropertyLayer(testkey="second"))
+        self.assertEqual(ps["testkey"], "first")
+
+    def testNestedStack(self):
+        inner = PropertyStack()
+        inner_pm = PropertyLayer()
+        inner.addLayer(0, inner_pm)
+        ps = PropertyStack()
+        ps.addLayer(0, inner)
+        ps.addLayer(1, PropertyLayer(testkey="low value", otherkey="other value"))
+        inner_pm["testkey"] = "inner value"
+        self.assertEqual(ps.__dict__(), {"testkey": "inner value", "otherkey": "other value"})
+        del inner_pm["testkey"]
+        self.assertEqual(ps["testkey"], "low value")